@@ -3,17 +3,18 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
+from sales_features import build_features
+from sales_ingest import load_sales_frame
 
-# Load and preprocess data
-df = pd.read_csv('data/sales_performance_data.csv')
-df['dated'] = pd.to_datetime(df['dated'], errors='coerce')
+# Load and preprocess data (dates are parsed with the fixed dd/mm/YYYY format)
+df = load_sales_frame('data/sales_performance_data.csv')
 df = df.dropna(subset=['dated'])
 
 # Feature Engineering
 df['month'] = df['dated'].dt.month
 df['quarter'] = df['dated'].dt.to_period('Q')
-df['lag_revenue'] = df['revenue_confirmed'].shift(1)
-df['rolling_avg_revenue'] = df['revenue_confirmed'].rolling(window=3).mean()
+# Lag, rolling, EWM and ratio features computed per employee (see sales_features.py)
+df = df.join(build_features(df).aligned(df.index))
 df['day_of_week'] = df['dated'].dt.day_name()
 
 # Resample and Aggregate
@@ -3,6 +3,10 @@ import pandas as pd  # Import pandas for CSV handling
 from langchain_openai import OpenAI
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
+from sales_data_store import get_store
+from rep_index import RepIndex
+from llm_cache import cached_chain_run, get_llm_cache
+from llm_gateway import LLMUnavailable
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -20,22 +24,24 @@ prompt_template = PromptTemplate(
 # Create an LLM chain
 feedback_chain = LLMChain(llm=llm, prompt=prompt_template)
 
-# Load the sales data CSV file
+# Shared, versioned copy of the sales data CSV
+sales_store = get_store('data/sales_performance_data.csv')  # Replace with your actual CSV path
+
+# Load the per-representative index of the sales data
 def load_sales_data():
     try:
-        df = pd.read_csv('data/sales_performance_data.csv')  # Replace with your actual CSV path
-        return df
+        return sales_store.derived('rep_index', RepIndex)
     except Exception as e:
         print(f"Error loading CSV: {e}")
         return None
 
-# Filter representative data from the CSV
-def get_rep_data(rep_id, df):
+# Look up representative data in the index
+def get_rep_data(rep_id, rep_index):
     try:
-        # Filter the dataframe for the representative's data using `rep_id`
-        rep_data = df[df['employee_id'] == int(rep_id)].to_dict(orient='records')
+        # Rows are sorted by date, so the last one is the most recent record
+        rep_data = rep_index.rows(rep_id, latest=1).to_dict(orient='records')
         if rep_data:
-            return rep_data[0]  # Return the first matching record as a dictionary
+            return rep_data[0]
         else:
             return None
     except Exception as e:
@@ -61,8 +67,10 @@ def generate_feedback(rep_data):
     # Convert the summarized data to a string to pass to the LLM
     summarized_rep_data = str(summary_data)
 
-    # Generate feedback with the reduced dataset
-    feedback = feedback_chain.run(rep_data=summarized_rep_data)
+    # Generate feedback with the reduced dataset: cached per data version,
+    # and paced, retried and coalesced by the shared LLM gateway
+    feedback = cached_chain_run(get_llm_cache(), feedback_chain, sales_store.version,
+                                rep_data=summarized_rep_data)
     return feedback
 
 @app.route('/api/rep_performance', methods=['GET'])
@@ -73,18 +81,21 @@ def rep_performance():
     if not rep_id:
         return jsonify({"error": "Representative ID is required"}), 400
 
-    # Load the CSV data
-    sales_data_df = load_sales_data()
-    if sales_data_df is None:
+    # Load the indexed CSV data
+    rep_index = load_sales_data()
+    if rep_index is None:
         return jsonify({"error": "Failed to load sales data"}), 500
 
     # Get the data for the requested representative
-    rep_data_dict = get_rep_data(rep_id, sales_data_df)
+    rep_data_dict = get_rep_data(rep_id, rep_index)
     if not rep_data_dict:
         return jsonify({"error": f"No data found for representative ID {rep_id}"}), 404
 
     # Generate feedback using the summarized data
-    feedback = generate_feedback(rep_data_dict)
+    try:
+        feedback = generate_feedback(rep_data_dict)
+    except LLMUnavailable as e:
+        return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
 
     return jsonify({
         "rep_id": rep_id,
@@ -1,8 +1,13 @@
 from flask import Flask, request, jsonify
 import pandas as pd
 import openai
-import json
-import os
+from sales_data_store import get_store
+from sales_ingest import load_sales_frame
+from rep_index import RepIndex
+from llm_cache import get_llm_cache, make_cache_key
+from llm_gateway import LLMUnavailable, get_llm_gateway
+from prompt_compaction import count_tokens
+from tracing import record_llm_call
 
 app = Flask(__name__)
 
@@ -10,31 +15,46 @@ app = Flask(__name__)
 openai.api_key = 'Enter_Key'
 
 
-def generate_feedback(prompt):
-    """Generate feedback from GPT based on the prompt."""
-    response = openai.ChatCompletion.create(
-        model="gpt-4",  # Or your preferred GPT model
-        messages=[
+def generate_feedback(prompt, data_version=None):
+    """Generate feedback from GPT based on the prompt, reusing cached answers.
+
+    Returns the completion text, which is also what both cache tiers keep.
+    """
+    model = "gpt-4"  # Or your preferred GPT model
+    messages = [
         {"role": "system", "content": "You are an assistant who extrgenerate feedback."},
         {"role": "user", "content": f"{prompt}"}
-    ],
-        max_tokens=1500
-    )
-    return response
+    ]
+    # 'output' keeps keys apart from entries that held whole response objects
+    key = make_cache_key(messages[0]["content"], {"prompt": prompt, "max_tokens": 1500, "output": "text"},
+                         model, data_version)
+    prompt_tokens = count_tokens(messages[0]["content"] + prompt)
+
+    def run():
+        response = openai.ChatCompletion.create(
+            model=model,
+            messages=messages,
+            max_tokens=1500
+        )
+        completion = response['choices'][0]['message']['content']
+        record_llm_call(False, prompt_tokens, completion)
+        return completion
+
+    # Paced, retried and coalesced by the shared LLM gateway
+    return get_llm_cache().get_or_compute(key, lambda: get_llm_gateway().call(key, run, prompt_tokens + 1500))
 
 def load_data(file_path):
     """Load sales data from CSV or JSON."""
     if file_path.endswith('.csv'):
-        return pd.read_csv(file_path)
+        return load_sales_frame(file_path)
     elif file_path.endswith('.json'):
         return pd.read_json(file_path)
     else:
         raise ValueError("Unsupported file format")
 
 def get_sales_data():
-    """Load and return sales data."""
-    
-    return load_data('data/sales_performance_data.csv')
+    """Return the shared, already parsed sales data."""
+    return get_store('data/sales_performance_data.csv').get()
 
 @app.route('/api/rep_performance', methods=['GET'])
 def rep_performance():
@@ -42,13 +62,12 @@ def rep_performance():
     if not rep_id:
         return jsonify({'error': 'rep_id parameter is required'}), 400
     
-    df = get_sales_data()
-    if not df.empty:
-        df['employee_id'] = df['employee_id'].astype(int)
-    
+    sales_store = get_store('data/sales_performance_data.csv')
+    rep_index = sales_store.derived('rep_index', RepIndex)
+
     rep_id = int(rep_id)
-    rep_data = df[df['employee_id'] == rep_id]
-    rep_data = rep_data.tail(10)
+    # The ten most recent records, oldest first
+    rep_data = rep_index.rows(rep_id, latest=10).drop(columns=['dated_ts'])
     
     if rep_data.empty:
         return jsonify({'error': 'Sales representative not found'}), 404
@@ -58,7 +77,10 @@ def rep_performance():
     # performance_summary = f"Sales Representative {rep_id} has total sales of ${total_sales:.2f}."
 
     prompt = f"Analyze the following sales data for representative {rep_id}: {rep_data.to_dict()}.\nProvide feedback on their performance."
-    feedback = generate_feedback(prompt)
+    try:
+        feedback = generate_feedback(prompt, sales_store.version)
+    except LLMUnavailable as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
 
     return jsonify({
         'rep_id': rep_id,
@@ -69,4 +91,6 @@ def rep_performance():
 
 
 if __name__ == '__main__':
+    # Parse the CSV once at startup instead of on the first request
+    get_store('data/sales_performance_data.csv').reload()
     app.run(debug=True)
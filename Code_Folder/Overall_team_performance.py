@@ -1,44 +1,32 @@
+from Individuale_sales_code import generate_feedback
+from llm_gateway import LLMUnavailable
+from prompt_compaction import compact_team_metrics
+from team_metrics import get_team_metrics
+
 @app.route('/api/team_performance', methods=['GET'])
 def team_performance():
-    # Get the sales data
-    df = get_sales_data()
-    
-    if df is None or df.empty:
-        return jsonify({'error': 'No data available'}), 404
-
-    # Ensure the data types are correct
-    df['employee_id'] = df['employee_id'].astype(int)
+    # Running aggregates; only rows appended since the last request are parsed
+    team_metrics = get_team_metrics('data/sales_performance_data.csv')
+    metrics = team_metrics.refresh()
 
-    # Limit the data sent to the model (e.g., use only the first 5 rows)
-    df_limited = df.head(5)
+    if not metrics['rows']:
+        return jsonify({'error': 'No data available'}), 404
 
     # Calculating multiple metrics for team performance
-    total_leads = df['lead_taken'].sum()
-    total_revenue_confirmed = df['revenue_confirmed'].sum()
-    total_tours_booked = df['tours_booked'].sum()
-    total_applications = df['applications'].sum()
+    total_leads = int(metrics['total_lead_taken'])
+    total_revenue_confirmed = float(metrics['total_revenue_confirmed'])
+    total_tours_booked = int(metrics['total_tours_booked'])
+    total_applications = int(metrics['total_applications'])
 
     # Additional conversion rates
-    avg_apps_per_lead = df['apps_per_lead'].mean()
-    avg_apps_per_tour = df['apps_per_tour'].mean()
-    avg_tours_per_lead = df['tours_per_lead'].mean()
+    avg_apps_per_lead = float(metrics['avg_apps_per_lead'])
+    avg_apps_per_tour = float(metrics['avg_apps_per_tour'])
+    avg_tours_per_lead = float(metrics['avg_tours_per_lead'])
 
     # Pipeline and revenue metrics
-    total_revenue_pending = df['revenue_pending'].sum()
-    revenue_runrate = df['revenue_runrate'].mean()
-    avg_deal_value = df['avg_deal_value_30_days'].mean()
-
-    # Convert to native Python types
-    total_leads = int(total_leads)
-    total_revenue_confirmed = float(total_revenue_confirmed)
-    total_tours_booked = int(total_tours_booked)
-    total_applications = int(total_applications)
-    avg_apps_per_lead = float(avg_apps_per_lead)
-    avg_apps_per_tour = float(avg_apps_per_tour)
-    avg_tours_per_lead = float(avg_tours_per_lead)
-    total_revenue_pending = float(total_revenue_pending)
-    revenue_runrate = float(revenue_runrate)
-    avg_deal_value = float(avg_deal_value)
+    total_revenue_pending = float(metrics['total_revenue_pending'])
+    revenue_runrate = float(metrics['avg_revenue_runrate'])
+    avg_deal_value = float(metrics['avg_avg_deal_value_30_days'])
 
     # Summarize performance
     performance_summary = (
@@ -49,18 +37,19 @@ def team_performance():
         f"Conversion rates: {avg_tours_per_lead:.2f} tours per lead, {avg_apps_per_tour:.2f} apps per tour."
     )
 
-    # Reduce the amount of data being sent by summarizing and limiting rows
-    data_summary = df_limited.to_dict('records')
+    # Condense the team and per-employee aggregates into a summary under the
+    # prompt token budget, without touching the full dataset
+    data_summary, prompt_tokens = compact_team_metrics(metrics, team_metrics.all_employee_metrics(),
+                                                       team_metrics.period_totals())
 
     # Generate feedback using GPT-4 based on summarized data
-    prompt = f"Analyze the following sales data for the team: {data_summary}. Provide feedback on the team's performance."
+    prompt = f"Analyze the following summarized sales data for the team: {data_summary}. Provide feedback on the team's performance."
 
     try:
         feedback = generate_feedback(prompt)
-    except openai.error.RateLimitError as e:
-        return jsonify({
-            'error': 'Rate limit exceeded, the data is too large to process at once. Please reduce the dataset.'
-        }), 429
+    except LLMUnavailable as e:
+        # The gateway already queued and retried the call; ask the client to come back later
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
 
     return jsonify({
         'total_leads': total_leads,
@@ -73,5 +62,6 @@ def team_performance():
         'total_revenue_pending': total_revenue_pending,
         'revenue_runrate': revenue_runrate,
         'avg_deal_value': avg_deal_value,
+        'prompt_tokens': prompt_tokens,
         'feedback': feedback
     })
@@ -1,3 +1,7 @@
+from Individuale_sales_code import generate_feedback
+from llm_gateway import LLMUnavailable
+from prompt_compaction import compact_team_data
+
 total_revenue_confirmed: 
 @app.route('/api/team_performance', methods=['GET'])
 def team_performance():
@@ -10,9 +14,6 @@ def team_performance():
     # Ensure the data types are correct
     df['employee_id'] = df['employee_id'].astype(int)
 
-    # Limit the data sent to the model (e.g., use only the first 5 rows)
-    df_limited = df.head(5)
-
     # Example metrics: Total confirmed revenue and conversion rates
     total_revenue_confirmed = df['revenue_confirmed'].sum()
     tours_per_lead_rate = df['tours_per_lead'].mean()
@@ -30,18 +31,17 @@ def team_performance():
         f"Average applications per tour: {apps_per_tour_rate:.2f}."
     )
 
-    # Reduce the amount of data being sent by summarizing and limiting rows
-    data_summary = df_limited.to_dict('records')
+    # Condense the full dataset into a summary under the prompt token budget
+    data_summary, prompt_tokens = compact_team_data(df)
 
     # Generate feedback using GPT-4 based on summarized data
-    prompt = f"Analyze the following limited sales data for the team: {data_summary}.\nProvide feedback on the team's performance."
+    prompt = f"Analyze the following summarized sales data for the team: {data_summary}.\nProvide feedback on the team's performance."
 
     try:
         feedback = generate_feedback(prompt)
-    except openai.error.RateLimitError as e:
-        return jsonify({
-            'error': 'Rate limit exceeded, the data is too large to process at once. Please reduce the dataset.'
-        }), 429
+    except LLMUnavailable as e:
+        # The gateway already queued and retried the call; ask the client to come back later
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
 
     return jsonify({
         'total_revenue_confirmed': total_revenue_confirmed,
@@ -1,55 +1,53 @@
+from Individuale_sales_code import generate_feedback
+from llm_gateway import LLMUnavailable
+from rep_index import check_date_range, parse_date_param
+from sales_data_store import get_store
+from trend_rollups import TrendRollups
+
 @app.route('/api/performance_trends', methods=['GET'])
 def performance_trends():
     # Get time period from query parameters (default to 'monthly')
     time_period = request.args.get('time_period', 'monthly')
+    # Any numeric column can be trended; revenue stays the default
+    metric = request.args.get('metric', 'revenue_confirmed')
+    agg = request.args.get('agg', 'sum')
+    employee_id = request.args.get('employee_id')
 
-    # Fetch and process sales data
-    df = get_sales_data()
-
-    # Ensure the 'dated' column is in datetime format
-    df['dated'] = pd.to_datetime(df['dated'], errors='coerce')
-
-    # Check for invalid or missing dates
-    if df['dated'].isnull().any():
-        # Log the rows with invalid dates for debugging
-        invalid_dates = df[df['dated'].isnull()]
-        print("Rows with invalid date format:\n", invalid_dates)
-
-        # Optionally, remove rows with invalid dates
-        df = df.dropna(subset=['dated'])
-        if df.empty:
-            return jsonify({'error': 'No valid date entries in the data'}), 400
+    try:
+        start = parse_date_param(request.args.get('from'))
+        end = parse_date_param(request.args.get('to'))
+        check_date_range(start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Rollup tables are built once per data version and only sliced here
+    sales_store = get_store('data/sales_performance_data.csv')
+    rollups = sales_store.derived('trend_rollups', TrendRollups)
+    try:
+        trends = rollups.query(metric, time_period, start=start, end=end,
+                               employee_id=employee_id, agg=agg)
+    except (KeyError, ValueError) as e:
+        return jsonify({'error': f'{e.args[0]}. Use time_period daily, weekly, monthly or quarterly and a numeric metric.'}), 400
 
-    # Set the index to the 'dated' column
-    df.set_index('dated', inplace=True)
+    if not trends:
+        return jsonify({'error': 'No valid date entries in the data'}), 400
 
-    # Choose the correct time period for resampling
-    if time_period == 'monthly':
-        trends = df.resample('M').sum()['revenue_confirmed']  # Replace 'revenue_confirmed' with your actual column
-    elif time_period == 'quarterly':
-        trends = df.resample('Q').sum()['revenue_confirmed']
-    else:
-        return jsonify({'error': 'Invalid time_period parameter. Use "monthly" or "quarterly".'}), 400
+    # Trends are keyed as YYYY-MM-DD, YYYY-MM or YYYY-Q
+    trends_dict = dict(trends)
 
     # Prepare prompt for GPT-4 analysis
-    prompt = f"Analyze the sales trends over the {time_period} period: {trends.to_dict()}.\nProvide a forecast for future performance."
+    prompt = f"Analyze the {metric} trends over the {time_period} period: {trends_dict}.\nProvide a forecast for future performance."
 
     try:
-        forecast = generate_feedback(prompt)  # Assuming this function generates the GPT-4 forecast
-    except openai.error.RateLimitError:
-        return jsonify({'error': 'Rate limit exceeded. Please try again later.'}), 429
-
-    # Format the trends to return as YYYY-MM or YYYY-Q
-    trends_dict = trends.to_dict()
-    
-    if time_period == 'monthly':
-        trends_dict = {key.strftime('%Y-%m'): value for key, value in trends_dict.items()}
-    elif time_period == 'quarterly':
-        trends_dict = {f"{key.year}-Q{(key.month - 1) // 3 + 1}": value for key, value in trends_dict.items()}
+        # Paced, retried and coalesced by the shared LLM gateway
+        forecast = generate_feedback(prompt, sales_store.version)
+    except LLMUnavailable as e:
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
 
     # Return the trend and forecast
     return jsonify({
         'time_period': time_period,
+        'metric': metric,
         'trends': trends_dict,
         'forecast': forecast
     })
@@ -0,0 +1,140 @@
+from flask import Blueprint, jsonify, request
+from sales_data_store import get_store
+from chart_cache import ChartCache, cached_chart
+from render_pool import PoolBroken, PoolBusy, RenderPool, RenderTimeout
+from chart_filters import BadChartRequest, parse_chart_filters
+from facet_tiles import facet_pages, render_facet_page, tile_index
+from tracing import registry, stage
+
+# Chart routes. matplotlib, seaborn and plotly are only imported by the
+# render workers (see render_pool.py), never by the serving process
+bp = Blueprint('charts', __name__)
+
+# Shared, versioned copy of the sales data CSV
+sales_store = get_store('data/sales_performance_data.csv')
+
+# Rendered charts, keyed on endpoint, query parameters and data version
+chart_cache = ChartCache()
+
+# Per-employee facet grid panels, keyed on a hash of that employee's rows,
+# so they survive data changes that don't touch the employee
+tile_cache = ChartCache()
+
+# Charts are drawn on explicit Figure objects in worker processes
+# (see chart_renderers.py), so requests never share pyplot state
+render_pool = RenderPool('data/sales_performance_data.csv')
+
+def chart(download_name):
+    return cached_chart(chart_cache, lambda: sales_store.version, download_name)
+
+def render(name):
+    params = request.args.to_dict()
+    # Reject bad filters here rather than after a trip to a worker
+    parse_chart_filters(params)
+    with stage('render'):
+        return render_pool.render(name, params)
+
+@bp.errorhandler(BadChartRequest)
+def bad_chart_request(e):
+    return jsonify({'error': str(e)}), 400
+
+@bp.errorhandler(PoolBusy)
+def render_pool_busy(e):
+    return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+
+@bp.errorhandler(PoolBroken)
+def render_pool_broken(e):
+    return jsonify({'error': str(e)}), 503, {'Retry-After': '1'}
+
+@bp.errorhandler(RenderTimeout)
+def render_timeout(e):
+    return jsonify({'error': str(e)}), 504
+
+# The line plot, facet grid and interactive plot accept optional from/to
+# (YYYY-MM-DD) and employees (comma-separated ids or names) filters, and
+# draw at most two points per series per horizontal pixel. The facet grid
+# is paginated with page and per_page (default 16, at most 64)
+
+# Endpoint for Line Plot
+@bp.route('/api/line_plot')
+@chart('line_plot.png')
+def line_plot():
+    return render('line_plot')
+
+# Endpoint for Histogram
+@bp.route('/api/histogram')
+@chart('histogram.png')
+def histogram():
+    return render('histogram')
+
+# Endpoint for Heatmap
+@bp.route('/api/heatmap')
+@chart('heatmap.png')
+def heatmap():
+    return render('heatmap')
+
+# Endpoint for Box Plot
+@bp.route('/api/box_plot')
+@chart('box_plot.png')
+def box_plot():
+    return render('box_plot')
+
+# Endpoint for Bar Plot
+@bp.route('/api/bar_plot')
+@chart('bar_plot.png')
+def bar_plot():
+    return render('bar_plot')
+
+# Endpoint for Heatmap of Calls
+@bp.route('/api/calls_heatmap')
+@chart('calls_heatmap.png')
+def calls_heatmap():
+    return render('calls_heatmap')
+
+# Endpoint for Facet Grid (Individual Employee Trends)
+@bp.route('/api/facet_grid')
+@chart('facet_grid.png')
+def facet_grid():
+    index, version = sales_store.derived_snapshot('facet_tile_index', tile_index)
+    with stage('render'):
+        return render_facet_page(index, request.args.to_dict(), tile_cache, render_pool, version), version
+
+# Employees on each page of the facet grid
+@bp.route('/api/facet_grid/pages')
+def facet_grid_pages():
+    index = sales_store.derived('facet_tile_index', tile_index)
+    return jsonify(facet_pages(index, request.args.to_dict()))
+
+# Endpoint for Interactive Plotly Visualization: gzipped Plotly figure JSON
+# for plotly.js to draw in the browser, or ?format=png for a server-side
+# image through Kaleido (much slower)
+@bp.route('/api/interactive_plot')
+def interactive_plot():
+    output = request.args.get('format', 'json')
+    if output == 'png':
+        return interactive_plot_png()
+    if output != 'json':
+        raise BadChartRequest("format must be json or png")
+    return interactive_plot_json()
+
+@cached_chart(chart_cache, lambda: sales_store.version, 'interactive_plot.json',
+              mimetype='application/json', encoding='gzip')
+def interactive_plot_json():
+    return render('interactive_json')
+
+@chart('interactive_plot.png')
+def interactive_plot_png():
+    return render('interactive_plot')
+
+# Hit/miss counters and size of the chart cache
+@bp.route('/api/chart_cache/stats')
+def chart_cache_stats():
+    return jsonify(chart_cache.stats())
+
+registry.register_stats('chart_cache', chart_cache.stats, 'Rendered chart cache state')
+registry.register_stats('facet_tile_cache', tile_cache.stats, 'Facet grid tile cache state')
+
+# Build the facet grid index and start the render workers up front
+def preload():
+    sales_store.derived('facet_tile_index', tile_index)
+    render_pool.start()
@@ -0,0 +1,43 @@
+import sqlite3
+
+from flask import Blueprint, jsonify
+
+from job_queue import get_job_queue
+from tracing import registry
+
+# Background analyses: team_performance and performance_trends accept
+# ?async=1 and answer 202 with a job id at once; the result is polled here
+bp = Blueprint('jobs', __name__)
+
+def wants_job(request):
+    """True if the client asked to run the analysis as a job (?async=1)."""
+    return request.args.get('async') in ('1', 'true')
+
+def job_accepted(job_id, created):
+    """202 response pointing at a submitted (or deduplicated) job."""
+    url = f"/api/jobs/{job_id}"
+    return jsonify({"job_id": job_id, "duplicate": not created, "url": url}), 202, {"Location": url}
+
+# Status of a job: queued, running, done or failed. Finished jobs carry the
+# analysis's response body in "result" and its HTTP status in "status_code"
+@bp.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({"error": f"No job with ID {job_id}"}), 404
+    return jsonify(job)
+
+registry.register_stats('jobs', lambda: get_job_queue().stats(), 'Background job queue state')
+
+# Resume jobs queued before a restart as soon as the app is built. A job
+# store that can't be opened must not keep the other routes from serving;
+# the first job request tries again
+@bp.record_once
+def start_workers(state):
+    try:
+        get_job_queue()
+    except (OSError, sqlite3.Error) as e:
+        print(f"Error starting the job queue: {e}")
+
+def preload():
+    get_job_queue()
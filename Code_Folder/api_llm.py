@@ -0,0 +1,681 @@
+import contextvars
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from types import SimpleNamespace
+
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+
+from api_jobs import job_accepted, wants_job
+from feedback_store import get_feedback_store
+from incremental_analysis import INCREMENTAL_ANALYSIS, get_snapshot_store, plan_analysis
+from job_queue import get_job_queue
+from map_reduce_summary import (MAP_REDUCE_DEPTH, MAP_REDUCE_FAN_OUT, MAX_MAP_REDUCE_PARTITIONS, PARTITION_BY,
+                                MapReduceStats, combine_summaries, partition_team_data, summarize_partitions)
+from llm_cache import cached_chain_run, get_llm_cache, make_cache_key
+from llm_flow import Blocking, LLMCall, run_flow
+from llm_gateway import LLMUnavailable, get_llm_gateway
+from llm_streaming import sse_response, stream_chain, wants_stream
+from prompt_compaction import (MAX_TEAM_PROMPT_TOKEN_BUDGET, TEAM_PROMPT_TOKEN_BUDGET, compact_team_data,
+                               count_tokens, plain_value, team_snapshot)
+from rep_index import RepIndex, check_date_range, parse_date_param
+from sales_data_store import get_store
+from sales_ingest import DATE_FORMAT
+from startup import subsystem
+from tracing import registry, stage
+
+# LLM analysis routes: representative feedback (single, batch, streamed),
+# team insights and the LLM gateway/cache stats
+bp = Blueprint('llm', __name__)
+
+# Configure OpenAI API Key
+OPENAI_API_KEY = 'Enter_Key'
+
+# Default and upper bound for concurrent LLM calls in batch requests
+BATCH_CONCURRENCY = int(os.environ.get('BATCH_CONCURRENCY', '8'))
+MAX_BATCH_CONCURRENCY = 32
+
+# LLM_BACKEND=stub swaps in a deterministic local model (no network, no key)
+LLM_BACKEND = os.environ.get('LLM_BACKEND', 'openai')
+
+REP_PERFORMANCE_TEMPLATE = "Analyze the following sales data for representative: {rep_data}. Provide detailed feedback on their performance."
+TEAM_PERFORMANCE_TEMPLATE = "Analyze the overall sales performance of the team using the following data: {team_data}. Provide insights and recommendations."
+# Incremental analyses: what changed since the last analysis, and its conclusions
+REP_UPDATE_TEMPLATE = "Previous feedback on sales representative {rep}: {previous}\nTheir sales data has changed since: {changes}\nUpdate the feedback on their performance in light of these changes."
+TEAM_UPDATE_TEMPLATE = "Previous analysis of the team's sales performance: {previous}\nThe team's sales data has changed since: {changes}\n{question}\nUpdate the insights and recommendations in light of these changes."
+# Map-reduce team analyses: one part of the data, then several parts' summaries
+PARTITION_SUMMARY_TEMPLATE = "Summarize the sales performance in this part of the team's data ({part}): {part_data}\nNote the key figures, trends, standout and struggling representatives, concisely."
+SUMMARY_REDUCE_TEMPLATE = "Combine these summaries of parts of the team's sales data into one concise summary, keeping the key figures, trends and standout or struggling representatives: {summaries}"
+
+def _load_chains():
+    # langchain and the OpenAI client take seconds to import, so they are
+    # loaded with the first request that needs a chain, not with the app
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+
+    if LLM_BACKEND == 'stub':
+        from stub_llm import StubLLM
+        llm = StubLLM(latency=float(os.environ.get('STUB_LLM_LATENCY', '0')))
+    else:
+        from langchain_openai import OpenAI
+        llm = OpenAI(api_key=OPENAI_API_KEY)
+
+    # Define prompt templates
+    rep_performance_prompt = PromptTemplate(
+        template=REP_PERFORMANCE_TEMPLATE,
+        input_variables=['rep_data']
+    )
+
+    team_performance_prompt = PromptTemplate(
+        template=TEAM_PERFORMANCE_TEMPLATE,
+        input_variables=['team_data']
+    )
+
+    rep_update_prompt = PromptTemplate(
+        template=REP_UPDATE_TEMPLATE,
+        input_variables=['rep', 'previous', 'changes']
+    )
+
+    team_update_prompt = PromptTemplate(
+        template=TEAM_UPDATE_TEMPLATE,
+        input_variables=['previous', 'changes', 'question']
+    )
+
+    partition_summary_prompt = PromptTemplate(
+        template=PARTITION_SUMMARY_TEMPLATE,
+        input_variables=['part', 'part_data']
+    )
+
+    summary_reduce_prompt = PromptTemplate(
+        template=SUMMARY_REDUCE_TEMPLATE,
+        input_variables=['summaries']
+    )
+
+    # Create LLM chains
+    return SimpleNamespace(
+        llm=llm,
+        feedback_chain=LLMChain(llm=llm, prompt=rep_performance_prompt),
+        team_performance_chain=LLMChain(llm=llm, prompt=team_performance_prompt),
+        feedback_update_chain=LLMChain(llm=llm, prompt=rep_update_prompt),
+        team_update_chain=LLMChain(llm=llm, prompt=team_update_prompt),
+        partition_summary_chain=LLMChain(llm=llm, prompt=partition_summary_prompt),
+        summary_reduce_chain=LLMChain(llm=llm, prompt=summary_reduce_prompt),
+    )
+
+llm_chains = subsystem('llm', _load_chains)
+
+# The LLM and its chains, loaded on first use
+def chains():
+    return llm_chains.get()
+
+# Shared, versioned copy of the sales data CSV
+sales_store = get_store('data/sales_performance_data.csv')  # Replace with your actual CSV path
+
+# Load sales data CSV file
+def load_sales_data():
+    try:
+        return sales_store.get()
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        return None
+
+# Per-representative index, rebuilt only when the data version changes
+def load_rep_index():
+    try:
+        return sales_store.derived('rep_index', RepIndex)
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        return None
+
+# Look up representative data from the index
+def get_rep_data(rep_id, rep_index, latest=None, start=None, end=None):
+    try:
+        rep_rows = rep_index.rows(rep_id, latest=latest, start=start, end=end)
+        if rep_rows.empty:
+            return None
+        return rep_rows.drop(columns=['dated_ts']).to_dict(orient='records')
+    except Exception as e:
+        print(f"Error getting representative data: {e}")
+        return None
+
+def format_rep_date(value):
+    return value.strftime(DATE_FORMAT) if hasattr(value, 'strftime') else value
+
+# Keep only the key columns of one record to stay within the token limit
+def summarize_rep_record(rep_data):
+    return {
+        "employee_id": rep_data.get('employee_id'),
+        "employee_name": rep_data.get('employee_name'),
+        "dated": format_rep_date(rep_data.get('dated')),
+        "lead_taken": rep_data.get('lead_taken'),
+        "applications": rep_data.get('applications'),
+        "revenue_confirmed": rep_data.get('revenue_confirmed'),
+        "revenue_pending": rep_data.get('revenue_pending'),
+        "avg_deal_value_30_days": rep_data.get('avg_deal_value_30_days'),
+        "estimated_revenue": rep_data.get('estimated_revenue'),
+        "tours": rep_data.get('tours')
+    }
+
+# Build the prompt input for one representative from their records
+def summarize_rep_records(rep_records):
+    summary_data = [summarize_rep_record(record) for record in rep_records]
+    if len(summary_data) == 1:
+        summary_data = summary_data[0]
+    return str(summary_data)
+
+# Generate feedback based on the summarized representative records
+def generate_feedback(rep_records, data_version=None):
+    with stage('prompt'):
+        summarized_rep_data = summarize_rep_records(rep_records)
+    return run_feedback_chain(summarized_rep_data, data_version)
+
+def run_feedback_chain(summarized_rep_data, data_version=None, refresh=False):
+    if data_version is None:
+        data_version = sales_store.version
+    # Identical prompts against the same data version are answered from cache
+    with stage('llm'):
+        feedback = cached_chain_run(get_llm_cache(), chains().feedback_chain, data_version,
+                                    refresh=refresh, rep_data=summarized_rep_data)
+    return feedback
+
+# Content hash of a representative's prompt. Unlike the LLM cache key it
+# leaves out the data version, so it only changes when the rep's own rows
+# (or the prompt or model) do
+def feedback_hash(summarized_rep_data):
+    return make_cache_key(REP_PERFORMANCE_TEMPLATE, {'rep_data': summarized_rep_data}, LLM_BACKEND, None)
+
+# Totals of a representative's records that incremental analyses diff,
+# with the window they cover and the latest 30-day deal value
+REP_TOTALS = ['lead_taken', 'applications', 'revenue_confirmed', 'revenue_pending',
+              'estimated_revenue', 'tours']
+
+def rep_snapshot(rep_records):
+    records = [summarize_rep_record(record) for record in rep_records]
+    overview = {'from': records[0]['dated'], 'to': records[-1]['dated'], 'days': len(records)}
+    for metric in REP_TOTALS:
+        overview[metric] = plain_value(sum(record[metric] for record in records))
+    overview['avg_deal_value_30_days'] = plain_value(records[-1]['avg_deal_value_30_days'])
+    return {'overview': overview}
+
+# The window of a rep's records as requested ("latest=30", "from=...&to=..."),
+# so analyses of different windows are never diffed against each other
+def rep_window(latest=None, start=None, end=None):
+    if latest is not None:
+        return f"latest={latest}"
+    return '&'.join(f"{name}={value:%Y-%m-%d}" for name, value in (('from', start), ('to', end))
+                    if value is not None)
+
+# Plan an incremental analysis of one representative's `window` (see
+# incremental_analysis.py)
+def rep_analysis(rep_id, rep_records, summarized_rep_data, window, force_full=False):
+    name = rep_records[0].get('employee_name')
+    label = f"{name} (#{rep_id})" if isinstance(name, str) else f"#{rep_id}"
+    return plan_analysis(
+        get_snapshot_store(), f'rep:{rep_id}:{window}', rep_snapshot(rep_records),
+        lambda: ('feedback_chain', {'rep_data': summarized_rep_data}),
+        'feedback_update_chain', {'rep': label},
+        full_tokens=count_tokens(summarized_rep_data), force_full=force_full
+    )
+
+# Run a planned incremental analysis and record it as the subject's latest
+# (a flow, see llm_flow.py). Returns (narrative, prompt tokens sent)
+def analysis_flow(plan, data_version=None, refresh=False):
+    if plan.mode == 'unchanged':
+        return plan.narrative, 0
+    chain = getattr((yield Blocking(chains)), plan.chain)
+    narrative = yield LLMCall(chain, data_version, plan.inputs, refresh)
+    yield Blocking(plan.save, get_snapshot_store(), narrative, data_version)
+    return narrative, plan.prompt_tokens(chain)
+
+def run_analysis(plan, data_version=None, refresh=False):
+    return run_flow(analysis_flow(plan, data_version, refresh))
+
+# Feedback for one representative: the precomputed answer for these exact
+# rows when there is one (see precompute_feedback.py), else a new one --
+# incremental, from the changes since the rep's last analysis of the same
+# window, if asked. With refresh, a new full answer is generated and
+# replaces the stored one.
+# Returns (feedback, response fields describing how it was produced)
+def rep_feedback_flow(rep_id, rep_records, data_version=None, refresh=False, incremental=False,
+                      window='latest=1'):
+    with stage('prompt'):
+        summarized_rep_data = summarize_rep_records(rep_records)
+    content_hash = feedback_hash(summarized_rep_data)
+    store = get_feedback_store()
+    if not refresh:
+        stored = yield Blocking(store.get, content_hash, stage='store')
+        if stored is not None:
+            return stored, {"precomputed": True}
+    if incremental:
+        plan = yield Blocking(rep_analysis, rep_id, rep_records, summarized_rep_data, window, refresh)
+        feedback, prompt_tokens = yield from analysis_flow(plan, data_version, refresh)
+        details = {"precomputed": False, "analysis": plan.mode, "prompt_tokens": prompt_tokens}
+    else:
+        llm_chains = yield Blocking(chains)
+        feedback = yield LLMCall(llm_chains.feedback_chain, data_version,
+                                 {'rep_data': summarized_rep_data}, refresh)
+        details = {"precomputed": False}
+    if refresh:
+        yield Blocking(store.put, rep_id, content_hash, feedback, data_version)
+    return feedback, details
+
+def rep_feedback(rep_id, rep_records, data_version=None, refresh=False, incremental=False, window='latest=1'):
+    return run_flow(rep_feedback_flow(rep_id, rep_records, data_version, refresh, incremental, window))
+
+def wants_refresh(args):
+    return args.get('refresh') in ('1', 'true')
+
+# incremental=1 in the query or "incremental": true in the body; without
+# either, INCREMENTAL_ANALYSIS decides
+def wants_incremental(value):
+    if value is None:
+        return INCREMENTAL_ANALYSIS
+    if isinstance(value, str):
+        return value in ('1', 'true')
+    return bool(value)
+
+class LLMRequestError(Exception):
+    """A request the LLM routes can't serve, with the HTTP status to answer."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+# Validate a rep_performance query and look up the representative's records.
+# Optional parameters: latest=N (most recent N days, default 1 when no date
+# range is given) and from/to (inclusive YYYY-MM-DD bounds).
+# Returns (rep_id, records, data version, window)
+def rep_request(args):
+    rep_id = args.get('rep_id')
+    if not rep_id:
+        raise LLMRequestError("Representative ID is required")
+    if not rep_id.isdigit():
+        raise LLMRequestError("Representative ID must be an integer")
+
+    latest = args.get('latest')
+    if latest is not None and not latest.isdigit():
+        raise LLMRequestError("latest must be a positive integer")
+    latest = int(latest) if latest is not None else None
+    try:
+        start = parse_date_param(args.get('from'))
+        end = parse_date_param(args.get('to'))
+        check_date_range(start, end)
+    except ValueError as e:
+        raise LLMRequestError(str(e))
+    if latest is None and start is None and end is None:
+        latest = 1
+    if latest is not None and latest < 1:
+        raise LLMRequestError("latest must be a positive integer")
+
+    with stage('load'):
+        rep_index = load_rep_index()
+        data_version = sales_store.version
+    if rep_index is None:
+        raise LLMRequestError("Failed to load sales data", 500)
+
+    with stage('filter'):
+        rep_records = get_rep_data(rep_id, rep_index, latest=latest, start=start, end=end)
+    if not rep_records:
+        raise LLMRequestError(f"No data found for representative ID {rep_id}", 404)
+    return rep_id, rep_records, data_version, rep_window(latest, start, end)
+
+# Validate a batch request and look up every representative in one data
+# snapshot. Returns (errors, {rep_id: records}, data version, concurrency, window)
+def batch_request(data):
+    if not data or 'rep_ids' not in data:
+        raise LLMRequestError("rep_ids field is required in the JSON payload")
+
+    latest = data.get('latest', 1)
+    concurrency = data.get('concurrency', BATCH_CONCURRENCY)
+    if not isinstance(latest, int) or latest < 1:
+        raise LLMRequestError("latest must be a positive integer")
+    if not isinstance(concurrency, int) or concurrency < 1:
+        raise LLMRequestError("concurrency must be a positive integer")
+    concurrency = min(concurrency, MAX_BATCH_CONCURRENCY)
+
+    with stage('load'):
+        rep_index = load_rep_index()
+    if rep_index is None:
+        raise LLMRequestError("Failed to load sales data", 500)
+    data_version = sales_store.version
+
+    rep_ids = data['rep_ids']
+    if rep_ids == 'all':
+        rep_ids = rep_index.employee_ids()
+    elif not isinstance(rep_ids, list):
+        raise LLMRequestError("rep_ids must be a list of ids or \"all\"")
+
+    reps = {}
+    errors = []
+    for rep_id in rep_ids:
+        if not str(rep_id).isdigit():
+            errors.append({"rep_id": rep_id, "error": "Representative ID must be an integer"})
+            continue
+        rep_records = get_rep_data(rep_id, rep_index, latest=latest)
+        if not rep_records:
+            errors.append({"rep_id": rep_id, "error": f"No data found for representative ID {rep_id}"})
+            continue
+        reps[rep_id] = rep_records
+    return errors, reps, data_version, concurrency, rep_window(latest)
+
+# Validate a team_performance request and summarize the dataset under its
+# token budget, once per data version. Only the default budget's summary is
+# kept for the whole version; other budgets share a small LRU.
+# Returns (prompt input, prompt tokens, token budget, data version)
+def team_request(data):
+    token_budget = _team_token_budget(data)
+
+    try:
+        with stage('summarize'):
+            data_version = sales_store.version
+            derived = sales_store.derived if token_budget == TEAM_PROMPT_TOKEN_BUDGET else sales_store.derived_lru
+            team_data, prompt_tokens = derived(
+                f'team_summary:{token_budget}',
+                lambda df: compact_team_data(df, token_budget)
+            )
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        raise LLMRequestError("Failed to load sales data", 500)
+    return team_data + "\n" + data['summary'], prompt_tokens, token_budget, data_version
+
+# Endpoint for representative performance (parameters: see rep_request).
+# Precomputed feedback is served when the rep's rows haven't changed since;
+# refresh=1 generates it afresh and incremental=1 analyzes only the changes
+# since the rep's last analysis
+@bp.route('/api/rep_performance', methods=['GET'])
+def rep_performance():
+    rep_id, rep_records, data_version, window = rep_request(request.args)
+
+    # ?stream=1 or Accept: text/event-stream forwards tokens as they arrive
+    if wants_stream(request):
+        return sse_response(stream_chain(
+            get_llm_cache(), chains().feedback_chain, data_version,
+            metadata={"rep_id": rep_id, "records": len(rep_records)},
+            rep_data=summarize_rep_records(rep_records)
+        ))
+
+    feedback, details = rep_feedback(rep_id, rep_records, data_version,
+                                     refresh=wants_refresh(request.args),
+                                     incremental=wants_incremental(request.args.get('incremental')),
+                                     window=window)
+    with stage('serialize'):
+        return jsonify({
+            "rep_id": rep_id,
+            "records": len(rep_records),
+            "feedback": feedback,
+            **details
+        })
+
+# Endpoint for feedback on many representatives at once
+# JSON body: {"rep_ids": [183, 185] or "all", "latest": N, "concurrency": N,
+# "refresh": true, "incremental": true}
+# Results are streamed as newline-delimited JSON in completion order
+@bp.route('/api/rep_performance/batch', methods=['POST'])
+def rep_performance_batch():
+    data = request.get_json(silent=True)
+    errors, reps, data_version, concurrency, window = batch_request(data)
+    refresh = bool(data.get('refresh'))
+    incremental = wants_incremental(data.get('incremental'))
+
+    def generate():
+        for error in errors:
+            yield json.dumps(error) + "\n"
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        try:
+            # Each call runs in a copy of the request context so its
+            # stage timings and token counts are labelled with this endpoint
+            futures = {
+                executor.submit(contextvars.copy_context().run,
+                                rep_feedback, rep_id, rep_records, data_version, refresh, incremental,
+                                window): rep_id
+                for rep_id, rep_records in reps.items()
+            }
+            for future in as_completed(futures):
+                rep_id = futures[future]
+                try:
+                    feedback, details = future.result()
+                    result = {"rep_id": rep_id, "feedback": feedback, **details}
+                except Exception as e:
+                    result = {"rep_id": rep_id, "error": str(e)}
+                yield json.dumps(result) + "\n"
+        finally:
+            # Drop queued calls if the client disconnects mid-stream
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def _team_token_budget(data):
+    if not data or 'summary' not in data:
+        raise LLMRequestError("Summary field is required in the JSON payload")
+    token_budget = data.get('token_budget', TEAM_PROMPT_TOKEN_BUDGET)
+    if not isinstance(token_budget, int) or token_budget < 1:
+        raise LLMRequestError("token_budget must be a positive integer")
+    if token_budget > MAX_TEAM_PROMPT_TOKEN_BUDGET:
+        raise LLMRequestError(f"token_budget must be at most {MAX_TEAM_PROMPT_TOKEN_BUDGET}")
+    return token_budget
+
+# Plan an incremental team analysis (see incremental_analysis.py); the full
+# summary is only built when there is no usable snapshot.
+# Returns (plan, token budget, data version)
+def team_analysis(data):
+    token_budget = _team_token_budget(data)
+    try:
+        with stage('summarize'):
+            data_version = sales_store.version
+            metrics = sales_store.derived('team_snapshot', team_snapshot)
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        raise LLMRequestError("Failed to load sales data", 500)
+
+    def full():
+        return 'team_performance_chain', {'team_data': team_request(data)[0]}
+
+    # The full summary is at most token_budget tokens
+    plan = plan_analysis(get_snapshot_store(), 'team', metrics, full, 'team_update_chain',
+                         {'question': data['summary']}, context=data['summary'],
+                         full_tokens=token_budget + count_tokens(data['summary']))
+    return plan, token_budget, data_version
+
+# Validate the map-reduce options of a team_performance request:
+# "map_reduce": true, or an object with "partition_by" ("employee" or
+# "window"), "depth" and "fan_out". Returns (partition_by, depth, fan_out),
+# or None when the request doesn't ask for a map-reduce analysis
+def map_reduce_request(data):
+    options = data.get('map_reduce') if data else None
+    if not options:
+        return None
+    if not isinstance(options, dict):
+        options = {}
+    partition_by = options.get('partition_by', 'employee')
+    depth = options.get('depth', MAP_REDUCE_DEPTH)
+    fan_out = options.get('fan_out', MAP_REDUCE_FAN_OUT)
+    if partition_by not in PARTITION_BY:
+        raise LLMRequestError("partition_by must be one of: " + ', '.join(PARTITION_BY))
+    if not isinstance(depth, int) or depth < 1:
+        raise LLMRequestError("depth must be a positive integer")
+    if not isinstance(fan_out, int) or fan_out < 2:
+        raise LLMRequestError("fan_out must be an integer of at least 2")
+    if fan_out ** depth > MAX_MAP_REDUCE_PARTITIONS:
+        raise LLMRequestError(f"fan_out ** depth must be at most {MAX_MAP_REDUCE_PARTITIONS}")
+    return partition_by, depth, fan_out
+
+# What is left of a per-call token budget for the inputs of `template`,
+# after its own text and `extra` (e.g. the question asked)
+def input_budget(token_budget, template, extra=''):
+    return max(token_budget - count_tokens(template) - count_tokens(extra), 1)
+
+# One LLM call, with the size of its prompt: (completion, prompt tokens)
+def chain_call_flow(chain, data_version, **inputs):
+    completion = yield LLMCall(chain, data_version, inputs)
+    return completion, count_tokens(chain.prompt.format(**inputs))
+
+# Partition labels stay within this many tokens
+PARTITION_LABEL_TOKENS = 16
+# Fewest tokens of data a partition prompt, and of each summary a reduce
+# prompt, must have room for
+MIN_PARTITION_TOKENS = 64
+MIN_SUMMARY_TOKENS = 16
+MAP_REDUCE_HEADING = "Summaries of the team's sales data, part by part:\n"
+
+# Smallest per-call budget that fits every prompt of a map-reduce analysis:
+# a partition with its label, or fan_out summaries with theirs (reduced
+# summaries carry two labels) plus, in the final call, the question
+def map_reduce_min_budget(question, fan_out):
+    summaries = fan_out * (2 * PARTITION_LABEL_TOKENS + 4 + MIN_SUMMARY_TOKENS)
+    return max(
+        count_tokens(PARTITION_SUMMARY_TEMPLATE) + PARTITION_LABEL_TOKENS + MIN_PARTITION_TOKENS,
+        count_tokens(SUMMARY_REDUCE_TEMPLATE) + summaries,
+        count_tokens(TEAM_PERFORMANCE_TEMPLATE) + count_tokens(MAP_REDUCE_HEADING + question) + summaries,
+    )
+
+# Partition the data for a map-reduce analysis, once per data version.
+# Returns (partitions, token budget, data version)
+def team_partitions(data, options):
+    token_budget = _team_token_budget(data)
+    partition_by, depth, fan_out = options
+    min_budget = map_reduce_min_budget(data['summary'], fan_out)
+    if token_budget < min_budget:
+        raise LLMRequestError(f"token_budget must be at least {min_budget} for this map_reduce analysis")
+    part_budget = input_budget(token_budget, PARTITION_SUMMARY_TEMPLATE) - PARTITION_LABEL_TOKENS
+    try:
+        with stage('summarize'):
+            data_version = sales_store.version
+            # Request-dependent names: kept in the bounded LRU, not per version
+            partitions = sales_store.derived_lru(
+                f'team_partitions:{partition_by}:{fan_out ** depth}:{part_budget}',
+                lambda df: partition_team_data(df, partition_by, fan_out ** depth, part_budget)
+            )
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        raise LLMRequestError("Failed to load sales data", 500)
+    if not partitions:
+        raise LLMRequestError("No sales data available", 404)
+    return partitions, token_budget, data_version
+
+# Prompt input of the final map-reduce call: the remaining summaries and
+# the question asked
+def map_reduce_team_data(summaries, data, token_budget):
+    budget = input_budget(token_budget, TEAM_PERFORMANCE_TEMPLATE, MAP_REDUCE_HEADING + data['summary'])
+    return MAP_REDUCE_HEADING + combine_summaries(summaries, budget) + "\n" + data['summary']
+
+# Summarize the whole history partition by partition (see
+# map_reduce_summary.py), every prompt within the request's token budget.
+# Returns (prompt input of the final call, stats, token budget, data version)
+def team_map_reduce_flow(data, options):
+    partitions, token_budget, data_version = yield Blocking(team_partitions, data, options)
+    partition_by, depth, fan_out = options
+    llm_chains = yield Blocking(chains)
+    stats = MapReduceStats(partition_by, depth, fan_out)
+    summaries = yield from summarize_partitions(
+        partitions,
+        lambda label, text: chain_call_flow(llm_chains.partition_summary_chain, data_version,
+                                            part=label, part_data=text),
+        lambda combined: chain_call_flow(llm_chains.summary_reduce_chain, data_version, summaries=combined),
+        fan_out, input_budget(token_budget, SUMMARY_REDUCE_TEMPLATE), stats
+    )
+    return map_reduce_team_data(summaries, data, token_budget), stats, token_budget, data_version
+
+# Team insights for a team_performance request body ("incremental": true
+# analyzes only what changed since the team's last analysis; "map_reduce"
+# summarizes the whole history part by part first)
+def team_performance_flow(data):
+    options = map_reduce_request(data)
+    if options is not None:
+        team_data_summary, stats, token_budget, data_version = yield from team_map_reduce_flow(data, options)
+        llm_chains = yield Blocking(chains)
+        insights, prompt_tokens = yield from chain_call_flow(llm_chains.team_performance_chain, data_version,
+                                                             team_data=team_data_summary)
+        stats.record([(insights, prompt_tokens)])
+        return {
+            "insights": insights,
+            "prompt_tokens": prompt_tokens,
+            "token_budget": token_budget,
+            "map_reduce": stats.as_dict()
+        }
+    if wants_incremental(data.get('incremental') if data else None):
+        plan, token_budget, data_version = yield Blocking(team_analysis, data)
+        insights, prompt_tokens = yield from analysis_flow(plan, data_version)
+        return {
+            "insights": insights,
+            "prompt_tokens": prompt_tokens,
+            "token_budget": token_budget,
+            "analysis": plan.mode
+        }
+    team_data_summary, prompt_tokens, token_budget, data_version = yield Blocking(team_request, data)
+    llm_chains = yield Blocking(chains)
+    insights = yield LLMCall(llm_chains.team_performance_chain, data_version, {'team_data': team_data_summary})
+    return {
+        "insights": insights,
+        "prompt_tokens": prompt_tokens,
+        "token_budget": token_budget
+    }
+
+def team_performance(data):
+    return run_flow(team_performance_flow(data))
+
+# Prompt input of a streamed team analysis, with the metadata sent ahead of
+# its tokens. With map_reduce, the partitions are summarized before the
+# final call starts streaming. Returns (prompt input, metadata, data version)
+def team_stream_flow(data):
+    options = map_reduce_request(data)
+    if options is not None:
+        team_data_summary, stats, token_budget, data_version = yield from team_map_reduce_flow(data, options)
+        return team_data_summary, {"token_budget": token_budget, "map_reduce": stats.as_dict()}, data_version
+    team_data_summary, prompt_tokens, token_budget, data_version = yield Blocking(team_request, data)
+    return team_data_summary, {"token_budget": token_budget}, data_version
+
+# Background job running team_performance (see job_queue.py)
+def team_performance_job(data):
+    try:
+        return team_performance(data), 200
+    except LLMRequestError as e:
+        return {"error": str(e)}, e.status
+
+# ?async=1 queues the analysis and answers 202 with a job id to poll at
+# /api/jobs/<id>; an identical request against the same data reuses its job
+@bp.route('/api/team_performance', methods=['POST'])
+def post_team_performance():
+    if wants_job(request):
+        return job_accepted(*get_job_queue().submit('team_performance', request.json,
+                                                    sales_store.version))
+
+    if wants_stream(request):
+        team_data_summary, metadata, data_version = run_flow(team_stream_flow(request.json))
+        return sse_response(stream_chain(
+            get_llm_cache(), chains().team_performance_chain, data_version,
+            metadata=metadata, team_data=team_data_summary
+        ))
+
+    payload = team_performance(request.json)
+    with stage('serialize'):
+        return jsonify(payload)
+
+@bp.errorhandler(LLMRequestError)
+def llm_request_error(e):
+    return jsonify({"error": str(e)}), e.status
+
+# Calls the LLM gateway gave up on: no rate-limit capacity in time, or the
+# provider still failing after every retry
+@bp.errorhandler(LLMUnavailable)
+def llm_unavailable(e):
+    return jsonify({"error": str(e)}), 503, {"Retry-After": "5"}
+
+# Queue depth, wait times, retries and coalesced calls of the LLM gateway
+@bp.route('/api/llm_gateway/stats', methods=['GET'])
+def llm_gateway_stats():
+    return jsonify(get_llm_gateway().stats())
+
+# Hit/miss counters of the LLM response cache
+@bp.route('/api/llm_cache/stats', methods=['GET'])
+def llm_cache_stats():
+    return jsonify(get_llm_cache().stats())
+
+# The same gateway and cache counters, as gauges on /metrics
+registry.register_stats('llm_gateway', lambda: get_llm_gateway().stats(), 'LLM gateway state')
+registry.register_stats('llm_cache', lambda: get_llm_cache().stats(), 'LLM response cache state')
+registry.register_stats('rep_feedback', lambda: get_feedback_store().stats(), 'Precomputed feedback store state')
+
+# Load the chains and the representative index up front
+def preload():
+    chains()
+    load_rep_index()
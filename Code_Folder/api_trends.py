@@ -0,0 +1,73 @@
+import logging
+
+from flask import Blueprint, jsonify, request
+
+from api_jobs import job_accepted, wants_job
+from job_queue import get_job_queue
+from rep_index import check_date_range, parse_date_param
+from sales_data_store import get_store
+from tracing import stage
+from trend_rollups import TrendRollups
+
+# Performance trends over time, answered from per-version rollup tables
+bp = Blueprint('trends', __name__)
+
+# Shared, versioned copy of the sales data CSV
+sales_store = get_store('data/sales_performance_data.csv')
+
+# Answer a performance_trends request body; returns (payload, status).
+# Also run as a background job (see job_queue.py)
+def performance_trends(data):
+    if not data or 'time_period' not in data:
+        return {"error": "Time period is required in the JSON payload"}, 400
+
+    time_period = data['time_period']
+    metric = data.get('metric', 'revenue_confirmed')
+    try:
+        start = parse_date_param(data.get('from'))
+        end = parse_date_param(data.get('to'))
+        check_date_range(start, end)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Served from rollup tables built once per data version
+    try:
+        with stage('rollups'):
+            rollups = sales_store.derived('trend_rollups', TrendRollups)
+    except Exception as e:
+        print(f"Error loading CSV: {e}")
+        return {"error": "Failed to load sales data"}, 500
+    try:
+        with stage('query'):
+            trends = rollups.query(metric, time_period, start=start, end=end,
+                                   employee_id=data.get('employee_id'),
+                                   agg=data.get('agg', 'sum'))
+    except (KeyError, ValueError) as e:
+        return {"error": e.args[0]}, 400
+
+    trend_summary = f"Trends for the period: {time_period}."
+    return {
+        "time_period": time_period,
+        "metric": metric,
+        "trends": dict(trends),
+        "trend_summary": trend_summary
+    }, 200
+
+# ?async=1 queues the analysis and answers 202 with a job id to poll at
+# /api/jobs/<id>
+@bp.route('/api/performance_trends', methods=['POST'])
+def post_performance_trends():
+    try:
+        if wants_job(request):
+            return job_accepted(*get_job_queue().submit('performance_trends', request.json,
+                                                        sales_store.version))
+        payload, status = performance_trends(request.json)
+        with stage('serialize'):
+            return jsonify(payload), status
+    except Exception as e:
+        logging.error("Unexpected error: %s", str(e))
+        return jsonify({"error": "An unexpected error occurred"}), 500
+
+# Build the rollup tables up front
+def preload():
+    sales_store.derived('trend_rollups', TrendRollups)
@@ -0,0 +1,69 @@
+import importlib
+import os
+import time
+
+from flask import Flask, jsonify
+
+from sales_data_store import get_store
+from startup import phases, startup_report
+from tracing import instrument_app
+
+# Route groups and the modules defining their blueprints. The modules only
+# import what route registration needs; heavy dependencies and the data
+# load on first use (or up front with preload)
+BLUEPRINTS = {
+    'llm': 'api_llm',
+    'trends': 'api_trends',
+    'charts': 'api_charts',
+    'jobs': 'api_jobs',
+}
+
+# PRELOAD=1 loads the data and every subsystem before serving, trading a
+# slower start for no first-request penalty
+PRELOAD = os.environ.get('PRELOAD', '0') == '1'
+
+
+def _timed(name, fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    phases[name] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def create_app(blueprints=None, preload=PRELOAD):
+    """Build the sales API with the given route groups (default: all).
+
+    Every phase is timed; GET /api/startup reports the timings, which lazy
+    subsystems have loaded so far and the process's memory.
+    """
+    started = time.perf_counter()
+    app = Flask(__name__)
+
+    # Per-request and per-stage timings, served at /metrics
+    instrument_app(app)
+
+    modules = []
+    for name in blueprints or BLUEPRINTS:
+        if name not in BLUEPRINTS:
+            raise ValueError(f"Unknown route group: {name}")
+        module = _timed(f'import_{name}', importlib.import_module, BLUEPRINTS[name])
+        app.register_blueprint(module.bp)
+        modules.append((name, module))
+
+    @app.route('/api/startup', methods=['GET'])
+    def startup():
+        return jsonify(startup_report())
+
+    if preload:
+        _timed('load_data', get_store().reload)
+        for name, module in modules:
+            _timed(f'preload_{name}', module.preload)
+
+    phases['create_app'] = round((time.perf_counter() - started) * 1000, 1)
+    return app
+
+
+if __name__ == '__main__':
+    app = create_app()
+    print(f"Startup: {startup_report()}")
+    app.run(threaded=True)
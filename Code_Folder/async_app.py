@@ -0,0 +1,254 @@
+import asyncio
+import contextvars
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+
+import api_llm
+import api_trends
+from llm_cache import get_llm_cache
+from llm_flow import arun_flow
+from llm_gateway import LLMUnavailable, get_llm_gateway
+from job_queue import get_job_queue
+from llm_streaming import astream_chain
+from sales_data_store import get_store
+from startup import phases, startup_report
+from tracing import instrument_aiohttp
+
+# Async serving mode for the LLM and trends endpoints. The routes, payloads
+# and errors are those of api_llm.py and api_trends.py, but each request is
+# a coroutine: while it waits on the LLM it holds no thread, so one process
+# keeps hundreds of LLM calls in flight. Pandas work (index lookups, prompt
+# summaries, rollup queries) runs on a small thread pool so it never blocks
+# the event loop. Charts stay on the threaded app, where rendering already
+# runs in a process pool.
+#
+#     python async_app.py               (PORT, default 5000)
+
+# Threads for the CPU-bound part of requests
+ASYNC_CPU_WORKERS = int(os.environ.get('ASYNC_CPU_WORKERS', str(min(8, os.cpu_count() or 1))))
+
+PRELOAD = os.environ.get('PRELOAD', '0') == '1'
+
+_executor_key = web.AppKey('executor', ThreadPoolExecutor)
+
+
+async def _cpu(request, fn, *args):
+    """Run `fn(*args)` on the CPU pool, keeping the request's context (for
+    stage timings and endpoint labels)."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(request.app[_executor_key], context.run, fn, *args)
+
+
+async def _json_body(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+def _wants_job(request):
+    """True if the client asked to run the analysis as a job (?async=1)."""
+    return request.query.get('async') in ('1', 'true')
+
+
+async def _job_accepted(request, kind, data):
+    data_version = await _cpu(request, lambda: get_store().version)
+    job_id, created = await asyncio.to_thread(get_job_queue().submit, kind, data, data_version)
+    url = f"/api/jobs/{job_id}"
+    return web.json_response({"job_id": job_id, "duplicate": not created, "url": url},
+                             status=202, headers={"Location": url})
+
+
+def _wants_stream(request):
+    """True if the client asked for Server-Sent Events (?stream=1 or Accept)."""
+    if request.query.get('stream') in ('1', 'true'):
+        return True
+    return 'text/event-stream' in request.headers.get('Accept', '')
+
+
+async def _sse(request, events):
+    response = web.StreamResponse(headers={
+        'Content-Type': 'text/event-stream',
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
+    await response.prepare(request)
+    async for event in events:
+        await response.write(event.encode('utf-8'))
+    await response.write_eof()
+    return response
+
+
+@web.middleware
+async def errors(request, handler):
+    """Answer errors the way the Flask blueprints' error handlers do."""
+    try:
+        return await handler(request)
+    except web.HTTPException:
+        raise
+    except api_llm.LLMRequestError as e:
+        return web.json_response({"error": str(e)}, status=e.status)
+    except LLMUnavailable as e:
+        return web.json_response({"error": str(e)}, status=503, headers={"Retry-After": "5"})
+    except Exception as e:
+        print(f"Unexpected error in {request.path}: {e}")
+        return web.json_response({"error": "An unexpected error occurred"}, status=500)
+
+
+async def _flow(request, flow):
+    """Run one of api_llm's flows (see llm_flow.py) on the event loop, its
+    blocking steps on the CPU pool."""
+    return await arun_flow(flow, lambda fn, *args: _cpu(request, fn, *args))
+
+
+async def rep_performance(request):
+    rep_id, rep_records, data_version, window = await _cpu(request, api_llm.rep_request, request.query)
+
+    if _wants_stream(request):
+        chains = await _cpu(request, api_llm.chains)
+        return await _sse(request, astream_chain(
+            get_llm_cache(), chains.feedback_chain, data_version,
+            metadata={"rep_id": rep_id, "records": len(rep_records)},
+            rep_data=api_llm.summarize_rep_records(rep_records)
+        ))
+
+    feedback, details = await _flow(request, api_llm.rep_feedback_flow(
+        rep_id, rep_records, data_version, api_llm.wants_refresh(request.query),
+        api_llm.wants_incremental(request.query.get('incremental')), window))
+    return web.json_response({
+        "rep_id": rep_id,
+        "records": len(rep_records),
+        "feedback": feedback,
+        **details
+    })
+
+
+async def rep_performance_batch(request):
+    data = await _json_body(request)
+    errors, reps, data_version, concurrency, window = await _cpu(request, api_llm.batch_request, data)
+    refresh = bool(data.get('refresh'))
+    incremental = api_llm.wants_incremental(data.get('incremental'))
+
+    response = web.StreamResponse(headers={'Content-Type': 'application/x-ndjson'})
+    await response.prepare(request)
+    for error in errors:
+        await response.write((json.dumps(error) + "\n").encode('utf-8'))
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def feedback(rep_id, rep_records):
+        async with slots:
+            try:
+                feedback, details = await _flow(request, api_llm.rep_feedback_flow(
+                    rep_id, rep_records, data_version, refresh, incremental, window))
+                return {"rep_id": rep_id, "feedback": feedback, **details}
+            except Exception as e:
+                return {"rep_id": rep_id, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(feedback(rep_id, rep_records)) for rep_id, rep_records in reps.items()]
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            await response.write((json.dumps(await next_result) + "\n").encode('utf-8'))
+    finally:
+        # Drop outstanding calls if the client disconnects mid-stream
+        for task in tasks:
+            task.cancel()
+    await response.write_eof()
+    return response
+
+
+async def team_performance(request):
+    data = await _json_body(request)
+    if _wants_job(request):
+        return await _job_accepted(request, 'team_performance', data)
+
+    if _wants_stream(request):
+        team_data_summary, metadata, data_version = await _flow(request, api_llm.team_stream_flow(data))
+        chains = await _cpu(request, api_llm.chains)
+        return await _sse(request, astream_chain(
+            get_llm_cache(), chains.team_performance_chain, data_version,
+            metadata=metadata, team_data=team_data_summary
+        ))
+
+    return web.json_response(await _flow(request, api_llm.team_performance_flow(data)))
+
+
+async def performance_trends(request):
+    data = await _json_body(request)
+    if _wants_job(request):
+        return await _job_accepted(request, 'performance_trends', data)
+    payload, status = await _cpu(request, api_trends.performance_trends, data)
+    return web.json_response(payload, status=status)
+
+
+async def get_job(request):
+    job_id = request.match_info['job_id']
+    job = await asyncio.to_thread(get_job_queue().get, job_id)
+    if job is None:
+        return web.json_response({"error": f"No job with ID {job_id}"}, status=404)
+    return web.json_response(job)
+
+
+async def llm_gateway_stats(request):
+    return web.json_response(get_llm_gateway().stats())
+
+
+async def llm_cache_stats(request):
+    return web.json_response(await asyncio.to_thread(get_llm_cache().stats))
+
+
+async def startup(request):
+    return web.json_response(startup_report())
+
+
+def create_async_app(preload=PRELOAD):
+    """Build the aiohttp app serving the LLM and trends endpoints.
+
+    Route names match the Flask endpoints, so /metrics labels are the same
+    in both serving modes.
+    """
+    started = time.perf_counter()
+    app = web.Application()
+    instrument_aiohttp(app)
+    app.middlewares.append(errors)
+
+    routes = [
+        ('GET', '/api/rep_performance', rep_performance, 'llm.rep_performance'),
+        ('POST', '/api/rep_performance/batch', rep_performance_batch, 'llm.rep_performance_batch'),
+        ('POST', '/api/team_performance', team_performance, 'llm.post_team_performance'),
+        ('POST', '/api/performance_trends', performance_trends, 'trends.post_performance_trends'),
+        ('GET', '/api/jobs/{job_id}', get_job, 'jobs.get_job'),
+        ('GET', '/api/llm_gateway/stats', llm_gateway_stats, 'llm.llm_gateway_stats'),
+        ('GET', '/api/llm_cache/stats', llm_cache_stats, 'llm.llm_cache_stats'),
+        ('GET', '/api/startup', startup, 'startup'),
+    ]
+    for method, path, handler, name in routes:
+        app.router.add_route(method, path, handler, name=name)
+
+    async def start_executor(app):
+        app[_executor_key] = ThreadPoolExecutor(max_workers=ASYNC_CPU_WORKERS,
+                                                thread_name_prefix='async-cpu')
+        # Resume jobs queued before a restart
+        await asyncio.to_thread(get_job_queue)
+        if preload:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(app[_executor_key], get_store().reload)
+            await loop.run_in_executor(app[_executor_key], api_llm.preload)
+            await loop.run_in_executor(app[_executor_key], api_trends.preload)
+
+    async def stop_executor(app):
+        app[_executor_key].shutdown(wait=False, cancel_futures=True)
+
+    app.on_startup.append(start_executor)
+    app.on_cleanup.append(stop_executor)
+    phases['create_async_app'] = round((time.perf_counter() - started) * 1000, 1)
+    return app
+
+
+if __name__ == '__main__':
+    web.run_app(create_async_app(), port=int(os.environ.get('PORT', '5000')))
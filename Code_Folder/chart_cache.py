@@ -0,0 +1,112 @@
+import functools
+import gzip
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flask import Response, request
+
+# Default upper bound on the total size of cached chart bodies
+CHART_CACHE_BYTES = 64 * 1024 * 1024
+
+
+class ChartCache:
+    """LRU cache of rendered chart bodies, bounded by their total size."""
+
+    def __init__(self, max_bytes=CHART_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.counters = {'hits': 0, 'misses': 0, 'evictions': 0, 'not_modified': 0}
+
+    def get(self, key):
+        """Return (body, etag) for `key`, or None if it isn't cached."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.counters['hits'] += 1
+            return entry
+
+    def put(self, key, body):
+        """Cache `body` under `key` and return (body, etag)."""
+        entry = (body, hashlib.sha256(body).hexdigest()[:32])
+        if len(body) > self.max_bytes:
+            return entry
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self._entries[key] = entry
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.counters['evictions'] += 1
+        return entry
+
+    def record_not_modified(self):
+        """Count a request answered with 304 from a cached entry."""
+        with self._lock:
+            self.counters['not_modified'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self.counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self.size
+        return stats
+
+
+def chart_response(body, etag, mimetype, download_name, encoding=None):
+    """Build a chart response, answering a matching If-None-Match with 304.
+
+    A gzip `encoding` means `body` is already gzipped; it is sent as is to
+    clients that accept gzip and decompressed for the rest.
+    """
+    if encoding == 'gzip' and not request.accept_encodings['gzip']:
+        body, encoding = gzip.decompress(body), None
+        # The identity body is a different representation, so a different tag
+        etag += '-identity'
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'inline; filename="{download_name}"'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    response.vary.add('Accept-Encoding')
+    # Clients may keep the body but must revalidate, which is a cheap 304
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_chart(cache, data_version, download_name, mimetype='image/png', encoding=None):
+    """Decorate a view that returns (rendered chart bytes, data version).
+
+    The rendered body is cached under (endpoint, query parameters, data
+    version), so a chart is only drawn again when its inputs or the data
+    change. Lookups use the current `data_version()`; a new body is stored
+    under the version the view says it was drawn from, which can differ
+    when the file changed while rendering. `encoding` is the
+    Content-Encoding the view's bytes are already in, if any.
+    """
+    def decorator(render):
+        @functools.wraps(render)
+        def view(*args, **kwargs):
+            params = tuple(sorted(request.args.items(multi=True)))
+            entry = cache.get((request.endpoint, params, data_version()))
+            if entry is None:
+                body, version = render(*args, **kwargs)
+                entry = cache.put((request.endpoint, params, version), body)
+            body, etag = entry
+            response = chart_response(body, etag, mimetype, download_name, encoding)
+            if response.status_code == 304:
+                cache.record_not_modified()
+            return response
+        return view
+    return decorator
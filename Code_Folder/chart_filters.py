@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+from rep_index import check_date_range, parse_date_param
+
+
+class BadChartRequest(ValueError):
+    """Raised for chart query parameters that can't be used."""
+
+
+def parse_chart_filters(params):
+    """Read the optional from/to (YYYY-MM-DD) and employees filters.
+
+    `employees` is a comma-separated list of employee ids or names. Raises
+    BadChartRequest for bad dates or a `from` after `to`.
+    """
+    try:
+        start = parse_date_param(params.get('from'))
+        end = parse_date_param(params.get('to'))
+        check_date_range(start, end)
+    except ValueError as e:
+        raise BadChartRequest(str(e))
+    employees = [e.strip() for e in (params.get('employees') or '').split(',') if e.strip()]
+    return start, end, employees
+
+
+def filter_chart_data(df, params):
+    """Rows of the date-indexed chart data matching the request filters."""
+    start, end, employees = parse_chart_filters(params)
+    if start is not None or end is not None:
+        df = df.loc[start:end]
+    if employees:
+        ids = [int(e) for e in employees if e.isdigit()]
+        names = [e for e in employees if not e.isdigit()]
+        df = df[df['employee_id'].isin(ids) | df['employee_name'].isin(names)]
+    return df
+
+
+def pixel_width(fig, columns=1):
+    """Width in pixels of one of `columns` equal panels across `fig`."""
+    return max(1, int(fig.get_figwidth() * fig.dpi / columns))
+
+
+def minmax_downsample(df, x, y, series, buckets):
+    """Keep at most two rows per series in each of `buckets` equal-width
+    slices of the `x` range: the ones with the lowest and highest `y`.
+
+    With one slice per horizontal pixel, the drawn lines look the same as
+    with every row, but the number of points no longer grows with history
+    length. All series are bucketed in one vectorized pass, and the kept
+    rows stay in their original order.
+    """
+    df = df.dropna(subset=[x, y, series])
+    if len(df) <= 2 * buckets:
+        return df
+
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype('datetime64[ns]').view('int64')
+    xs = xs.astype('float64')
+    lo, hi = xs.min(), xs.max()
+    if hi == lo:
+        slots = np.zeros(len(xs), dtype='int64')
+    else:
+        slots = np.minimum(((xs - lo) / (hi - lo) * buckets).astype('int64'), buckets - 1)
+    codes = pd.factorize(df[series])[0].astype('int64')
+    groups = codes * buckets + slots
+
+    # Sorting by (group, y) puts each group's min first and its max last
+    order = np.lexsort((df[y].to_numpy(dtype='float64'), groups))
+    ordered = groups[order]
+    firsts = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    lasts = np.r_[firsts[1:], len(order)] - 1
+    keep = np.union1d(order[firsts], order[lasts])
+    return df.iloc[keep]
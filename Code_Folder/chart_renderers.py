@@ -0,0 +1,207 @@
+import base64
+import gzip
+import io
+import json
+
+import matplotlib
+matplotlib.use('Agg')  # Use the Agg backend for non-GUI operations
+
+import pandas as pd
+import seaborn as sns
+from matplotlib.figure import Figure
+
+from chart_filters import filter_chart_data, minmax_downsample, pixel_width
+from sales_features import build_features
+
+# Only the columns the charts use are kept
+CHART_COLUMNS = [
+    'employee_id', 'employee_name', 'dated', 'lead_taken', 'tours_booked', 'applications',
+    'revenue_confirmed', 'tours_per_lead', 'apps_per_tour', 'apps_per_lead',
+    'mon_call', 'tue_call', 'wed_call', 'thur_call', 'fri_call', 'sat_call', 'sun_call',
+]
+
+
+# Preprocess data (dates are parsed with the fixed dd/mm/YYYY format).
+# `features` is the FeatureTable of `sales_df`, built here when not given
+def prepare_chart_data(sales_df, features=None):
+    if features is None:
+        features = build_features(sales_df)
+    df = sales_df[CHART_COLUMNS].join(features.aligned(sales_df.index))
+    df = df.dropna(subset=['dated'])
+    df['month'] = df['dated'].dt.month
+    df['quarter'] = df['dated'].dt.to_period('Q')
+    df['day_of_week'] = df['dated'].dt.day_name()
+    df.set_index('dated', inplace=True)
+    # Date-sorted, so from/to filters are binary searches
+    return df.sort_index(kind='stable')
+
+
+# Width of a plotly figure when none is set
+PLOTLY_WIDTH = 700
+
+
+def time_series(df, params, buckets, aggregate=False):
+    """Filtered revenue series per employee, at most two points per bucket.
+
+    With `aggregate`, rows of the same employee and date are summed first.
+    """
+    data = filter_chart_data(df, params).reset_index()
+    if aggregate:
+        data = data.groupby(['employee_name', 'dated'], sort=False, as_index=False)['revenue_confirmed'].sum()
+        data = data.sort_values('dated', kind='stable')
+    return minmax_downsample(data, 'dated', 'revenue_confirmed', 'employee_name', buckets)
+
+
+# Every renderer draws on its own Figure instead of pyplot's global state,
+# so renders can run side by side in threads or worker processes
+def _png(fig):
+    img = io.BytesIO()
+    fig.savefig(img, format='png')
+    return img.getvalue()
+
+
+def render_line_plot(df, params):
+    fig = Figure(figsize=(14, 7))
+    ax = fig.subplots()
+    data = time_series(df, params, pixel_width(fig))
+    # No bootstrapped confidence band: its cost grows with every row
+    sns.lineplot(data=data, x='dated', y='revenue_confirmed', hue='employee_name', errorbar=None, ax=ax)
+    ax.set_title('Revenue Confirmed Over Time for Each Employee')
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Revenue Confirmed')
+    ax.legend(title='Employee Name', bbox_to_anchor=(1.05, 1), loc='upper left')
+    return _png(fig)
+
+
+def render_histogram(df, params):
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    ax.hist(df['revenue_confirmed'].dropna(), bins=30, edgecolor='k', alpha=0.7)
+    ax.set_title('Distribution of Revenue Confirmed')
+    ax.set_xlabel('Revenue Confirmed')
+    ax.set_ylabel('Frequency')
+    return _png(fig)
+
+
+def render_heatmap(df, params):
+    fig = Figure(figsize=(12, 10))
+    ax = fig.subplots()
+    corr_matrix = df[['lead_taken', 'tours_booked', 'applications', 'revenue_confirmed', 'tours_per_lead', 'apps_per_tour', 'apps_per_lead']].corr()
+    sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', fmt='.2f', ax=ax)
+    ax.set_title('Correlation Heatmap')
+    return _png(fig)
+
+
+def render_box_plot(df, params):
+    fig = Figure(figsize=(12, 7))
+    ax = fig.subplots()
+    sns.boxplot(data=df.reset_index(), x='employee_name', y='revenue_confirmed', ax=ax)
+    ax.tick_params(axis='x', labelrotation=90)
+    ax.set_title('Box Plot of Revenue Confirmed by Employee')
+    ax.set_xlabel('Employee Name')
+    ax.set_ylabel('Revenue Confirmed')
+    return _png(fig)
+
+
+def render_bar_plot(df, params):
+    avg_tours_by_day = df.groupby('day_of_week')['tours_booked'].mean()
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    avg_tours_by_day.plot(kind='bar', color='skyblue', ax=ax)
+    ax.set_title('Average Tours Booked by Day of the Week')
+    ax.set_xlabel('Day of the Week')
+    ax.set_ylabel('Average Tours Booked')
+    ax.tick_params(axis='x', labelrotation=45)
+    return _png(fig)
+
+
+def render_calls_heatmap(df, params):
+    calls_data = df[['mon_call', 'tue_call', 'wed_call', 'thur_call', 'fri_call', 'sat_call', 'sun_call']].sum()
+    calls_df = pd.DataFrame(calls_data).T
+    calls_df.index = ['Calls']
+
+    fig = Figure(figsize=(10, 6))
+    ax = fig.subplots()
+    sns.heatmap(calls_df, annot=True, cmap='YlGnBu', fmt='d', ax=ax)
+    ax.set_title('Heatmap of Total Calls by Day of the Week')
+    return _png(fig)
+
+
+def render_facet_tile(series, params):
+    """One employee's panel of the facet grid (see facet_tiles.py)."""
+    name = params['employee']
+    frame = series.get(name)
+    if frame is None:
+        # Employee dropped from the data since the page was laid out
+        frame = pd.DataFrame({'revenue_confirmed': []}, index=pd.DatetimeIndex([], name='dated'))
+    data = filter_chart_data(frame, {k: params.get(k) for k in ('from', 'to')}).reset_index()
+    fig = Figure(figsize=(4, 4))
+    ax = fig.subplots()
+    data = minmax_downsample(data.assign(employee_name=name), 'dated', 'revenue_confirmed',
+                             'employee_name', pixel_width(fig))
+    sns.lineplot(data=data, x='dated', y='revenue_confirmed', errorbar=None, ax=ax)
+    ax.set_title(name)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Revenue Confirmed')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+    return _png(fig)
+
+
+def _typed_array(values):
+    # Plotly's typed-array encoding: base64 of the raw little-endian values
+    values = values.astype('<f8')
+    return {'dtype': 'f8', 'bdata': base64.b64encode(values.tobytes()).decode('ascii')}
+
+
+def render_interactive_json(df, params):
+    """The interactive line chart as gzipped Plotly figure JSON.
+
+    The browser draws it with plotly.js, so nothing is rasterized here. The
+    spec is written directly instead of through plotly.graph_objects, which
+    would add a ~10 KB default template and validate every trace.
+    """
+    data = time_series(df, params, PLOTLY_WIDTH, aggregate=True)
+    traces = []
+    for name, series in data.groupby('employee_name', sort=True):
+        # Dates as epoch milliseconds, which a date axis accepts as numbers
+        x = series['dated'].to_numpy().astype('datetime64[ms]').astype('int64')
+        traces.append({
+            'type': 'scatter',
+            'mode': 'lines',
+            'name': name,
+            'x': _typed_array(x),
+            'y': _typed_array(series['revenue_confirmed'].to_numpy()),
+        })
+    figure = {
+        'data': traces,
+        'layout': {
+            'title': {'text': 'Revenue Confirmed Over Time for Each Employee'},
+            'xaxis': {'type': 'date', 'title': {'text': 'Date'}},
+            'yaxis': {'title': {'text': 'Revenue Confirmed'}},
+            'legend': {'title': {'text': 'Employee Name'}},
+        },
+    }
+    body = json.dumps(figure, separators=(',', ':')).encode('utf-8')
+    return gzip.compress(body, compresslevel=6)
+
+
+def render_interactive_plot(df, params):
+    import plotly.express as px
+
+    data = time_series(df, params, PLOTLY_WIDTH)
+    fig = px.line(data, x='dated', y='revenue_confirmed', color='employee_name', title='Revenue Confirmed Over Time for Each Employee')
+    return fig.to_image(format='png')
+
+
+RENDERERS = {
+    'line_plot': render_line_plot,
+    'histogram': render_histogram,
+    'heatmap': render_heatmap,
+    'box_plot': render_box_plot,
+    'bar_plot': render_bar_plot,
+    'calls_heatmap': render_calls_heatmap,
+    'facet_tile': render_facet_tile,
+    'interactive_plot': render_interactive_plot,
+    'interactive_json': render_interactive_json,
+}
@@ -0,0 +1,130 @@
+import hashlib
+import io
+import math
+
+import pandas as pd
+
+from chart_filters import BadChartRequest, parse_chart_filters
+
+# Panels per row of a page, and the default and largest page sizes
+TILE_COLUMNS = 4
+DEFAULT_PER_PAGE = 16
+MAX_PER_PAGE = 64
+
+SERIES_COLUMNS = ['employee_id', 'employee_name', 'dated', 'revenue_confirmed']
+
+
+def employee_series(df):
+    """Date-indexed revenue series of each employee name, one sort for all."""
+    data = df[SERIES_COLUMNS].dropna(subset=['employee_name', 'dated'])
+    data = data.sort_values(['employee_name', 'dated'], kind='stable')
+    return {
+        name: group[['dated', 'revenue_confirmed']].set_index('dated')
+        for name, group in data.groupby('employee_name', sort=True)
+    }
+
+
+def tile_index(df):
+    """Per employee name: its employee ids and a hash of its series.
+
+    A tile is cached under its series hash, so when rows are added only the
+    employees whose rows changed get a new hash and a new tile.
+    """
+    data = df[SERIES_COLUMNS].dropna(subset=['employee_name', 'dated'])
+    data = data.sort_values(['employee_name', 'dated'], kind='stable')
+    row_hashes = pd.util.hash_pandas_object(data[['dated', 'revenue_confirmed']], index=False).to_numpy()
+    index = {}
+    for name, rows in data.groupby('employee_name', sort=True).indices.items():
+        digest = hashlib.sha1(row_hashes[rows].tobytes()).hexdigest()
+        ids = set(int(i) for i in data['employee_id'].to_numpy()[rows])
+        index[name] = (ids, digest)
+    return index
+
+
+def parse_page(params):
+    """Read the page (1-based) and per_page query parameters."""
+    values = []
+    for name, default in (('page', 1), ('per_page', DEFAULT_PER_PAGE)):
+        value = params.get(name) or str(default)
+        if not value.isdigit() or int(value) < 1:
+            raise BadChartRequest(f"{name} must be a positive integer")
+        values.append(int(value))
+    page, per_page = values
+    if per_page > MAX_PER_PAGE:
+        raise BadChartRequest(f"per_page can be at most {MAX_PER_PAGE}")
+    return page, per_page
+
+
+def select_employees(index, employees):
+    """Employee names in the grid, narrowed to the ids/names filter."""
+    if not employees:
+        return list(index)
+    ids = set(int(e) for e in employees if e.isdigit())
+    names = set(e for e in employees if not e.isdigit())
+    return [name for name, (name_ids, _) in index.items() if name in names or name_ids & ids]
+
+
+def page_names(names, page, per_page):
+    """The names on one page and the total number of pages."""
+    pages = math.ceil(len(names) / per_page)
+    if page > max(pages, 1):
+        raise BadChartRequest(f"page {page} is out of range ({pages} pages)")
+    return names[(page - 1) * per_page:page * per_page], pages
+
+
+def composite_tiles(tiles, columns=TILE_COLUMNS):
+    """Paste equally sized PNG tiles into one grid image, row by row."""
+    from PIL import Image
+
+    images = [Image.open(io.BytesIO(tile)) for tile in tiles]
+    if not images:
+        images = [Image.new('RGBA', (1, 1), (255, 255, 255, 0))]
+    width, height = images[0].size
+    columns = min(columns, len(images))
+    rows = math.ceil(len(images) / columns)
+    page = Image.new('RGBA', (width * columns, height * rows), (255, 255, 255, 255))
+    for i, image in enumerate(images):
+        page.paste(image, ((i % columns) * width, (i // columns) * height))
+    out = io.BytesIO()
+    page.save(out, format='PNG')
+    return out.getvalue()
+
+
+def render_facet_page(index, params, tile_cache, render_pool, version=None):
+    """Render one page of the per-employee grid.
+
+    Tiles already in `tile_cache` are reused; the rest are rendered in
+    parallel on `render_pool`, cached and then composited into the page.
+    `version` is the data version `index` was built from; tiles a worker
+    drew from another version are composited but not cached.
+    """
+    start, end, employees = parse_chart_filters(params)
+    page, per_page = parse_page(params)
+    names, _ = page_names(select_employees(index, employees), page, per_page)
+
+    window = {key: params[key] for key in ('from', 'to') if params.get(key)}
+    keys = [(name, index[name][1], start, end) for name in names]
+    tiles = {key: tile_cache.get(key) for key in keys}
+    missing = [key for key, entry in tiles.items() if entry is None]
+    rendered = render_pool.render_many(
+        'facet_tile', [dict(window, employee=key[0]) for key in missing]
+    )
+    for key, (body, drawn) in zip(missing, rendered):
+        if version is None or drawn == version:
+            tiles[key] = tile_cache.put(key, body)
+        else:
+            # Drawn from other data than `index` describes; used, not cached
+            tiles[key] = (body, None)
+    return composite_tiles([tiles[key][0] for key in keys])
+
+
+def facet_pages(index, params):
+    """Which employees are on which page, for clients paging through the grid."""
+    _, _, employees = parse_chart_filters(params)
+    _, per_page = parse_page(params)
+    names = select_employees(index, employees)
+    return {
+        'employees': len(names),
+        'per_page': per_page,
+        'pages': [names[i:i + per_page] for i in range(0, len(names), per_page)],
+    }
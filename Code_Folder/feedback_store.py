@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Default on-disk location of the precomputed feedback
+FEEDBACK_STORE_PATH = 'data/rep_feedback.sqlite3'
+
+
+class FeedbackStore:
+    """Representative feedback keyed on the content hash of its prompt.
+
+    Filled ahead of time by precompute_feedback.py; the rep endpoints answer
+    from it whenever a rep's rows hash to a stored entry, so feedback only
+    has to be generated again when those rows change.
+    """
+
+    def __init__(self, path=FEEDBACK_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rep_feedback ("
+            "content_hash TEXT PRIMARY KEY, employee_id TEXT NOT NULL, "
+            "feedback TEXT NOT NULL, data_version TEXT, updated REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS rep_feedback_employee ON rep_feedback (employee_id)"
+        )
+        self._conn.commit()
+        self.counters = {'hits': 0, 'misses': 0, 'stored': 0, 'removed': 0}
+
+    def get(self, content_hash):
+        """Return the feedback stored for `content_hash`, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT feedback FROM rep_feedback WHERE content_hash = ?", (content_hash,)
+            ).fetchone()
+            self.counters['hits' if row is not None else 'misses'] += 1
+        return row[0] if row is not None else None
+
+    def known(self, content_hashes):
+        """The subset of `content_hashes` that have stored feedback."""
+        content_hashes = list(content_hashes)
+        found = set()
+        with self._lock:
+            # In chunks, under SQLite's limit on query parameters
+            for i in range(0, len(content_hashes), 500):
+                chunk = content_hashes[i:i + 500]
+                found.update(row[0] for row in self._conn.execute(
+                    "SELECT content_hash FROM rep_feedback WHERE content_hash IN "
+                    f"({', '.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def put(self, employee_id, content_hash, feedback, data_version=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO rep_feedback "
+                "(content_hash, employee_id, feedback, data_version, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (content_hash, str(employee_id), feedback, data_version, time.time()),
+            )
+            self._conn.commit()
+            self.counters['stored'] += 1
+
+    def retain(self, current):
+        """Keep only the entries of `current` ({employee_id: content hash}):
+        feedback for rows that have since changed, or for reps no longer in
+        the data, is dropped."""
+        current = {str(employee_id): content_hash for employee_id, content_hash in current.items()}
+        with self._lock:
+            rows = self._conn.execute("SELECT content_hash, employee_id FROM rep_feedback").fetchall()
+            stale = [(content_hash,) for content_hash, employee_id in rows
+                     if current.get(employee_id) != content_hash]
+            self._conn.executemany("DELETE FROM rep_feedback WHERE content_hash = ?", stale)
+            self._conn.commit()
+            self.counters['removed'] += len(stale)
+        return len(stale)
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM rep_feedback").fetchone()[0]
+            stats = dict(self.counters)
+        stats['entries'] = entries
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_feedback_store(path=FEEDBACK_STORE_PATH):
+    """Return the process-wide feedback store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FeedbackStore(path)
+        return _store
@@ -0,0 +1,219 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from prompt_compaction import count_tokens, format_value
+
+# Default on-disk location of the analyzed snapshots
+SNAPSHOTS_PATH = 'data/analysis_snapshots.sqlite3'
+
+# INCREMENTAL_ANALYSIS=1 makes incremental analyses the default for the rep
+# and team endpoints (otherwise requested per call)
+INCREMENTAL_ANALYSIS = os.environ.get('INCREMENTAL_ANALYSIS', '0') == '1'
+# Delta analyses in a row before the next one starts from scratch, so
+# conclusions don't drift from the data over many small updates
+MAX_DELTA_UPDATES = int(os.environ.get('INCREMENTAL_MAX_UPDATES', '7'))
+# Prompt tokens of the previous narrative carried into a delta prompt
+PREVIOUS_TOKEN_BUDGET = 300
+# Representatives listed individually in a team delta, largest changes first
+MAX_REP_CHANGES = 10
+# Relative change below which a numeric value is left out of a delta
+MIN_CHANGE = 0.01
+
+
+class SnapshotStore:
+    """The last analyzed metrics and narrative of each subject ('team' or
+    'rep:<id>'), so the next analysis only has to look at what changed."""
+
+    def __init__(self, path=SNAPSHOTS_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS analysis_snapshots ("
+            "subject TEXT PRIMARY KEY, metrics TEXT NOT NULL, context TEXT, "
+            "narrative TEXT NOT NULL, updates INTEGER NOT NULL, "
+            "data_version TEXT, updated REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, subject):
+        """Return the subject's snapshot as a dict, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metrics, context, narrative, updates FROM analysis_snapshots "
+                "WHERE subject = ?", (subject,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'metrics': json.loads(row[0]),
+            'context': row[1],
+            'narrative': row[2],
+            'updates': row[3],
+        }
+
+    def put(self, subject, metrics, context, narrative, updates, data_version=None):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analysis_snapshots "
+                "(subject, metrics, context, narrative, updates, data_version, updated) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (subject, json.dumps(metrics, sort_keys=True, default=str), context,
+                 narrative, updates, data_version, time.time()),
+            )
+            self._conn.commit()
+
+
+def _text(value):
+    if value is None:
+        return 'n/a'
+    return format_value(value) if isinstance(value, (int, float)) else str(value)
+
+
+def _change(old, new):
+    text = f"{_text(old)} -> {_text(new)}"
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+        text += f" ({(new - old) / abs(old) * 100:+.1f}%)"
+    return text
+
+
+def _significant(old, new):
+    if old == new:
+        return False
+    if isinstance(old, (int, float)) and isinstance(new, (int, float)) and old:
+        return abs(new - old) >= MIN_CHANGE * abs(old)
+    return True
+
+
+def _changed(old, new):
+    return {key: (old.get(key), value) for key, value in new.items() if _significant(old.get(key), value)}
+
+
+def describe_changes(old, new, max_reps=MAX_REP_CHANGES):
+    """Compact text of what differs between two metric snapshots, or None.
+
+    Snapshots hold an 'overview' of named values and optionally 'reps', a
+    dict of named values per representative. Only values that changed by
+    at least MIN_CHANGE are listed; representatives are ranked by the
+    change in their first metric and cut off after `max_reps`.
+    """
+    lines = []
+    overview = _changed(old.get('overview', {}), new.get('overview', {}))
+    if overview:
+        lines.append('; '.join(f"{key} {_change(*values)}" for key, values in overview.items()) + '.')
+
+    old_reps, new_reps = old.get('reps', {}), new.get('reps', {})
+    added = [label for label in new_reps if label not in old_reps]
+    removed = [label for label in old_reps if label not in new_reps]
+    moved = []
+    for label, values in new_reps.items():
+        if label in old_reps:
+            changed = _changed(old_reps[label], values)
+            if changed:
+                first = next(iter(values))
+                before, after = old_reps[label].get(first), values[first]
+                numeric = isinstance(before, (int, float)) and isinstance(after, (int, float))
+                weight = abs(after - before) if numeric else 0
+                moved.append((weight, label, changed))
+    moved.sort(key=lambda item: item[0], reverse=True)
+    for _, label, changed in moved[:max_reps]:
+        lines.append(f"{label}: " + ', '.join(f"{key} {_change(*values)}" for key, values in changed.items()))
+    if len(moved) > max_reps:
+        lines.append(f"{len(moved) - max_reps} other representatives changed less.")
+    for label in added:
+        lines.append(f"{label} (new): " + ', '.join(f"{key}={_text(value)}"
+                                                   for key, value in new_reps[label].items()))
+    if removed:
+        lines.append("No longer in the data: " + ', '.join(removed) + '.')
+    return '\n'.join(lines) or None
+
+
+def previous_conclusions(narrative, token_budget=PREVIOUS_TOKEN_BUDGET):
+    """The end of the previous narrative (where conclusions and
+    recommendations sit) within `token_budget`."""
+    if count_tokens(narrative) <= token_budget:
+        return narrative
+    sentences = narrative.replace('\n', ' ').split('. ')
+    kept = []
+    used = 0
+    for sentence in reversed(sentences):
+        tokens = count_tokens(sentence + '. ')
+        if used + tokens > token_budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    return '... ' + '. '.join(reversed(kept))
+
+
+class AnalysisPlan:
+    """What an incremental analysis of one subject has to do.
+
+    `mode` is 'full' (no usable snapshot: run `chain` on the whole state),
+    'delta' (run `chain` on the changes and the previous conclusions) or
+    'unchanged' (nothing changed: `narrative` is the previous answer).
+    """
+
+    def __init__(self, subject, mode, metrics, context, updates, chain=None, inputs=None, narrative=None):
+        self.subject = subject
+        self.mode = mode
+        self.metrics = metrics
+        self.context = context
+        self.updates = updates
+        self.chain = chain
+        self.inputs = inputs
+        self.narrative = narrative
+
+    def prompt_tokens(self, chain):
+        if self.mode == 'unchanged':
+            return 0
+        return count_tokens(chain.prompt.format(**self.inputs))
+
+    def save(self, store, narrative, data_version=None):
+        """Record `narrative` as the subject's latest analysis."""
+        if self.mode != 'unchanged':
+            store.put(self.subject, self.metrics, self.context, narrative, self.updates, data_version)
+
+
+def plan_analysis(store, subject, metrics, full, delta_chain, delta_inputs=None, context=None,
+                  full_tokens=None, force_full=False):
+    """Decide how to analyze `subject`, whose current state is `metrics`.
+
+    `full()` returns (chain name, inputs) of a from-scratch analysis; a
+    delta runs chain `delta_chain` with `delta_inputs` plus `changes` and
+    `previous`. `context` (e.g. the question asked) must match the
+    snapshot's for its narrative to be reused or updated; a different one
+    gets a full analysis. A delta whose inputs
+    come to `full_tokens` or more (the size of the full prompt's inputs)
+    is not worth it, and the full analysis runs instead.
+    """
+    snapshot = None if force_full else store.get(subject)
+    if snapshot is None or snapshot['updates'] >= MAX_DELTA_UPDATES or snapshot['context'] != context:
+        chain, inputs = full()
+        return AnalysisPlan(subject, 'full', metrics, context, 0, chain, inputs)
+    changes = describe_changes(snapshot['metrics'], metrics)
+    if changes is None:
+        return AnalysisPlan(subject, 'unchanged', metrics, context, snapshot['updates'],
+                            narrative=snapshot['narrative'])
+    inputs = dict(delta_inputs or {}, changes=changes,
+                  previous=previous_conclusions(snapshot['narrative']))
+    if full_tokens is not None and count_tokens('\n'.join(map(str, inputs.values()))) >= full_tokens:
+        chain, full_inputs = full()
+        return AnalysisPlan(subject, 'full', metrics, context, 0, chain, full_inputs)
+    return AnalysisPlan(subject, 'delta', metrics, context, snapshot['updates'] + 1, delta_chain, inputs)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_snapshot_store(path=SNAPSHOTS_PATH):
+    """Return the process-wide snapshot store, creating it on first use."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SnapshotStore(path)
+        return _store
@@ -0,0 +1,301 @@
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from tracing import request_endpoint
+
+# Default on-disk location of the job store
+JOBS_PATH = 'data/jobs.sqlite3'
+
+# Worker threads per process running queued jobs (0: this process only queues)
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))
+# Seconds an idle worker waits before looking for jobs queued by other processes
+JOB_POLL_INTERVAL = float(os.environ.get('JOB_POLL_INTERVAL', '1.0'))
+# Seconds finished jobs (and their results) are kept
+JOB_RETENTION = float(os.environ.get('JOB_RETENTION', str(7 * 24 * 3600)))
+# Seconds between checks for jobs left running by a process that died
+RECOVER_INTERVAL = 30.0
+# Seconds a running job's lease lasts; the process running it renews it
+# every third of that, and a job whose lease ran out is queued again
+JOB_LEASE = float(os.environ.get('JOB_LEASE', '60'))
+
+# Job kind -> 'module:function' running it. The function takes the request
+# body and returns (payload, HTTP status); it is imported by the first job
+# of its kind, so queueing never loads the LLM stack
+JOB_KINDS = {
+    'team_performance': 'api_llm:team_performance_job',
+    'performance_trends': 'api_trends:performance_trends',
+}
+
+# A job is queued, then running, then done (it produced an answer, which
+# may be a 4xx error for a bad request) or failed (it crashed or hit a 5xx
+# error, and an identical submission queues it afresh)
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+def make_job_key(kind, params, data_version):
+    """Hash what determines a job's answer: its kind, request body and the
+    data version it runs against."""
+    payload = json.dumps([kind, params, data_version], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class JobQueue:
+    """Analyses run in the background, stored in SQLite.
+
+    Jobs and their results live in a table shared by every process on the
+    box, so they survive restarts and any process can answer for a job
+    another one queued. Workers claim queued jobs one at a time with a
+    single UPDATE, so each job runs once however many processes poll. A
+    submission identical to a job that is queued, running or done against
+    the same data version returns that job instead of running it again.
+
+    Running jobs are marked with the instance that claimed them and hold a
+    lease it keeps renewing. Instance ids are fresh for every queue, unlike
+    PIDs, which a restarted container hands out again.
+    """
+
+    def __init__(self, path=JOBS_PATH, workers=JOB_WORKERS,
+                 poll_interval=JOB_POLL_INTERVAL, retention=JOB_RETENTION, lease=JOB_LEASE):
+        self.path = path
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self.lease = lease
+        self.instance = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition()
+        self._threads = []
+        self._stop = threading.Event()
+        self._last_recover = 0.0
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, "
+            "job_key TEXT NOT NULL, status TEXT NOT NULL, status_code INTEGER, "
+            "result TEXT, error TEXT, worker TEXT, heartbeat REAL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "created REAL NOT NULL, started REAL, finished REAL)"
+        )
+        # Job stores created before leases existed
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if 'heartbeat' not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat REAL")
+        # At most one live job per key; failed ones may be retried
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_key ON jobs (job_key) "
+            "WHERE status != 'failed'"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)"
+        )
+        self._conn.commit()
+        self.counters = {
+            'submitted': 0,
+            'deduplicated': 0,
+            'completed': 0,
+            'failed': 0,
+            'recovered': 0,
+        }
+
+    def submit(self, kind, params, data_version=None):
+        """Queue a `kind` job for request body `params`.
+
+        Returns (job id, True) for a new job, or (id, False) for an
+        identical job already queued, running or done.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        key = make_job_key(kind, params, data_version)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM jobs WHERE finished < ?", (now - self.retention,)
+            )
+            # Ignored when a live job already holds the key
+            created = self._conn.execute(
+                "INSERT OR IGNORE INTO jobs (id, kind, params, job_key, status, created) "
+                "VALUES (?, ?, ?, ?, 'queued', ?)",
+                (uuid.uuid4().hex, kind, json.dumps(params, default=str), key, now),
+            ).rowcount == 1
+            job_id = self._conn.execute(
+                "SELECT id FROM jobs WHERE job_key = ? AND status != 'failed'", (key,)
+            ).fetchone()[0]
+            self._conn.commit()
+            self.counters['submitted' if created else 'deduplicated'] += 1
+        if created:
+            with self._wakeup:
+                self._wakeup.notify()
+        return job_id, created
+
+    def get(self, job_id):
+        """Return a job's status (and result once finished), or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, kind, status, status_code, result, error, attempts, "
+                "created, started, finished FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, kind, status, status_code, result, error, attempts, created, started, finished = row
+        job = {
+            'job_id': job_id,
+            'kind': kind,
+            'status': status,
+            'attempts': attempts,
+            'created': created,
+            'started': started,
+            'finished': finished,
+        }
+        if status in ('done', 'failed'):
+            job['status_code'] = status_code
+            job['result'] = json.loads(result) if result is not None else None
+        if error is not None:
+            job['error'] = error
+        return job
+
+    def _claim(self):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, started = ?, heartbeat = ?, "
+                "attempts = attempts + 1 WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1) "
+                "AND status = 'queued' RETURNING id, kind, params",
+                (self.instance, now, now),
+            ).fetchone()
+            self._conn.commit()
+        return row
+
+    def _finish(self, job_id, status, status_code, result=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, status_code = ?, result = ?, error = ?, "
+                "finished = ? WHERE id = ?",
+                (status, status_code, json.dumps(result, default=str) if result is not None else None,
+                 error, time.time(), job_id),
+            )
+            self._conn.commit()
+            self.counters['completed' if status == 'done' else 'failed'] += 1
+
+    def _run(self, job_id, kind, params):
+        # LLM calls and stage timings are labelled with the job kind
+        token = request_endpoint.set(f'jobs.{kind}')
+        try:
+            module, function = JOB_KINDS[kind].split(':')
+            payload, status_code = getattr(importlib.import_module(module), function)(json.loads(params))
+        except Exception as e:
+            print(f"Error running job {job_id} ({kind}): {e}")
+            self._finish(job_id, 'failed', 500, error=str(e))
+            return
+        finally:
+            request_endpoint.reset(token)
+        if status_code >= 500:
+            self._finish(job_id, 'failed', status_code, result=payload, error=payload.get('error'))
+        else:
+            self._finish(job_id, 'done', status_code, result=payload)
+
+    def heartbeat(self):
+        """Renew the lease of the jobs this instance is running."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat = ? WHERE status = 'running' AND worker = ?",
+                (time.time(), self.instance),
+            )
+            self._conn.commit()
+
+    def recover(self):
+        """Queue again the jobs whose lease ran out -- left running by a
+        process that died (e.g. killed by a restart) -- so another worker
+        picks them up."""
+        with self._lock:
+            orphaned = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', worker = NULL, heartbeat = NULL "
+                "WHERE status = 'running' AND (worker IS NULL OR worker != ?) "
+                "AND (heartbeat IS NULL OR heartbeat < ?)",
+                (self.instance, time.time() - self.lease),
+            ).rowcount
+            self._conn.commit()
+            self.counters['recovered'] += orphaned
+            self._last_recover = time.monotonic()
+        return orphaned
+
+    def _renew(self):
+        while not self._stop.wait(self.lease / 3):
+            try:
+                self.heartbeat()
+            except sqlite3.Error as e:
+                print(f"Error renewing job leases: {e}")
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                job = self._claim()
+                if job is not None:
+                    self._run(*job)
+                    continue
+                if time.monotonic() - self._last_recover > RECOVER_INTERVAL:
+                    self.recover()
+            except sqlite3.Error as e:
+                # E.g. "database is locked" while another process writes;
+                # the worker backs off and tries again instead of dying
+                print(f"Error polling the job queue: {e}")
+                self._stop.wait(self.poll_interval)
+                continue
+            with self._wakeup:
+                self._wakeup.wait(self.poll_interval)
+
+    def start(self):
+        """Recover orphaned jobs and start the worker threads, and the one
+        renewing their leases (once)."""
+        with self._wakeup:
+            if self._threads or self.workers <= 0:
+                return
+            self.recover()
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            thread = threading.Thread(target=self._renew, name='job-lease', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        with self._wakeup:
+            self._wakeup.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def stats(self):
+        """Return job counts by status and this process's counters."""
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall())
+            stats = dict(self.counters)
+        for status in STATUSES:
+            stats[status] = counts.get(status, 0)
+        stats['workers'] = max(len(self._threads) - 1, 0)
+        return stats
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_job_queue(path=JOBS_PATH):
+    """Return the process-wide job queue, starting its workers on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue(path)
+            _queue.start()
+        return _queue
@@ -0,0 +1,202 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from llm_gateway import gateway_chain_arun, gateway_chain_run
+from tracing import record_llm_call
+
+# Default on-disk location of the LLM response cache
+LLM_CACHE_PATH = 'data/llm_cache.sqlite3'
+
+
+def make_cache_key(template, inputs, model, data_version):
+    """Hash everything that can change an LLM answer into one cache key."""
+    payload = json.dumps(
+        [template, inputs, model, data_version],
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Two-tier cache for LLM responses.
+
+    An in-memory LRU answers repeated prompts without touching disk; misses
+    fall through to a SQLite table so answers survive restarts and are
+    shared between processes. Entries expire after `ttl` seconds and both
+    tiers are bounded by entry count, evicting the least recently used.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, max_memory_items=256,
+                 max_disk_items=10000, ttl=24 * 3600):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)"
+        )
+        self._conn.commit()
+        self.counters = {
+            'hits': 0,
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+        }
+
+    def _expired(self, created, now):
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key):
+        """Return the cached value for `key`, or None on a miss."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.counters['hits'] += 1
+                    self.counters['memory_hits'] += 1
+                    return value
+                del self._memory[key]
+
+            row = self._conn.execute(
+                "SELECT value, created FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                value, created = json.loads(row[0]), row[1]
+                if not self._expired(created, now):
+                    self._conn.execute(
+                        "UPDATE llm_cache SET accessed = ? WHERE key = ?", (now, key)
+                    )
+                    self._conn.commit()
+                    self._remember(key, created, value)
+                    self.counters['hits'] += 1
+                    self.counters['disk_hits'] += 1
+                    return value
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.counters['expired'] += 1
+
+            self.counters['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        """Store `value` (anything JSON-serializable) under `key`."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            overflow = count - self.max_disk_items
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM llm_cache WHERE key IN ("
+                    "SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)",
+                    (overflow,),
+                )
+                self.counters['evictions'] += overflow
+            self._conn.commit()
+
+    def _remember(self, key, created, value):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for `key`, calling `compute()` on a miss."""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def stats(self):
+        """Return hit/miss counters and the current size of each tier."""
+        with self._lock:
+            disk_items = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            stats = dict(self.counters)
+            stats['memory_items'] = len(self._memory)
+        stats['disk_items'] = disk_items
+        return stats
+
+    def clear(self):
+        """Drop every cached response from both tiers."""
+        with self._lock:
+            self._memory.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+
+def model_name(llm):
+    """Best-effort name of the model behind a LangChain LLM."""
+    return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
+
+
+def chain_cache_key(chain, data_version, inputs):
+    """Cache key of an LLMChain call: its prompt, inputs, model and data version."""
+    return make_cache_key(chain.prompt.template, inputs, model_name(chain.llm), data_version)
+
+
+def cached_chain_run(cache, chain, data_version, refresh=False, **inputs):
+    """Run an LLMChain through `cache`, keyed on its prompt, inputs and model.
+
+    With `refresh` the cached answer is ignored and replaced by a new one.
+    """
+    key = chain_cache_key(chain, data_version, inputs)
+    value = None if refresh else cache.get(key)
+    if value is not None:
+        record_llm_call(True)
+        return value
+    value = gateway_chain_run(chain, key, inputs)
+    cache.set(key, value)
+    return value
+
+
+async def cached_chain_arun(cache, chain, data_version, refresh=False, **inputs):
+    """`cached_chain_run` for coroutines; the SQLite tier is read and written
+    from a worker thread so the event loop never waits on disk."""
+    key = chain_cache_key(chain, data_version, inputs)
+    value = None if refresh else await asyncio.to_thread(cache.get, key)
+    if value is not None:
+        record_llm_call(True)
+        return value
+    value = await gateway_chain_arun(chain, key, inputs)
+    await asyncio.to_thread(cache.set, key, value)
+    return value
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_llm_cache(path=LLM_CACHE_PATH):
+    """Return the process-wide LLM response cache, creating it on first use."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(path)
+        return _cache
@@ -0,0 +1,118 @@
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from llm_cache import cached_chain_arun, cached_chain_run, get_llm_cache
+from tracing import stage
+
+# The decision logic of the LLM routes (precomputed -> incremental -> full
+# feedback, map-reduce -> incremental -> plain team analyses) is written
+# once, as generators ("flows") that yield each step needing I/O and get its
+# result sent back. run_flow() performs the steps in the calling thread for
+# the Flask routes, jobs and scripts; arun_flow() awaits them for the async
+# app, so both serving modes share one copy of every decision.
+#
+#     def flow():
+#         summary = yield Blocking(load_summary)
+#         return (yield LLMCall(chain, data_version, {'data': summary}))
+
+
+class LLMCall:
+    """Step: run `chain` on `inputs` through the LLM cache (see
+    cached_chain_run); the result is the completion."""
+
+    def __init__(self, chain, data_version, inputs, refresh=False):
+        self.chain = chain
+        self.data_version = data_version
+        self.inputs = inputs
+        self.refresh = refresh
+
+
+class Blocking:
+    """Step: call fn(*args), for disk or pandas work the event loop must not
+    wait on. With `stage`, its time is recorded under that stage."""
+
+    def __init__(self, fn, *args, stage=None):
+        self.fn = fn
+        self.args = args
+        self.stage = stage
+
+
+class Gather:
+    """Step: run `flows` concurrently, `concurrency` at a time; the result
+    is the list of their results, in order."""
+
+    def __init__(self, flows, concurrency):
+        self.flows = list(flows)
+        self.concurrency = concurrency
+
+
+def _stage(name):
+    return stage(name) if name else nullcontext()
+
+
+def _perform(step):
+    if isinstance(step, LLMCall):
+        with stage('llm'):
+            return cached_chain_run(get_llm_cache(), step.chain, step.data_version,
+                                    refresh=step.refresh, **step.inputs)
+    if isinstance(step, Gather):
+        if not step.flows:
+            return []
+        # Each flow runs in a copy of the caller's context, so its stage
+        # timings and token counts keep the caller's endpoint label
+        with ThreadPoolExecutor(max_workers=step.concurrency) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, run_flow, flow)
+                       for flow in step.flows]
+            return [future.result() for future in futures]
+    with _stage(step.stage):
+        return step.fn(*step.args)
+
+
+def run_flow(flow):
+    """Run `flow` to completion in this thread and return its result."""
+    value, error = None, None
+    while True:
+        try:
+            step = flow.throw(error) if error is not None else flow.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = _perform(step)
+        except Exception as e:
+            error = e
+
+
+async def _aperform(step, run_blocking):
+    if isinstance(step, LLMCall):
+        with stage('llm'):
+            return await cached_chain_arun(get_llm_cache(), step.chain, step.data_version,
+                                           refresh=step.refresh, **step.inputs)
+    if isinstance(step, Gather):
+        slots = asyncio.Semaphore(step.concurrency)
+
+        async def run(flow):
+            async with slots:
+                return await arun_flow(flow, run_blocking)
+
+        return list(await asyncio.gather(*(run(flow) for flow in step.flows)))
+    with _stage(step.stage):
+        return await run_blocking(step.fn, *step.args)
+
+
+async def arun_flow(flow, run_blocking=asyncio.to_thread):
+    """`run_flow` for coroutines: LLM calls are awaited and blocking steps
+    run through `run_blocking(fn, *args)` (by default a worker thread)."""
+    value, error = None, None
+    while True:
+        try:
+            step = flow.throw(error) if error is not None else flow.send(value)
+        except StopIteration as stop:
+            return stop.value
+        value, error = None, None
+        try:
+            value = await _aperform(step, run_blocking)
+        except Exception as e:
+            error = e
@@ -0,0 +1,397 @@
+import asyncio
+import os
+import random
+import threading
+import time
+
+from prompt_compaction import count_tokens
+from tracing import record_llm_call
+
+# Provider limits the gateway paces itself to, retry policy and the longest
+# a call may wait for rate-limit capacity before giving up
+LLM_REQUESTS_PER_MINUTE = float(os.environ.get('LLM_REQUESTS_PER_MINUTE', '3500'))
+LLM_TOKENS_PER_MINUTE = float(os.environ.get('LLM_TOKENS_PER_MINUTE', '90000'))
+LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', '5'))
+LLM_MAX_QUEUE_WAIT = float(os.environ.get('LLM_MAX_QUEUE_WAIT', '60'))
+
+# Provider errors worth retrying, matched by class name so both the 0.x
+# (openai.error.*) and 1.x (openai.*) clients are covered
+RETRYABLE_ERRORS = {
+    'RateLimitError', 'APITimeoutError', 'APIConnectionError', 'InternalServerError',
+    'Timeout', 'ServiceUnavailableError', 'APIError', 'TryAgain',
+}
+
+
+class LLMUnavailable(Exception):
+    """Raised when the gateway gives up on a call; answered with 503 and
+    Retry-After rather than passing the provider's error on."""
+
+
+class LLMQueueTimeout(LLMUnavailable):
+    """Raised when a call waited longer than allowed for rate-limit capacity."""
+
+
+class LLMRetriesExhausted(LLMUnavailable):
+    """Raised when the provider was still rate limited or failing after
+    every retry."""
+
+
+def is_retryable(error):
+    """True for rate limits, timeouts and 5xx errors from the provider."""
+    status = getattr(error, 'status_code', None) or getattr(error, 'http_status', None)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(error).__name__ in RETRYABLE_ERRORS
+
+
+class TokenBucket:
+    """Continuously refilled bucket holding up to `per_minute` units."""
+
+    def __init__(self, per_minute):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.tokens = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _take(self, amount, started, deadline):
+        """Take `amount` units if available and return 0, otherwise return
+        the seconds until they will be."""
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return 0
+            wait = (amount - self.tokens) / self.rate
+        if now + wait > deadline:
+            raise LLMQueueTimeout(f"Rate limit queue wait exceeded {deadline - started:.0f}s")
+        return min(wait, 1.0)
+
+    def acquire(self, amount, deadline):
+        """Take `amount` units, sleeping until they are available.
+
+        Returns the seconds spent waiting; raises LLMQueueTimeout if the units
+        can't be had before `deadline` (a time.monotonic() value).
+        """
+        # A single request larger than the whole budget waits for a full bucket
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            wait = self._take(amount, started, deadline)
+            if not wait:
+                return time.monotonic() - started
+            time.sleep(wait)
+
+    async def acquire_async(self, amount, deadline):
+        """`acquire` for coroutines: waits without blocking the event loop."""
+        amount = min(amount, self.capacity)
+        started = time.monotonic()
+        while True:
+            wait = self._take(amount, started, deadline)
+            if not wait:
+                return time.monotonic() - started
+            await asyncio.sleep(wait)
+
+
+class _Flight:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class _AsyncFlight:
+    def __init__(self, task):
+        # Owns the shared call, so no single caller's cancellation ends it
+        self.task = task
+        self.waiters = 0
+
+
+class LLMGateway:
+    """Shared entry point for every LLM call in the process.
+
+    Calls are paced by token buckets on requests/min and tokens/min, so
+    bursts queue briefly instead of tripping the provider's limits. Retryable
+    failures are retried with exponential backoff and full jitter, and
+    identical concurrent calls (same key) share one in-flight request.
+    Threads use `call`; coroutines on an event loop use `acall`, which waits
+    on the limits and the provider without holding a thread.
+    """
+
+    def __init__(self, requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=LLM_TOKENS_PER_MINUTE, max_retries=LLM_MAX_RETRIES,
+                 max_queue_wait=LLM_MAX_QUEUE_WAIT, base_delay=1.0, max_delay=30.0):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.max_queue_wait = max_queue_wait
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._flights = {}
+        self._async_flights = {}
+        self._lock = threading.Lock()
+        self.counters = {
+            'calls': 0,
+            'coalesced': 0,
+            'retries': 0,
+            'failures': 0,
+            'queue_timeouts': 0,
+            'queued': 0,
+            'in_flight': 0,
+            'wait_seconds_total': 0.0,
+            'wait_seconds_max': 0.0,
+        }
+
+    def _count(self, name, delta=1):
+        with self._lock:
+            self.counters[name] += delta
+
+    def _record_wait(self, waited):
+        with self._lock:
+            self.counters['wait_seconds_total'] += waited
+            self.counters['wait_seconds_max'] = max(self.counters['wait_seconds_max'], waited)
+        return waited
+
+    def throttle(self, tokens):
+        """Wait for capacity for one request of `tokens` tokens."""
+        deadline = time.monotonic() + self.max_queue_wait
+        self._count('queued')
+        try:
+            waited = self.requests.acquire(1, deadline)
+            waited += self.tokens.acquire(tokens, deadline)
+        except LLMQueueTimeout:
+            self._count('queue_timeouts')
+            raise
+        finally:
+            self._count('queued', -1)
+        return self._record_wait(waited)
+
+    async def athrottle(self, tokens):
+        """`throttle` for coroutines."""
+        deadline = time.monotonic() + self.max_queue_wait
+        self._count('queued')
+        try:
+            waited = await self.requests.acquire_async(1, deadline)
+            waited += await self.tokens.acquire_async(tokens, deadline)
+        except LLMQueueTimeout:
+            self._count('queue_timeouts')
+            raise
+        finally:
+            self._count('queued', -1)
+        return self._record_wait(waited)
+
+    def _backoff(self, error, attempt):
+        """The delay before retrying after `error` on try `attempt`:
+        exponential backoff with full jitter. Raises instead if the error
+        isn't retryable or the retries are used up."""
+        if not is_retryable(error):
+            self._count('failures')
+            raise error
+        if attempt >= self.max_retries:
+            self._count('failures')
+            raise LLMRetriesExhausted(f"LLM provider still failing after {attempt + 1} attempts: {error}") from error
+        self._count('retries')
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call_with_retries(self, fn, tokens):
+        attempt = 0
+        while True:
+            self.throttle(tokens)
+            self._count('in_flight')
+            try:
+                return fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+            finally:
+                self._count('in_flight', -1)
+            attempt += 1
+            time.sleep(delay)
+
+    async def _acall_with_retries(self, fn, tokens):
+        attempt = 0
+        while True:
+            await self.athrottle(tokens)
+            self._count('in_flight')
+            try:
+                return await fn()
+            except Exception as e:
+                delay = self._backoff(e, attempt)
+            finally:
+                self._count('in_flight', -1)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def stream(self, start, tokens=0):
+        """Yield the chunks of the stream `start()` opens, under the rate
+        limits. Until the first chunk arrives nothing has reached the client,
+        so failures are retried like `call`'s; later ones are raised. Streams
+        are never coalesced."""
+        self._count('calls')
+        attempt = 0
+        while True:
+            self.throttle(tokens)
+            self._count('in_flight')
+            try:
+                chunks = iter(start())
+                first = next(chunks)
+            except StopIteration:
+                self._count('in_flight', -1)
+                return
+            except Exception as e:
+                self._count('in_flight', -1)
+                delay = self._backoff(e, attempt)
+                attempt += 1
+                time.sleep(delay)
+                continue
+            try:
+                yield first
+                yield from chunks
+            finally:
+                self._count('in_flight', -1)
+            return
+
+    async def astream(self, start, tokens=0):
+        """`stream` for coroutines: `start()` opens an async iterator."""
+        self._count('calls')
+        attempt = 0
+        while True:
+            await self.athrottle(tokens)
+            self._count('in_flight')
+            try:
+                chunks = start().__aiter__()
+                first = await chunks.__anext__()
+            except StopAsyncIteration:
+                self._count('in_flight', -1)
+                return
+            except Exception as e:
+                self._count('in_flight', -1)
+                delay = self._backoff(e, attempt)
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            try:
+                yield first
+                async for chunk in chunks:
+                    yield chunk
+            finally:
+                self._count('in_flight', -1)
+            return
+
+    def call(self, key, fn, tokens=0):
+        """Run `fn()` under the rate limits, sharing the result with callers
+        that pass the same `key` while it is in flight.
+
+        `tokens` is the estimated prompt plus completion size of the call.
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.counters['coalesced'] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = self._call_with_retries(fn, tokens)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def acall(self, key, fn, tokens=0):
+        """`call` for coroutines: awaits `fn()` under the rate limits, sharing
+        the result with coroutines that pass the same `key` meanwhile.
+
+        The call runs in its own task; a caller that is cancelled only stops
+        waiting, and the task is cancelled once no caller is left.
+        """
+        with self._lock:
+            self.counters['calls'] += 1
+            flight = self._async_flights.get(key)
+            if flight is None:
+                task = asyncio.get_running_loop().create_task(self._acall_with_retries(fn, tokens))
+                flight = self._async_flights[key] = _AsyncFlight(task)
+                task.add_done_callback(lambda _: self._end_async_flight(key, flight))
+            else:
+                self.counters['coalesced'] += 1
+            flight.waiters += 1
+
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            with self._lock:
+                flight.waiters -= 1
+                abandoned = flight.waiters == 0 and not flight.task.done()
+                if abandoned and self._async_flights.get(key) is flight:
+                    # Later callers start a fresh call instead of joining this one
+                    del self._async_flights[key]
+            if abandoned:
+                flight.task.cancel()
+
+    def _end_async_flight(self, key, flight):
+        with self._lock:
+            if self._async_flights.get(key) is flight:
+                del self._async_flights[key]
+
+    def stats(self):
+        """Queue depth, in-flight calls, coalescing, retries and wait times."""
+        with self._lock:
+            stats = dict(self.counters)
+        stats['available_requests'] = int(self.requests.tokens)
+        stats['available_tokens'] = int(self.tokens.tokens)
+        return stats
+
+
+def chain_tokens(chain, prompt):
+    """Estimated prompt plus completion tokens of one chain call."""
+    return count_tokens(prompt) + (getattr(chain.llm, 'max_tokens', None) or 0)
+
+
+def gateway_chain_run(chain, key, inputs):
+    """Run an LLMChain through the shared gateway."""
+    prompt = chain.prompt.format(**inputs)
+
+    def run():
+        completion = chain.run(**inputs)
+        record_llm_call(False, count_tokens(prompt), completion)
+        return completion
+
+    return get_llm_gateway().call(key, run, chain_tokens(chain, prompt))
+
+
+async def gateway_chain_arun(chain, key, inputs):
+    """Run an LLMChain through the shared gateway on the event loop."""
+    prompt = chain.prompt.format(**inputs)
+
+    async def run():
+        completion = await chain.arun(**inputs)
+        record_llm_call(False, count_tokens(prompt), completion)
+        return completion
+
+    return await get_llm_gateway().acall(key, run, chain_tokens(chain, prompt))
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """Return the process-wide LLM gateway, creating it on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
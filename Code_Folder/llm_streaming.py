@@ -0,0 +1,123 @@
+import asyncio
+import json
+import time
+
+from llm_cache import chain_cache_key
+from llm_gateway import chain_tokens, get_llm_gateway
+from prompt_compaction import count_tokens
+from tracing import record_llm_call
+
+
+def wants_stream(request):
+    """True if the client asked for Server-Sent Events (?stream=1 or Accept)."""
+    if request.args.get('stream') in ('1', 'true'):
+        return True
+    return request.accept_mimetypes.best == 'text/event-stream'
+
+
+def sse_event(event, data):
+    """Format one Server-Sent Event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_chain(cache, chain, data_version, metadata=None, **inputs):
+    """Stream an LLMChain completion as Server-Sent Events.
+
+    Yields one `token` event per chunk as the model produces it, then a
+    `done` event with token counts, cache status and timings. A cached
+    answer is sent as a single chunk; a fresh one is cached once it has
+    streamed completely. Rate limits and provider errors before the first
+    chunk are retried by the LLM gateway; failures it gives up on, or that
+    come mid-stream, end the stream with an `error` event.
+    """
+    started = time.monotonic()
+    key = chain_cache_key(chain, data_version, inputs)
+    prompt = chain.prompt.format(**inputs)
+    first_token_ms = None
+    cached = cache.get(key)
+    try:
+        if cached is not None:
+            chunks = [cached]
+        else:
+            # Paced and retried until the first chunk, but never coalesced
+            chunks = get_llm_gateway().stream(lambda: chain.llm.stream(prompt), chain_tokens(chain, prompt))
+        parts = []
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.monotonic() - started) * 1000, 1)
+            parts.append(chunk)
+            yield sse_event('token', {'text': chunk})
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+        return
+
+    completion = ''.join(parts)
+    if cached is None:
+        cache.set(key, completion)
+    yield _done_event(metadata, prompt, completion, cached is not None, first_token_ms, started)
+
+
+async def astream_chain(cache, chain, data_version, metadata=None, **inputs):
+    """`stream_chain` for the event loop: an async generator of the same
+    events, reading chunks from the model's async stream."""
+    started = time.monotonic()
+    key = chain_cache_key(chain, data_version, inputs)
+    prompt = chain.prompt.format(**inputs)
+    first_token_ms = None
+    cached = await asyncio.to_thread(cache.get, key)
+    parts = []
+    try:
+        if cached is not None:
+            chunks = [cached]
+        else:
+            chunks = get_llm_gateway().astream(lambda: chain.llm.astream(prompt), chain_tokens(chain, prompt))
+        async for chunk in _aiter(chunks):
+            if not chunk:
+                continue
+            if first_token_ms is None:
+                first_token_ms = round((time.monotonic() - started) * 1000, 1)
+            parts.append(chunk)
+            yield sse_event('token', {'text': chunk})
+    except Exception as e:
+        yield sse_event('error', {'error': str(e)})
+        return
+
+    completion = ''.join(parts)
+    if cached is None:
+        await asyncio.to_thread(cache.set, key, completion)
+    yield _done_event(metadata, prompt, completion, cached is not None, first_token_ms, started)
+
+
+async def _aiter(chunks):
+    if hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            yield chunk
+    else:
+        for chunk in chunks:
+            yield chunk
+
+
+def _done_event(metadata, prompt, completion, cached, first_token_ms, started):
+    prompt_tokens = count_tokens(prompt)
+    record_llm_call(cached, prompt_tokens, completion)
+    done = dict(metadata or {})
+    done.update({
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': count_tokens(completion),
+        'cache': 'hit' if cached else 'miss',
+        'time_to_first_token_ms': first_token_ms,
+        'total_ms': round((time.monotonic() - started) * 1000, 1),
+    })
+    return sse_event('done', done)
+
+
+def sse_response(events):
+    """Wrap an SSE generator in a response that proxies won't buffer."""
+    from flask import Response, stream_with_context
+
+    response = Response(stream_with_context(events), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
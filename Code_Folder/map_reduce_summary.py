@@ -0,0 +1,125 @@
+import os
+
+import numpy as np
+
+from llm_flow import Gather
+from prompt_compaction import compact_team_data, count_tokens, truncate_tokens
+from sales_ingest import sales_dates
+
+# Hierarchical summarization of the whole sales history. The data is split
+# into partitions (groups of representatives, or consecutive months), each
+# partition is condensed under the per-call token cap and summarized by its
+# own LLM call, and the summaries are combined `fan_out` at a time until a
+# single call can take them all. Partitions are capped at fan_out ** depth,
+# so the number of calls -- and of sequential rounds -- stays fixed however
+# much history the data holds; larger data only means more condensed
+# partitions.
+
+# Default reduction levels above the partitions, and summaries per reduce call
+MAP_REDUCE_DEPTH = int(os.environ.get('MAP_REDUCE_DEPTH', '1'))
+MAP_REDUCE_FAN_OUT = int(os.environ.get('MAP_REDUCE_FAN_OUT', '8'))
+# Upper bound on fan_out ** depth a request may ask for
+MAX_MAP_REDUCE_PARTITIONS = 256
+# Concurrent LLM calls per map-reduce request
+MAP_REDUCE_CONCURRENCY = int(os.environ.get('MAP_REDUCE_CONCURRENCY', '8'))
+
+PARTITION_BY = ('employee', 'window')
+
+
+def _employee_partitions(df, parts):
+    employee_ids = np.sort(df['employee_id'].unique())
+    for group in np.array_split(employee_ids, min(parts, len(employee_ids))):
+        label = f"representatives #{group[0]}" if len(group) == 1 else \
+            f"representatives #{group[0]} to #{group[-1]} ({len(group)} reps)"
+        yield label, df[df['employee_id'].isin(group)]
+
+
+def _window_partitions(df, dates, parts):
+    months = dates.dt.to_period('M')
+    unique_months = np.sort(months.unique())
+    for group in np.array_split(unique_months, min(parts, len(unique_months))):
+        mask = months.isin(group)
+        window = dates[mask]
+        yield f"{window.min():%Y-%m-%d} to {window.max():%Y-%m-%d}", df[mask]
+
+
+def partition_team_data(df, by, parts, token_budget):
+    """Split the sales data into at most `parts` partitions -- by
+    representative ('employee') or by consecutive months ('window') -- and
+    condense each into a summary within `token_budget` (see
+    compact_team_data). Returns a list of (label, summary text)."""
+    dates = sales_dates(df)
+    df = df[dates.notna()]
+    dates = dates[dates.notna()]
+    if df.empty:
+        return []
+    if by == 'employee':
+        partitions = _employee_partitions(df, parts)
+    else:
+        partitions = _window_partitions(df, dates, parts)
+    return [(label, compact_team_data(part, token_budget)[0]) for label, part in partitions]
+
+
+def combine_summaries(summaries, token_budget):
+    """Labelled summaries as one prompt input within `token_budget`, each
+    summary cut to an equal share of what the labels leave."""
+    labels = sum(count_tokens(f"{label}:\n\n\n") for label, _ in summaries)
+    share = max((token_budget - labels) // max(len(summaries), 1), 1)
+    return '\n\n'.join(f"{label}:\n{truncate_tokens(text, share)}" for label, text in summaries)
+
+
+def _groups(summaries, fan_out):
+    for i in range(0, len(summaries), fan_out):
+        group = summaries[i:i + fan_out]
+        # Reduced summaries are labelled with the first and last part they cover
+        label = group[0][0] if len(group) == 1 else \
+            f"{group[0][0].split(' / ')[0]} / {group[-1][0].split(' / ')[-1]}"
+        yield label, group
+
+
+class MapReduceStats:
+    """Calls, rounds and prompt tokens of one map-reduce run."""
+
+    def __init__(self, partition_by, depth, fan_out):
+        self.partition_by = partition_by
+        self.depth = depth
+        self.fan_out = fan_out
+        self.partitions = 0
+        self.calls = 0
+        self.rounds = 0
+        self.prompt_tokens = 0
+        self.max_call_tokens = 0
+
+    def record(self, results):
+        """Count one round of (summary, prompt tokens) results."""
+        self.rounds += 1
+        self.calls += len(results)
+        for _, tokens in results:
+            self.prompt_tokens += tokens
+            self.max_call_tokens = max(self.max_call_tokens, tokens)
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+def summarize_partitions(partitions, summarize, reduce, fan_out, token_budget, stats,
+                         concurrency=MAP_REDUCE_CONCURRENCY):
+    """Summarize `partitions` ((label, text) pairs) and reduce the summaries
+    until at most `fan_out` remain; the caller makes the final call on them.
+
+    A flow (see llm_flow.py): `summarize(label, text)` and `reduce(combined)`
+    return flows making one LLM call each, with (summary, prompt tokens) as
+    their result, and the calls of a round run `concurrency` at a time.
+    Returns the remaining (label, summary) pairs.
+    """
+    stats.partitions = len(partitions)
+    results = yield Gather([summarize(label, text) for label, text in partitions], concurrency)
+    stats.record(results)
+    summaries = [(label, summary) for (label, _), (summary, _) in zip(partitions, results)]
+    while len(summaries) > fan_out:
+        groups = list(_groups(summaries, fan_out))
+        results = yield Gather([reduce(combine_summaries(group, token_budget)) for _, group in groups],
+                               concurrency)
+        stats.record(results)
+        summaries = [(label, summary) for (label, _), (summary, _) in zip(groups, results)]
+    return summaries
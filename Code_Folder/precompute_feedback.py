@@ -0,0 +1,128 @@
+import argparse
+import contextvars
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from api_llm import (BATCH_CONCURRENCY, feedback_hash, get_rep_data, load_rep_index, rep_analysis,
+                     rep_window, run_analysis, run_feedback_chain, sales_store, summarize_rep_records)
+from feedback_store import get_feedback_store
+from tracing import request_endpoint
+
+# Precomputes the feedback /api/rep_performance serves, ahead of the day.
+# Every representative's prompt is hashed; only reps whose hash has no
+# stored feedback (new reps, or rows that changed) go to the LLM, so LLM
+# spend follows the data changes rather than the request volume.
+#
+#     python precompute_feedback.py                  (once, e.g. from cron)
+#     python precompute_feedback.py --every 900      (checks every 15 minutes)
+#
+# With --incremental, reps analyzed before only get the changes since their
+# last analysis and its conclusions in the prompt (see incremental_analysis.py).
+
+
+def _generate(rep_id, rep_records, summary, data_version, force, incremental, window):
+    if not incremental:
+        return run_feedback_chain(summary, data_version, force), None
+    plan = rep_analysis(rep_id, rep_records, summary, window, force_full=force)
+    return run_analysis(plan, data_version, force)[0], plan.mode
+
+
+def precompute_feedback(latest=1, concurrency=BATCH_CONCURRENCY, force=False, incremental=False):
+    """Store feedback on each representative's latest `latest` days of data.
+
+    With `force` every rep is generated again, from scratch and bypassing
+    the LLM cache. Returns counts of reps, changed (sent to the LLM),
+    failed and removed entries, and with `incremental` the kinds of
+    analysis run.
+    """
+    started = time.perf_counter()
+    rep_index = load_rep_index()
+    if rep_index is None:
+        raise RuntimeError("Failed to load sales data")
+    data_version = sales_store.version
+    store = get_feedback_store()
+
+    prompts = {}
+    for rep_id in rep_index.employee_ids():
+        rep_records = get_rep_data(rep_id, rep_index, latest=latest)
+        if rep_records:
+            summary = summarize_rep_records(rep_records)
+            prompts[rep_id] = (feedback_hash(summary), summary, rep_records)
+    known = set() if force else store.known(prompt[0] for prompt in prompts.values())
+    changed = {rep_id: prompt for rep_id, prompt in prompts.items() if prompt[0] not in known}
+
+    failed = 0
+    analyses = {}
+    # LLM calls and their token counts are labelled with this job in /metrics
+    token = request_endpoint.set('precompute_feedback')
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {
+                executor.submit(contextvars.copy_context().run, _generate, rep_id, rep_records,
+                                summary, data_version, force, incremental, rep_window(latest)): rep_id
+                for rep_id, (_, summary, rep_records) in changed.items()
+            }
+            for future in as_completed(futures):
+                rep_id = futures[future]
+                try:
+                    feedback, mode = future.result()
+                    store.put(rep_id, changed[rep_id][0], feedback, data_version)
+                    if mode is not None:
+                        analyses[mode] = analyses.get(mode, 0) + 1
+                except Exception as e:
+                    print(f"Error generating feedback for representative {rep_id}: {e}")
+                    failed += 1
+    finally:
+        request_endpoint.reset(token)
+
+    removed = store.retain({rep_id: prompt[0] for rep_id, prompt in prompts.items()})
+    result = {
+        'data_version': data_version,
+        'reps': len(prompts),
+        'changed': len(changed),
+        'failed': failed,
+        'removed': removed,
+        'seconds': round(time.perf_counter() - started, 2),
+    }
+    if incremental:
+        result['analyses'] = analyses
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute representative feedback")
+    parser.add_argument('--latest', type=int, default=1,
+                        help='Days of data per rep, as rep_performance?latest=N (default 1)')
+    parser.add_argument('--concurrency', type=int, default=BATCH_CONCURRENCY,
+                        help='Concurrent LLM calls')
+    parser.add_argument('--force', action='store_true',
+                        help='Generate every rep again, even if unchanged')
+    parser.add_argument('--incremental', action='store_true',
+                        help="Analyze only what changed since each rep's last analysis")
+    parser.add_argument('--every', type=float,
+                        help='Keep running, checking for new data every this many seconds')
+    args = parser.parse_args()
+
+    if args.every is None:
+        print(precompute_feedback(args.latest, args.concurrency, args.force, args.incremental))
+        return
+
+    result = None
+    force = args.force
+    while True:
+        try:
+            # Nothing can have changed while the data version hasn't, but
+            # reps that failed last time are tried again
+            if result is None or result['failed'] or sales_store.version != result['data_version']:
+                result = precompute_feedback(args.latest, args.concurrency, force, args.incremental)
+                force = False
+                print(result)
+        except Exception as e:
+            # Keep the schedule going; the next round starts over
+            print(f"Error precomputing feedback: {e}")
+            result = None
+        time.sleep(args.every)
+
+
+if __name__ == '__main__':
+    main()
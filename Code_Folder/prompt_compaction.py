@@ -0,0 +1,250 @@
+import pandas as pd
+
+from sales_ingest import sales_dates
+
+# Default number of prompt tokens the team summary may use
+TEAM_PROMPT_TOKEN_BUDGET = 2000
+# Largest team summary budget a request may ask for
+MAX_TEAM_PROMPT_TOKEN_BUDGET = 8000
+
+# Metrics that are totalled per representative and for the team
+SUM_METRICS = [
+    'lead_taken', 'tours_booked', 'applications', 'tours',
+    'revenue_confirmed', 'revenue_pending', 'estimated_revenue',
+]
+# Ratio metrics, which only make sense averaged
+MEAN_METRICS = [
+    'tours_per_lead', 'apps_per_tour', 'apps_per_lead',
+    'avg_deal_value_30_days', 'avg_close_rate_30_days', 'revenue_runrate',
+]
+QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+# Days in each of the two periods the summary compares
+PERIOD_DAYS = 30
+# Aggregates given per representative, led by the one they are ranked on
+REP_COLUMNS = ['revenue_confirmed', 'lead_taken', 'applications', 'apps_per_lead', 'avg_close_rate_30_days']
+
+_encoding = None
+
+
+def count_tokens(text):
+    """Count prompt tokens locally.
+
+    Uses tiktoken's cl100k_base encoding when it is installed and its data is
+    available; otherwise falls back to the usual ~4 characters per token.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding('cl100k_base')
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return len(text) // 4 + 1
+
+
+def truncate_tokens(text, token_budget):
+    """The start of `text` within `token_budget` tokens (as counted by
+    count_tokens), cut at a line or sentence end where there is one."""
+    if count_tokens(text) <= token_budget:
+        return text
+    if _encoding:
+        cut = _encoding.decode(_encoding.encode(text)[:max(token_budget - 2, 0)])
+    else:
+        cut = text[:max(token_budget - 2, 0) * 4]
+    end = max(cut.rfind('\n'), cut.rfind('. ') + 1)
+    if end > len(cut) // 2:
+        cut = cut[:end]
+    return cut.rstrip() + ' ...'
+
+
+def format_value(value):
+    """A metric value as prompt text: integers without decimals, others
+    with two."""
+    if pd.isna(value):
+        return 'n/a'
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.2f}"
+
+
+def _overview_text(records, representatives, start, end, totals, means):
+    period = f" from {start:%Y-%m-%d} to {end:%Y-%m-%d}" if start is not None else ''
+    return (
+        f"Team overview: {records} daily records for {representatives} representatives{period}.\n"
+        f"Totals: {', '.join(f'{m}={format_value(totals[m])}' for m in SUM_METRICS)}.\n"
+        f"Averages: {', '.join(f'{m}={format_value(means[m])}' for m in MEAN_METRICS)}."
+    )
+
+
+def _overview(df, dates, per_rep):
+    return _overview_text(len(df), len(per_rep), dates.min(), dates.max(),
+                          {m: df[m].sum() for m in SUM_METRICS}, {m: df[m].mean() for m in MEAN_METRICS})
+
+
+def _deltas_text(current, previous, days):
+    parts = []
+    for metric in SUM_METRICS:
+        now, before = current[metric], previous[metric]
+        change = f"{(now - before) / before * 100:+.1f}%" if before else 'n/a'
+        parts.append(f"{metric} {format_value(now)} vs {format_value(before)} ({change})")
+    return f"Last {days} days vs previous {days} days: " + '; '.join(parts) + '.'
+
+
+def _period_deltas(df, dates, days=PERIOD_DAYS):
+    end = dates.max()
+    current = df[dates > end - pd.Timedelta(days=days)]
+    previous = df[(dates <= end - pd.Timedelta(days=days)) & (dates > end - pd.Timedelta(days=2 * days))]
+    if previous.empty:
+        return None
+    return _deltas_text(current[SUM_METRICS].sum(), previous[SUM_METRICS].sum(), days)
+
+
+def _quantiles(per_rep):
+    lines = ["Per-representative distribution (p10/p25/p50/p75/p90):"]
+    for metric in ['revenue_confirmed', 'lead_taken', 'applications', 'apps_per_lead', 'tours_per_lead']:
+        values = per_rep[metric].quantile(QUANTILES)
+        lines.append(f"{metric}: " + '/'.join(format_value(v) for v in values))
+    return '\n'.join(lines)
+
+
+def _performers(per_rep, count=5):
+    ranked = per_rep.sort_values('revenue_confirmed', ascending=False)
+    top = ', '.join(f"{name} ({format_value(v)})" for name, v in ranked['revenue_confirmed'].head(count).items())
+    bottom = ', '.join(f"{name} ({format_value(v)})" for name, v in ranked['revenue_confirmed'].tail(count).items())
+    return f"Top {count} by confirmed revenue: {top}.\nBottom {count} by confirmed revenue: {bottom}."
+
+
+def _rep_rows(per_rep):
+    yield "Per-representative aggregates (name: " + ', '.join(REP_COLUMNS) + "):"
+    for name, row in per_rep.sort_values('revenue_confirmed', ascending=False).iterrows():
+        yield f"{name}: " + ', '.join(format_value(row[c]) for c in REP_COLUMNS)
+
+
+def _per_rep(df):
+    aggregations = {m: 'sum' for m in SUM_METRICS}
+    aggregations.update({m: 'mean' for m in MEAN_METRICS})
+    per_rep = df.groupby(['employee_id', 'employee_name']).agg(aggregations)
+    per_rep.index = [f"{name} (#{rep_id})" for rep_id, name in per_rep.index]
+    return per_rep
+
+
+def plain_value(value):
+    """A metric value as a JSON-friendly int or float (None if missing)."""
+    if pd.isna(value):
+        return None
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def team_snapshot(df):
+    """The team's metrics as plain values, for incremental analyses to diff
+    against the last analyzed state (see incremental_analysis.py): team
+    totals and averages, plus REP_COLUMNS per representative."""
+    dates = sales_dates(df)
+    df = df[dates.notna()]
+    dates = dates[dates.notna()]
+    if df.empty:
+        return {'overview': {'records': 0}, 'reps': {}}
+    per_rep = _per_rep(df)
+    overview = {
+        'records': len(df),
+        'representatives': len(per_rep),
+        'from': f"{dates.min():%Y-%m-%d}",
+        'to': f"{dates.max():%Y-%m-%d}",
+    }
+    overview.update({f"total {m}": plain_value(df[m].sum()) for m in SUM_METRICS})
+    overview.update({f"average {m}": plain_value(df[m].mean()) for m in MEAN_METRICS})
+    reps = {
+        label: {c: plain_value(row[c]) for c in REP_COLUMNS}
+        for label, row in per_rep.iterrows()
+    }
+    return {'overview': overview, 'reps': reps}
+
+
+def _fit_to_budget(sections, rep_lines, token_budget):
+    """Join `sections` (None entries skipped), in order of importance, and
+    then as many of `rep_lines` as still fit within `token_budget`; each
+    section is only included if it fits, and the rep lines (led by their
+    heading) only if at least one representative makes it in.
+
+    Returns (text, tokens_used).
+    """
+    parts = []
+    used = 0
+    for section in sections:
+        if section is None:
+            continue
+        tokens = count_tokens(section + '\n')
+        if used + tokens <= token_budget:
+            parts.append(section)
+            used += tokens
+
+    # Fill what is left of the budget with the per-representative lines
+    fitted = []
+    for line in rep_lines:
+        tokens = count_tokens(line + '\n')
+        if used + tokens > token_budget:
+            break
+        fitted.append(line)
+        used += tokens
+    if len(fitted) > 1:
+        parts.extend(fitted)
+
+    text = '\n'.join(parts)
+    return text, count_tokens(text)
+
+
+def _rep_label(employee_id, name):
+    return f"{name} (#{employee_id})" if isinstance(name, str) else f"#{employee_id}"
+
+
+def compact_team_metrics(metrics, employees, periods=None, token_budget=TEAM_PROMPT_TOKEN_BUDGET):
+    """compact_team_data built from running aggregates instead of the frame.
+
+    `metrics` and `employees` ({employee_id: metrics}) are the team-wide and
+    per-employee totals and means of team_metrics.py, and `periods` the
+    (current, previous) totals of its period_totals(), so building the
+    summary costs O(employees) rather than O(rows).
+
+    Returns (summary_text, tokens_used).
+    """
+    if not metrics['rows']:
+        return "No sales data available.", count_tokens("No sales data available.")
+
+    per_rep = pd.DataFrame.from_dict(
+        {_rep_label(employee_id, m['employee_name']): {
+            **{c: m[f'total_{c}'] for c in SUM_METRICS},
+            **{c: m[f'avg_{c}'] for c in MEAN_METRICS},
+        } for employee_id, m in employees.items()},
+        orient='index', dtype=float,
+    )
+    overview = _overview_text(metrics['rows'], len(per_rep), metrics.get('first_date'), metrics.get('last_date'),
+                              {m: metrics[f'total_{m}'] for m in SUM_METRICS},
+                              {m: metrics[f'avg_{m}'] for m in MEAN_METRICS})
+    deltas = _deltas_text(*periods, PERIOD_DAYS) if periods is not None else None
+    return _fit_to_budget([overview, deltas, _quantiles(per_rep), _performers(per_rep)],
+                          _rep_rows(per_rep), token_budget)
+
+
+def compact_team_data(df, token_budget=TEAM_PROMPT_TOKEN_BUDGET):
+    """Condense the whole sales dataset into a summary within `token_budget`.
+
+    Sections are added in order of importance -- overview, period-over-period
+    deltas, distribution quantiles, top/bottom performers, then one line per
+    representative -- and each is only included if it still fits. The prompt
+    size therefore stays flat no matter how much history the data holds.
+
+    Returns (summary_text, tokens_used).
+    """
+    dates = sales_dates(df)
+    df = df[dates.notna()]
+    dates = dates[dates.notna()]
+    if df.empty:
+        return "No sales data available.", count_tokens("No sales data available.")
+
+    per_rep = _per_rep(df)
+    sections = [_overview(df, dates, per_rep), _period_deltas(df, dates),
+                _quantiles(per_rep), _performers(per_rep)]
+    return _fit_to_budget(sections, _rep_rows(per_rep), token_budget)
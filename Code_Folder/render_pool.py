@@ -0,0 +1,204 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from sales_data_store import SALES_DATA_PATH, get_store
+
+# Worker processes (0 renders in the calling thread), per-render timeout in
+# seconds and the number of renders allowed to wait or run at once
+CHART_WORKERS = int(os.environ.get('CHART_WORKERS', os.cpu_count() or 1))
+CHART_RENDER_TIMEOUT = float(os.environ.get('CHART_RENDER_TIMEOUT', '30'))
+CHART_QUEUE_LIMIT = int(os.environ.get('CHART_QUEUE_LIMIT', str(4 * max(1, CHART_WORKERS))))
+
+
+class PoolBusy(Exception):
+    """Raised when the render queue is full."""
+
+
+class RenderTimeout(Exception):
+    """Raised when a render takes longer than the configured timeout."""
+
+
+class PoolBroken(Exception):
+    """Raised when the workers keep dying, even on a freshly started pool."""
+
+
+_worker_path = None
+
+
+def _init_worker(path):
+    global _worker_path
+    _worker_path = path
+    # Load the dataset once per worker instead of once per render
+    _chart_data(path)
+
+
+def _features(path):
+    from sales_features import build_features, update_features
+
+    # Extended in place of a rebuild when the CSV only gained rows
+    return get_store(path).derived('sales_features', build_features, update_features)
+
+
+def _chart_data(path):
+    """(chart table, data version it was prepared from)."""
+    from chart_renderers import prepare_chart_data
+
+    features = _features(path)
+    # The features may be of another version if the file changed in between
+    return get_store(path).derived_snapshot(
+        'chart_data', lambda df: prepare_chart_data(df, features.extend(df))
+    )
+
+
+def _employee_series(path):
+    from facet_tiles import employee_series
+
+    return get_store(path).derived_snapshot('employee_series', employee_series)
+
+
+def render_chart(name, params, path=SALES_DATA_PATH):
+    """Render one chart against the current data.
+
+    Returns (bytes, data version drawn). The version is this process's own,
+    which may differ from the caller's if the file changed in between.
+    """
+    from chart_renderers import RENDERERS
+
+    # Facet tiles draw from per-employee series instead of the chart table
+    data, version = _employee_series(path) if name == 'facet_tile' else _chart_data(path)
+    return RENDERERS[name](data, params), version
+
+
+def _render_in_worker(name, params):
+    return render_chart(name, params, _worker_path)
+
+
+def _warm_worker():
+    import chart_renderers  # noqa: F401 (matplotlib and seaborn)
+
+
+class RenderPool:
+    """Process pool for CPU-bound chart rendering.
+
+    Workers are spawned lazily, each holding its own copy of the prepared
+    chart data, so renders run on all cores instead of contending for one
+    GIL. The number of queued renders is capped and each render has a
+    timeout; both surface as exceptions the views turn into 503/504. A
+    pool left broken by a dead worker is replaced and the batch retried
+    once before giving up with PoolBroken (503).
+    """
+
+    def __init__(self, path=SALES_DATA_PATH, workers=CHART_WORKERS,
+                 timeout=CHART_RENDER_TIMEOUT, queue_limit=CHART_QUEUE_LIMIT):
+        self.path = path
+        self.workers = workers
+        self.timeout = timeout
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(queue_limit)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: forking a threaded server can deadlock
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.path,),
+                )
+            return self._executor
+
+    def _discard_executor(self, executor):
+        # Only if no other request has replaced it already
+        with self._lock:
+            if self._executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    def render(self, name, params):
+        """Render chart `name` with `params`; returns (image bytes, data
+        version drawn)."""
+        return self.render_many(name, [params])[0]
+
+    def render_many(self, name, params_list):
+        """Render chart `name` once per entry of `params_list`, spread over
+        the workers, and return (image bytes, data version drawn) pairs in
+        the same order.
+
+        The batch takes one queue slot and shares one timeout.
+        """
+        if not params_list:
+            return []
+        if not self._slots.acquire(blocking=False):
+            raise PoolBusy(f"Render queue is full ({self.queue_limit} charts pending)")
+        if self.workers <= 0:
+            try:
+                return [render_chart(name, params, self.path) for params in params_list]
+            finally:
+                self._slots.release()
+
+        # The slot is held until every worker is really done, even past a
+        # timeout: one hold for this call plus one per submitted render
+        holds = [1]
+        holds_lock = threading.Lock()
+
+        def release(_=None):
+            with holds_lock:
+                holds[0] -= 1
+                if holds[0] == 0:
+                    self._slots.release()
+
+        def submit(executor, params):
+            with holds_lock:
+                holds[0] += 1
+            try:
+                future = executor.submit(_render_in_worker, name, params)
+            except BaseException:
+                release()
+                raise
+            future.add_done_callback(release)
+            return future
+
+        deadline = time.monotonic() + self.timeout
+        futures = []
+        try:
+            for attempt in range(2):
+                executor = self._get_executor()
+                try:
+                    futures = [submit(executor, params) for params in params_list]
+                    return [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+                except BrokenProcessPool:
+                    # A worker died (OOM kill, crash in a native plotting
+                    # library) and the pool rejects all further work
+                    self._discard_executor(executor)
+            raise PoolBroken(f"Render workers keep failing while rendering {name}")
+        except TimeoutError:
+            # A running render can't be interrupted; drop the ones still queued
+            for future in futures:
+                future.cancel()
+            raise RenderTimeout(f"Rendering {name} took longer than {self.timeout:g}s")
+        finally:
+            release()
+
+    def start(self):
+        """Spawn the workers and load their data now instead of on the
+        first render."""
+        if self.workers <= 0:
+            _warm_worker()
+            _chart_data(self.path)
+            return
+        executor = self._get_executor()
+        for future in [executor.submit(_warm_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
@@ -0,0 +1,93 @@
+import numpy as np
+import pandas as pd
+
+from sales_ingest import sales_dates
+
+
+def parse_date_param(value):
+    """Parse an optional `from`/`to` query parameter into a Timestamp."""
+    if value is None or value == '':
+        return None
+    try:
+        return pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid date: {value!r}. Use YYYY-MM-DD.")
+
+
+def check_date_range(start, end):
+    """Raise ValueError when both bounds are given and `start` is after `end`."""
+    if start is not None and end is not None and start > end:
+        raise ValueError(f"'from' ({start.date()}) is after 'to' ({end.date()})")
+
+
+class RepIndex:
+    """Index from employee_id to a date-sorted block of rows.
+
+    The rows are ordered once by (employee_id, dated), so every
+    representative owns one contiguous range of that order. Looking a
+    representative up is a dict hit and date windows are binary searches
+    inside that range. Only the order and dates are held; rows are taken
+    from the sales frame on request.
+    """
+
+    def __init__(self, df):
+        dates = sales_dates(df).to_numpy()
+        # Rows without a usable date can't be placed on the timeline
+        valid = np.flatnonzero(~np.isnat(dates))
+        ids = df['employee_id'].to_numpy()[valid].astype(np.int64)
+        # lexsort is stable: rows of the same representative and date keep file order
+        order = np.lexsort((dates[valid], ids))
+        self._init(df, valid[order], dates[valid][order], ids[order])
+
+    def _init(self, df, order, dates, ids):
+        self._df = df
+        self._order = order
+        self._dates = dates
+        self._ids = ids
+        # Row ranges are the runs of equal ids in the sorted id column
+        starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(ids)].astype(int)
+        self._ranges = {
+            int(ids[start]): (int(start), int(stop))
+            for start, stop in zip(starts, stops)
+        }
+
+    def to_shared(self):
+        return {}, {'order': self._order, 'dates': self._dates, 'ids': self._ids}
+
+    @classmethod
+    def from_shared(cls, df, meta, arrays):
+        index = cls.__new__(cls)
+        index._init(df, arrays['order'], arrays['dates'], arrays['ids'])
+        return index
+
+    def __contains__(self, rep_id):
+        return int(rep_id) in self._ranges
+
+    def employee_ids(self):
+        """Return all indexed employee ids in ascending order."""
+        return list(self._ranges)
+
+    def rows(self, rep_id, latest=None, start=None, end=None):
+        """Return a representative's rows, oldest first.
+
+        `start`/`end` bound the dates (both inclusive) and `latest` keeps only
+        the most recent N rows of what remains. The rows carry the parsed
+        date as `dated_ts`.
+        """
+        first = last = 0
+        span = self._ranges.get(int(rep_id))
+        if span is not None:
+            lo, hi = span
+            dates = self._dates[lo:hi]
+            first, last = lo, hi
+            if start is not None:
+                first = lo + int(np.searchsorted(dates, pd.Timestamp(start).to_datetime64(), side='left'))
+            if end is not None:
+                last = lo + int(np.searchsorted(dates, pd.Timestamp(end).to_datetime64(), side='right'))
+            if latest is not None:
+                first = max(first, last - int(latest))
+            last = max(first, last)
+        rows = self._df.iloc[self._order[first:last]].reset_index(drop=True)
+        rows['dated_ts'] = self._dates[first:last]
+        return rows.astype({'employee_id': int})
@@ -0,0 +1,188 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from sales_ingest import load_sales_frame
+from shared_dataset import SHARED_DATASET, attach_derived, attach_frame
+
+# Default location of the sales CSV, relative to the working directory
+SALES_DATA_PATH = 'data/sales_performance_data.csv'
+# Entries kept by derived_lru() across all names
+DERIVED_LRU_SIZE = 16
+
+
+class SalesDataStore:
+    """Process-wide, versioned in-memory copy of the sales CSV.
+
+    The file is parsed once and every caller shares the same frame. When the
+    file's mtime or size changes the store parses it again and swaps the new
+    frame in atomically, so readers always see one complete version.
+
+    With `shared` the frame and the derived structures that support it are
+    memory-mapped from files shared by every process (see
+    shared_dataset.py). Versions are named after the file's signature, so
+    all processes agree on them and each swaps to a new version on its own
+    next check, without a restart.
+    """
+
+    def __init__(self, path=SALES_DATA_PATH, check_interval=1.0, shared=SHARED_DATASET):
+        self.path = path
+        self.shared = shared
+        # Minimum number of seconds between two stat() calls on the file
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        # (dataframe, version, file signature) is swapped as one tuple
+        self._snapshot = None
+        self._last_check = 0.0
+        # name -> (version, value) for structures derived from the data
+        self._derived = {}
+        self._derived_lock = threading.Lock()
+        # name -> (version, value) for request-parameterized structures
+        self._derived_lru = OrderedDict()
+        self._derived_lru_lock = threading.Lock()
+
+    def _signature(self):
+        stat = os.stat(self.path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _make_version(self, signature):
+        raw = f"{os.path.abspath(self.path)}:{signature[0]}:{signature[1]}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:12]
+
+    def _parse(self, version, signature):
+        if not self.shared:
+            return load_sales_frame(self.path)
+        return attach_frame(self.path, version, lambda: load_sales_frame(self.path),
+                            lambda: self._signature() == signature)
+
+    def reload(self, force=False):
+        """Re-parse the CSV if it changed on disk (or always when forced)."""
+        with self._lock:
+            signature = self._signature()
+            current = self._snapshot
+            if current is not None and not force and current[2] == signature:
+                return current
+            version = self._make_version(signature)
+            df = self._parse(version, signature)
+            # Stat again: if the file was modified while we were parsing, the
+            # next check will pick that up instead of pinning a stale version
+            if self._signature() != signature:
+                signature = (None, None)
+            snapshot = (df, version, signature)
+            self._snapshot = snapshot
+            self._last_check = time.monotonic()
+            return snapshot
+
+    def _current(self):
+        snapshot = self._snapshot
+        now = time.monotonic()
+        if snapshot is None:
+            return self.reload()
+        if now - self._last_check < self.check_interval:
+            return snapshot
+        self._last_check = now
+        try:
+            if self._signature() == snapshot[2]:
+                return snapshot
+            return self.reload()
+        except Exception as e:
+            # Keep serving the last good version if the new file can't be read
+            print(f"Error reloading sales data, serving version {snapshot[1]}: {e}")
+            return snapshot
+
+    def snapshot(self):
+        """Return (dataframe, version) for the current data version.
+
+        The dataframe is a shallow copy: adding or replacing columns on it is
+        local to the caller, but values must not be modified in place.
+        """
+        df, version, _ = self._current()
+        return df.copy(deep=False), version
+
+    def get(self):
+        """Return a read-only view of the current sales dataframe."""
+        return self.snapshot()[0]
+
+    def derived(self, name, builder, update=None):
+        """Return builder(dataframe), computed once per data version.
+
+        Used for indexes and rollups that are expensive to build but only
+        change when the underlying file does. With `update`, a new version
+        is first tried as update(previous value, dataframe), which may
+        return None to fall back to a full build. In shared mode, builders with
+        `from_shared` are run by one process and mapped by the rest.
+        """
+        return self.derived_snapshot(name, builder, update)[0]
+
+    def derived_snapshot(self, name, builder, update=None):
+        """Return (value, version): `derived` together with the data
+        version the value was built from."""
+        df, version, signature = self._current()
+        cached = self._derived.get(name)
+        if cached is not None and cached[0] == version:
+            return cached[1], version
+        with self._derived_lock:
+            cached = self._derived.get(name)
+            if cached is not None and cached[0] == version:
+                return cached[1], version
+
+            def build():
+                value = None
+                if cached is not None and update is not None:
+                    value = update(cached[1], df.copy(deep=False))
+                if value is None:
+                    value = builder(df.copy(deep=False))
+                return value
+
+            # Shared when the builder is a class that can map itself back
+            # (TrendRollups, RepIndex); a frame read while the file changed
+            # is this process's alone
+            if self.shared and signature[0] is not None and hasattr(builder, 'from_shared'):
+                value = attach_derived(self.path, version, name, df.copy(deep=False), builder, build)
+            else:
+                value = build()
+            self._derived[name] = (version, value)
+            return value, version
+
+    def derived_lru(self, name, builder, max_items=DERIVED_LRU_SIZE):
+        """Return builder(dataframe) for the current version, like derived(),
+        but only the `max_items` most recently used names are kept. For
+        values whose name depends on request parameters (e.g. a token
+        budget), where derived() would keep one entry per value ever asked
+        for."""
+        df, version, _ = self._current()
+        with self._derived_lru_lock:
+            cached = self._derived_lru.get(name)
+            if cached is not None and cached[0] == version:
+                self._derived_lru.move_to_end(name)
+                return cached[1]
+        # Built outside the lock: a duplicate build beats serializing requests
+        value = builder(df.copy(deep=False))
+        with self._derived_lru_lock:
+            self._derived_lru[name] = (version, value)
+            self._derived_lru.move_to_end(name)
+            while len(self._derived_lru) > max_items:
+                self._derived_lru.popitem(last=False)
+        return value
+
+    @property
+    def version(self):
+        """Token identifying the currently loaded data version."""
+        return self._current()[1]
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store(path=SALES_DATA_PATH):
+    """Return the shared store for `path`, creating it on first use."""
+    key = os.path.abspath(path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = SalesDataStore(path)
+            _stores[key] = store
+        return store
@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+
+from sales_ingest import sales_dates
+
+# Feature name -> (kind, column, parameter). Every feature is computed per
+# employee over that employee's rows in date order:
+#   lag      value `parameter` rows earlier
+#   rolling  mean of the last `parameter` rows (all of them must be present)
+#   ewm      exponentially weighted mean with span `parameter`, skipping
+#            missing values (pandas ewm(adjust=False, ignore_na=True))
+#   ratio    column / `parameter` column, missing when the denominator is 0
+FEATURES = {
+    'lag_revenue': ('lag', 'revenue_confirmed', 1),
+    'lag_7_revenue': ('lag', 'revenue_confirmed', 7),
+    'rolling_avg_revenue': ('rolling', 'revenue_confirmed', 3),
+    'rolling_7_avg_revenue': ('rolling', 'revenue_confirmed', 7),
+    'ewm_7_revenue': ('ewm', 'revenue_confirmed', 7),
+    'revenue_per_lead': ('ratio', 'revenue_confirmed', 'lead_taken'),
+    'revenue_per_application': ('ratio', 'revenue_confirmed', 'applications'),
+}
+
+KINDS = ('lag', 'rolling', 'ewm', 'ratio')
+
+# Last covered rows whose hashes extend() compares to tell an append from a
+# rewrite
+CHECK_ROWS = 256
+
+
+def _input_columns(features):
+    columns = []
+    for name, (kind, column, parameter) in features.items():
+        if kind not in KINDS:
+            raise ValueError(f"Unknown feature kind for {name}: {kind}")
+        for c in (column, parameter) if kind == 'ratio' else (column,):
+            if c not in columns:
+                columns.append(c)
+    return columns
+
+
+def _history(features):
+    """Rows of each employee's past that lag and rolling features look at."""
+    sizes = [p if kind == 'lag' else p - 1 for kind, _, p in features.values() if kind in ('lag', 'rolling')]
+    return max(sizes, default=0)
+
+
+def _groups(ids):
+    """Group number and position within the group of every row of a sorted id array."""
+    first = np.r_[True, ids[1:] != ids[:-1]] if len(ids) else np.zeros(0, dtype=bool)
+    group = np.cumsum(first) - 1
+    starts = np.flatnonzero(first)
+    return group, np.arange(len(ids)) - starts[group], starts
+
+
+def _lag(values, pos, k):
+    out = np.full(len(values), np.nan)
+    out[k:] = values[:len(values) - k]
+    out[pos < k] = np.nan
+    return out
+
+
+def _rolling_mean(values, pos, window):
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        # A NaN anywhere in the window makes the mean NaN, as min_periods=window does
+        out[window - 1:] = np.lib.stride_tricks.sliding_window_view(values, window).mean(axis=1)
+    out[pos < window - 1] = np.nan
+    return out
+
+
+def _ewm(values, group, span, initial):
+    """Per-group EWM of the flat, group-sorted `values`.
+
+    `initial` is the value each group continues from (NaN to start fresh).
+    It is fed to pandas as an extra leading row of its group, which
+    adjust=False weighs exactly like a previous EWM value, and dropped
+    from the result.
+    """
+    if not len(values):
+        return np.zeros(0)
+    seeds = np.flatnonzero(~np.isnan(initial))
+    keys = np.concatenate([seeds, group])
+    # Stable, so each seed stays ahead of its group's rows
+    order = np.argsort(keys, kind='stable')
+    is_seed = np.r_[np.ones(len(seeds), dtype=bool), np.zeros(len(group), dtype=bool)][order]
+    series = pd.Series(np.concatenate([initial[seeds], values])[order])
+    smoothed = (series.groupby(keys[order], sort=False)
+                .ewm(alpha=2.0 / (span + 1), adjust=False, ignore_na=True).mean())
+    return smoothed.to_numpy()[~is_seed]
+
+
+def _ratio(numerator, denominator):
+    out = np.full(len(numerator), np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _row_hashes(df, inputs):
+    return pd.util.hash_pandas_object(df[['employee_id', 'dated', *inputs]], index=False).to_numpy()
+
+
+def _sorted_inputs(df, inputs, first_row=0):
+    """Rows with a date, sorted by (employee_id, dated), as contiguous arrays.
+
+    `row` is each row's position in the source frame.
+    """
+    dates = sales_dates(df).to_numpy()
+    valid = np.flatnonzero(~np.isnat(dates))
+    ids = df['employee_id'].to_numpy()[valid].astype(np.int64)
+    dates = dates[valid]
+    # lexsort is stable, so rows of the same employee and date keep file order
+    order = np.lexsort((dates, ids))
+    data = {
+        'row': valid[order] + first_row,
+        'employee_id': ids[order],
+        'dated': dates[order],
+    }
+    for column in inputs:
+        data[column] = df[column].to_numpy(dtype=float)[valid][order]
+    return data
+
+
+class FeatureTable:
+    """Per-employee features of the sales rows, sorted by (employee_id, dated).
+
+    Built in one vectorized pass over the whole table; when rows are only
+    appended to the data, `extend` computes features for the new rows alone
+    from the last few rows (and EWM values) of each employee.
+    """
+
+    def __init__(self, frame, rows, tail_hashes, features):
+        self.frame = frame
+        # Number of source rows (including undated ones) covered
+        self.rows = rows
+        # _row_hashes() of the last CHECK_ROWS of them
+        self.tail_hashes = tail_hashes
+        self.features = features
+        self.inputs = _input_columns(features)
+
+    def aligned(self, index):
+        """Feature columns in source row order, labelled with `index`.
+
+        Rows without a date get NaN.
+        """
+        if len(index) != self.rows:
+            raise ValueError(f"Features cover {self.rows} rows, not {len(index)}")
+        out = np.full((self.rows, len(self.features)), np.nan)
+        out[self.frame['row'].to_numpy()] = self.frame[list(self.features)].to_numpy()
+        return pd.DataFrame(out, index=index, columns=list(self.features))
+
+    def extend(self, df):
+        """Return the features of `df`, reusing this table where possible.
+
+        `self` when `df` is the data it was built from, an extended table
+        when `df` only appends rows, and None when older rows changed or new
+        rows are dated before an employee's latest row (a full rebuild is
+        needed). Older rows are checked by their count and the last
+        CHECK_ROWS of them, so the check costs the same however long the
+        history is; an edit further back goes unnoticed here (see
+        update_features for the store's rebuild on same-length versions).
+        """
+        if len(df) < self.rows:
+            return None
+        covered = df.iloc[max(0, self.rows - CHECK_ROWS):self.rows]
+        if not np.array_equal(_row_hashes(covered, self.inputs), self.tail_hashes):
+            return None
+        if len(df) == self.rows:
+            return self
+        new_rows = df.iloc[self.rows:]
+        new = _sorted_inputs(new_rows, self.inputs, first_row=self.rows)
+        tail_hashes = np.concatenate([self.tail_hashes, _row_hashes(new_rows.iloc[-CHECK_ROWS:], self.inputs)])
+        tail_hashes = tail_hashes[-CHECK_ROWS:]
+        if not len(new['row']):
+            return FeatureTable(self.frame, len(df), tail_hashes, self.features)
+
+        old_ids = self.frame['employee_id'].to_numpy()
+        _, _, starts = _groups(old_ids)
+        stops = np.r_[starts[1:], len(old_ids)].astype(int)
+        ranges = {int(old_ids[lo]): (lo, hi) for lo, hi in zip(starts, stops)}
+        old_dates = self.frame['dated'].to_numpy()
+        new_group, _, new_starts = _groups(new['employee_id'])
+
+        history = _history(self.features)
+        tails = []
+        last_rows = []
+        for lo in new_starts:
+            span = ranges.get(int(new['employee_id'][lo]))
+            if span is None:
+                last_rows.append(-1)
+                continue
+            if new['dated'][lo] < old_dates[span[1] - 1]:
+                return None
+            tails.append(np.arange(max(span[0], span[1] - history), span[1]))
+            last_rows.append(span[1] - 1)
+        tail = np.concatenate(tails) if tails else np.zeros(0, dtype=int)
+        last_rows = np.array(last_rows)
+
+        # Lags and windows run over each employee's tail followed by its new
+        # rows; only the new rows' results are kept
+        combined = {}
+        for column in ('employee_id', 'dated', *self.inputs):
+            combined[column] = np.concatenate([self.frame[column].to_numpy()[tail], new[column]])
+        order = np.lexsort((combined['dated'], combined['employee_id']))
+        is_new = np.r_[np.zeros(len(tail), dtype=bool), np.ones(len(new['row']), dtype=bool)][order]
+        combined = {column: values[order] for column, values in combined.items()}
+        group, pos, _ = _groups(combined['employee_id'])
+
+        # EWMs continue from each employee's latest value
+        initial = {}
+        for name, (kind, _, _) in self.features.items():
+            if kind == 'ewm':
+                last = self.frame[name].to_numpy()
+                initial[name] = np.where(last_rows >= 0, last[np.maximum(last_rows, 0)], np.nan)
+
+        computed = _compute(combined, group, pos, self.features, skip_ewm=True)
+        for name, (kind, column, parameter) in self.features.items():
+            if kind == 'ewm':
+                values = _ewm(new[column], new_group, parameter, initial[name])
+            else:
+                values = computed[name][is_new]
+            new[name] = values
+
+        frame = pd.concat([self.frame, pd.DataFrame(new)], ignore_index=True)
+        # New rows are dated no earlier than their employee's existing rows,
+        # so a stable sort on the id alone restores the (employee_id, dated) order
+        frame = frame.iloc[np.argsort(frame['employee_id'].to_numpy(), kind='stable')]
+        return FeatureTable(frame.reset_index(drop=True), len(df), tail_hashes, self.features)
+
+
+def _compute(data, group, pos, features, skip_ewm=False):
+    results = {}
+    for name, (kind, column, parameter) in features.items():
+        values = data[column]
+        if kind == 'lag':
+            results[name] = _lag(values, pos, parameter)
+        elif kind == 'rolling':
+            results[name] = _rolling_mean(values, pos, parameter)
+        elif kind == 'ewm':
+            if not skip_ewm:
+                initial = np.full(int(group.max()) + 1 if len(group) else 0, np.nan)
+                results[name] = _ewm(values, group, parameter, initial)
+        else:
+            results[name] = _ratio(values, data[parameter])
+    return results
+
+
+def build_features(df, features=FEATURES):
+    """Compute `features` for every dated row of `df` (see FEATURES)."""
+    inputs = _input_columns(features)
+    data = _sorted_inputs(df, inputs)
+    group, pos, _ = _groups(data['employee_id'])
+    data.update(_compute(data, group, pos, features))
+    return FeatureTable(pd.DataFrame(data), len(df), _row_hashes(df.iloc[-CHECK_ROWS:], inputs), features)
+
+
+def update_features(table, df):
+    """Store update hook: extend `table` to the new version of the data.
+
+    The store only calls it when the file changed, so a version with no
+    more rows than `table` covers was rewritten and is rebuilt.
+    """
+    if len(df) <= table.rows:
+        return None
+    return table.extend(df)
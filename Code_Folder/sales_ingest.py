@@ -0,0 +1,164 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# Format of the `dated` column in the sales CSV
+DATE_FORMAT = '%d/%m/%Y'
+
+# Declared dtypes of every column in the sales CSV. `dated` is parsed
+# separately with DATE_FORMAT; everything else is read as declared instead
+# of being inferred row by row.
+SCHEMA = {
+    'employee_id': 'int32',
+    'employee_name': 'object',
+    'created': 'object',
+    'dated': 'object',
+    'lead_taken': 'int32',
+    'tours_booked': 'int32',
+    'applications': 'int32',
+    'tours_per_lead': 'float64',
+    'apps_per_tour': 'float64',
+    'apps_per_lead': 'float64',
+    'revenue_confirmed': 'int64',
+    'revenue_pending': 'int64',
+    'revenue_runrate': 'int64',
+    'tours_in_pipeline': 'int32',
+    'avg_deal_value_30_days': 'int64',
+    'avg_close_rate_30_days': 'float64',
+    'estimated_revenue': 'int64',
+    'tours': 'int32',
+    'tours_runrate': 'int32',
+    'tours_scheduled': 'int32',
+    'tours_pending': 'int32',
+    'tours_cancelled': 'int32',
+    'mon_text': 'int32',
+    'tue_text': 'int32',
+    'wed_text': 'int32',
+    'thur_text': 'int32',
+    'fri_text': 'int32',
+    'sat_text': 'int32',
+    'sun_text': 'int32',
+    'mon_call': 'int32',
+    'tue_call': 'int32',
+    'wed_call': 'int32',
+    'thur_call': 'int32',
+    'fri_call': 'int32',
+    'sat_call': 'int32',
+    'sun_call': 'int32',
+}
+
+# Suffix of the columnar cache written next to the CSV
+CACHE_SUFFIX = '.cache.feather'
+# Schema metadata key recording which CSV the cache was built from
+_SOURCE_KEY = b'source_signature'
+
+# Whether the missing-pyarrow fallback has been reported yet
+_reported_no_pyarrow = False
+
+
+def sales_dates(df):
+    """Return the `dated` column as datetimes, parsing it if still text."""
+    if pd.api.types.is_datetime64_any_dtype(df['dated']):
+        return df['dated']
+    return pd.to_datetime(df['dated'], format=DATE_FORMAT, errors='coerce')
+
+
+def read_sales_csv(source, columns=None):
+    """Parse sales CSV data (a path or file object) with the declared schema.
+
+    `columns` projects the read down to what the caller needs. Files that
+    don't match the schema (e.g. a missing value in an integer column) are
+    parsed again with type inference rather than rejected.
+    """
+    dtypes = {c: t for c, t in SCHEMA.items() if c != 'dated' and (columns is None or c in columns)}
+    try:
+        df = pd.read_csv(source, usecols=columns, dtype=dtypes)
+    except (ValueError, TypeError) as e:
+        print(f"Sales CSV does not match the declared schema, inferring types: {e}")
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        df = pd.read_csv(source, usecols=columns)
+    if 'dated' in df.columns:
+        df['dated'] = pd.to_datetime(df['dated'], format=DATE_FORMAT, errors='coerce')
+    return df
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}".encode('utf-8')
+
+
+def cache_path(path):
+    return path + CACHE_SUFFIX
+
+
+def _read_cache(path, columns, signature):
+    import pyarrow as pa
+
+    with pa.memory_map(cache_path(path), 'r') as source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if metadata.get(_SOURCE_KEY) != signature:
+            return None
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select(columns)
+        df = table.to_pandas(split_blocks=True)
+    # Arrow hands missing text back as None; the CSV parser gives NaN, and
+    # prompts built from the frame must not depend on which one was loaded
+    for column in df.columns:
+        if df[column].dtype == object and df[column].isna().any():
+            df[column] = df[column].where(df[column].notna(), np.nan)
+    return df
+
+
+def _write_cache(path, df, signature):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _SOURCE_KEY: signature})
+    tmp_path = f"{cache_path(path)}.{os.getpid()}.tmp"
+    # Uncompressed so later loads can memory-map the columns directly
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, cache_path(path))
+
+
+def load_sales_frame(path, columns=None, use_cache=True):
+    """Load the sales data, preferring the memory-mapped columnar cache.
+
+    The first load parses the CSV with the declared schema and writes a
+    Feather sidecar tagged with the CSV's mtime and size. Later loads map the
+    sidecar instead of parsing text, and a changed CSV invalidates it. Falls
+    back to plain CSV parsing when pyarrow is not installed.
+    """
+    if not use_cache:
+        return read_sales_csv(path, columns)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        global _reported_no_pyarrow
+        if not _reported_no_pyarrow:
+            _reported_no_pyarrow = True
+            print("pyarrow is not installed, parsing the sales CSV on every load without the Feather cache "
+                  "(see requirements.txt)")
+        return read_sales_csv(path, columns)
+
+    signature = _source_signature(path)
+    try:
+        df = _read_cache(path, columns, signature)
+        if df is not None:
+            return df
+    except (OSError, KeyError, ValueError):
+        # Missing, stale or unreadable cache: rebuild it below
+        pass
+
+    df = read_sales_csv(path)
+    try:
+        # Only publish the cache if the CSV didn't change while parsing it
+        if _source_signature(path) == signature:
+            _write_cache(path, df, signature)
+    except OSError as e:
+        print(f"Error writing sales data cache: {e}")
+    return df[columns] if columns is not None else df
@@ -0,0 +1,239 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# SHARED_DATASET=1 keeps the sales data and its shareable derived structures
+# in memory-mapped files that every process on the box attaches to, instead
+# of each worker holding its own copy
+SHARED_DATASET = os.environ.get('SHARED_DATASET', '0') == '1'
+
+# Directory next to the CSV holding one subdirectory per data version
+SHARED_SUFFIX = '.shared'
+# Versions kept on disk: the current one and the one before it, for
+# processes that have not noticed the swap yet
+KEEP_VERSIONS = 2
+# Seconds to wait for another process building the same files before
+# building a private copy (and after which its lock counts as abandoned)
+BUILD_WAIT = float(os.environ.get('SHARED_BUILD_WAIT', '300'))
+
+MANIFEST = 'manifest.json'
+
+
+def shared_dir(path):
+    return path + SHARED_SUFFIX
+
+
+def _version_dir(path, version, name):
+    return os.path.join(shared_dir(path), version, name)
+
+
+def _save(directory, meta, arrays):
+    os.makedirs(directory)
+    for key, array in arrays.items():
+        np.save(os.path.join(directory, f'{key}.npy'), np.ascontiguousarray(array), allow_pickle=False)
+    # Written last: a directory with a manifest is complete
+    with open(os.path.join(directory, MANIFEST), 'w') as f:
+        json.dump({'meta': meta, 'arrays': list(arrays)}, f)
+
+
+def _load(directory):
+    """Map a published directory read-only; None if it doesn't exist."""
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            manifest = json.load(f)
+        arrays = {
+            key: np.load(os.path.join(directory, f'{key}.npy'), mmap_mode='r', allow_pickle=False)
+            for key in manifest['arrays']
+        }
+    except FileNotFoundError:
+        # Not published yet, or pruned while we were opening it
+        return None
+    return manifest['meta'], arrays
+
+
+def _publish(directory, meta, arrays):
+    """Write a version's files under a temporary name and rename them into
+    place, so readers never see a partial directory. When two processes
+    publish the same thing at once the first rename wins."""
+    tmp = f"{directory}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    _save(tmp, meta, arrays)
+    try:
+        os.rename(tmp, directory)
+    except OSError:
+        # Already published by another process
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def _prune(path, keep):
+    """Remove versions other than `keep` and the newest one before it.
+
+    Processes still mapping a removed version keep reading it; the files
+    are only freed once the last mapping is closed.
+    """
+    root = shared_dir(path)
+    try:
+        entries = [(e.stat().st_mtime, e.name, e.path) for e in os.scandir(root)
+                   if e.is_dir() and not e.name.endswith('.tmp')]
+    except FileNotFoundError:
+        return
+    entries.sort(reverse=True)
+    kept = {keep}
+    for _, name, entry_path in entries:
+        if name in kept:
+            continue
+        if len(kept) < KEEP_VERSIONS:
+            kept.add(name)
+            continue
+        shutil.rmtree(entry_path, ignore_errors=True)
+
+
+def frame_to_arrays(df):
+    """Split a frame into arrays that can be mapped back without copying.
+
+    Text columns are stored as integer codes into their distinct values;
+    only those columns are rebuilt per process on attach.
+    """
+    meta = {'columns': list(df.columns), 'text': {}}
+    arrays = {}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if values.dtype == object or isinstance(values.dtype, pd.StringDtype):
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+            arrays[f'c{i}'] = codes.astype(np.int32)
+            arrays[f'c{i}_values'] = np.asarray(uniques, dtype=str)
+            meta['text'][str(i)] = str(values.dtype)
+        else:
+            arrays[f'c{i}'] = values.to_numpy()
+    return meta, arrays
+
+
+def frame_from_arrays(meta, arrays):
+    columns = {}
+    for i, column in enumerate(meta['columns']):
+        dtype = meta['text'].get(str(i))
+        if dtype is not None:
+            # Code -1 (missing) picks the NaN appended after the distinct values
+            values = np.append(arrays[f'c{i}_values'].astype(object), np.nan)
+            columns[column] = pd.Series(values[arrays[f'c{i}']], dtype=dtype)
+        else:
+            columns[column] = arrays[f'c{i}']
+    return pd.DataFrame(columns, copy=False)
+
+
+def _claim(directory):
+    """Take the build lock of `directory`: True if this process should
+    build it, False while another process is building it."""
+    lock = directory + '.lock'
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        try:
+            stale = time.time() - os.stat(lock).st_mtime > BUILD_WAIT
+        except FileNotFoundError:
+            stale = True
+        if not stale:
+            return False
+        # The builder died or hung: take over
+        try:
+            os.remove(lock)
+        except FileNotFoundError:
+            pass
+        return _claim(directory)
+    os.write(fd, str(os.getpid()).encode('utf-8'))
+    os.close(fd)
+    return True
+
+
+def _release(directory):
+    try:
+        os.remove(directory + '.lock')
+    except FileNotFoundError:
+        pass
+
+
+def _wait(directory):
+    """Wait for another process to publish `directory` and map it; None if
+    it gave up or takes longer than BUILD_WAIT."""
+    deadline = time.monotonic() + BUILD_WAIT
+    while time.monotonic() < deadline:
+        shared = _load(directory)
+        if shared is not None:
+            return shared
+        if not os.path.exists(directory + '.lock'):
+            # Released: either just published or abandoned
+            return _load(directory)
+        time.sleep(0.05)
+    return None
+
+
+def _load_or_publish(directory, build):
+    """Map `directory`, publishing it first if no process has.
+
+    One process runs `build()`, which returns (value, (meta, arrays)) or
+    (value, None) when the value must not be published; the others wait
+    for it rather than building the same thing at the same time. Returns
+    (meta, arrays) once published, or (None, value) with a private value.
+    """
+    shared = _load(directory)
+    if shared is not None:
+        return shared
+    if not _claim(directory):
+        shared = _wait(directory)
+        if shared is not None:
+            return shared
+        # The builder gave up (e.g. the file changed): build our own copy
+        return None, build()[0]
+    try:
+        # Published between our first look and taking the lock
+        shared = _load(directory)
+        if shared is not None:
+            return shared
+        value, published = build()
+        if published is None:
+            return None, value
+        _publish(directory, *published)
+    finally:
+        _release(directory)
+    shared = _load(directory)
+    return shared if shared is not None else (None, value)
+
+
+def attach_frame(path, version, load, is_current):
+    """Return version `version` of the sales frame, mapped from disk.
+
+    The first process to need the version calls `load()` and publishes it,
+    unless `is_current()` shows the file changed while it was loading.
+    """
+    def build():
+        df = load()
+        return df, frame_to_arrays(df) if is_current() else None
+
+    meta, mapped = _load_or_publish(_version_dir(path, version, 'frame'), build)
+    _prune(path, version)
+    if meta is None:
+        return mapped
+    return frame_from_arrays(meta, mapped)
+
+
+def attach_derived(path, version, name, df, cls, build):
+    """Return derived structure `name` (an instance of `cls`) of `version`.
+
+    One process runs `build()` and publishes the result's `to_shared()`;
+    every process then maps it through `cls.from_shared(df, meta, arrays)`.
+    """
+    def build_shared():
+        value = build()
+        return value, value.to_shared()
+
+    meta, mapped = _load_or_publish(_version_dir(path, version, name), build_shared)
+    if meta is None:
+        return mapped
+    return cls.from_shared(df, meta, mapped)
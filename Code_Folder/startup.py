@@ -0,0 +1,93 @@
+import sys
+import threading
+import time
+
+# Reference point for the startup report: when the app code was first imported
+STARTED = time.perf_counter()
+
+
+class Subsystem:
+    """A group of heavy dependencies loaded the first time it is used.
+
+    `loader()` runs once, under a lock, and its result is returned by every
+    later `get()`. How long it took and when it happened go into the
+    startup report, so slow cold starts can be traced to an import.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_ms = None
+        self.loaded_at_s = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                modules = len(sys.modules)
+                self._value = self._loader()
+                self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+                self.loaded_at_s = round(started - STARTED, 3)
+                self.modules_imported = len(sys.modules) - modules
+                self._loaded = True
+        return self._value
+
+    def report(self):
+        report = {'loaded': self._loaded}
+        if self._loaded:
+            report.update({
+                'load_ms': self.load_ms,
+                'loaded_at_s': self.loaded_at_s,
+                'modules_imported': self.modules_imported,
+            })
+        return report
+
+
+_subsystems = {}
+
+
+def subsystem(name, loader):
+    """Register and return a lazily loaded subsystem."""
+    _subsystems[name] = Subsystem(name, loader)
+    return _subsystems[name]
+
+
+def current_rss_mb():
+    """Resident memory of this process, from /proc where available."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    try:
+        import resource
+        # Peak rather than current, but the best available off Linux
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:
+        return None
+
+
+# Phases of app construction, name -> milliseconds, filled in by app_factory
+phases = {}
+
+
+def startup_report():
+    """Construction phases, which subsystems are loaded and what they cost."""
+    return {
+        'uptime_s': round(time.perf_counter() - STARTED, 3),
+        'phases_ms': dict(phases),
+        'subsystems': {name: s.report() for name, s in _subsystems.items()},
+        'modules_loaded': len(sys.modules),
+        'rss_mb': current_rss_mb(),
+    }
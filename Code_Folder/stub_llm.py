@@ -0,0 +1,61 @@
+import asyncio
+import hashlib
+import time
+
+from langchain_core.language_models.llms import LLM
+from langchain_core.outputs import GenerationChunk
+
+
+class StubLLM(LLM):
+    """Deterministic local stand-in for the OpenAI LLM.
+
+    Answers are derived from a hash of the prompt, so the same prompt always
+    gets the same answer, and each call sleeps for `latency` seconds to mimic
+    a network round trip. Used for tests and load runs without an API key.
+    """
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return 'stub'
+
+    @property
+    def _identifying_params(self):
+        return {'model_name': 'stub', 'latency': self.latency}
+
+    def _answer(self, prompt):
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:8]
+        return f"Stub feedback {digest}: performance reviewed over {len(prompt)} prompt characters."
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._answer(prompt)
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        # Waits without holding a thread, like a real async HTTP client
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._answer(prompt)
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        # Word-sized chunks with the latency spread across them
+        words = self._answer(prompt).split(' ')
+        for i, word in enumerate(words):
+            if self.latency:
+                time.sleep(self.latency / len(words))
+            chunk = GenerationChunk(text=word if i == 0 else ' ' + word)
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        words = self._answer(prompt).split(' ')
+        for i, word in enumerate(words):
+            if self.latency:
+                await asyncio.sleep(self.latency / len(words))
+            chunk = GenerationChunk(text=word if i == 0 else ' ' + word)
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
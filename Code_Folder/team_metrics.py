@@ -0,0 +1,257 @@
+import hashlib
+import io
+import os
+import threading
+
+import pandas as pd
+
+from prompt_compaction import PERIOD_DAYS
+from sales_data_store import SALES_DATA_PATH
+from sales_ingest import read_sales_csv
+
+# Columns whose running totals are kept
+SUM_METRICS = [
+    'lead_taken', 'tours_booked', 'applications', 'tours',
+    'revenue_confirmed', 'revenue_pending', 'estimated_revenue',
+]
+# Columns whose running means are kept
+MEAN_METRICS = [
+    'apps_per_lead', 'apps_per_tour', 'tours_per_lead',
+    'revenue_runrate', 'avg_deal_value_30_days', 'avg_close_rate_30_days',
+]
+
+# Bytes just before the consumed offset, and bytes of each of
+# FINGERPRINT_SAMPLES blocks spread evenly over the rest of the consumed
+# prefix, that are re-hashed to detect rewrites
+FINGERPRINT_BYTES = 4096
+FINGERPRINT_SAMPLES = 16
+SAMPLE_BYTES = 512
+
+
+def _fingerprint(f, offset):
+    """Hash of the header line's block, FINGERPRINT_SAMPLES blocks spread
+    over the first `offset` bytes and the FINGERPRINT_BYTES just before
+    `offset`. Reads at most ~12 KB however long the file is."""
+    digest = hashlib.sha1(str(offset).encode())
+    tail = max(0, offset - FINGERPRINT_BYTES)
+    step = tail // FINGERPRINT_SAMPLES
+    starts = sorted({i * step for i in range(FINGERPRINT_SAMPLES)}) if step else [0]
+    for start in starts:
+        f.seek(start)
+        digest.update(f.read(min(SAMPLE_BYTES, tail - start)))
+    f.seek(tail)
+    digest.update(f.read(offset - tail))
+    return digest.hexdigest()
+
+
+class IncrementalTeamMetrics:
+    """Running team and per-employee aggregates over the append-only CSV.
+
+    The engine remembers how many bytes and rows of the file it has folded
+    in. On refresh it only parses what was appended after that offset, so a
+    request costs a stat() call when nothing changed and O(new rows)
+    otherwise. If the file was replaced (new inode), shrank, or a bounded
+    fingerprint of the bytes before the offset (the last few KB plus
+    samples spread over the rest, see _fingerprint) no longer matches, the
+    file was rewritten and everything is rebuilt from scratch. An edit deep
+    in the history that keeps every byte offset and misses the samples goes
+    unnoticed; rewriting the file by replacing it is always caught.
+
+    The file is read and parsed outside the lock; only folding the parsed
+    rows into the aggregates holds it.
+
+    Totals are also kept per day, so the last period can be compared with
+    the one before it without going back to the rows.
+    """
+
+    def __init__(self, path=SALES_DATA_PATH):
+        self.path = path
+        # Reentrant: refresh() returns metrics() while holding it
+        self._lock = threading.RLock()
+        # Number of full rebuilds after the file was rewritten
+        self.rebuilds = 0
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.rows = 0
+        self._stat = None
+        self._inode = None
+        self._header = None
+        self._fingerprint = None
+        self._sums = dict.fromkeys(SUM_METRICS + MEAN_METRICS, 0.0)
+        self._counts = dict.fromkeys(SUM_METRICS + MEAN_METRICS, 0)
+        # employee_id -> {'employee_name', 'rows', 'sums', 'counts'}
+        self._employees = {}
+        # date -> SUM_METRICS totals of the rows dated that day
+        self._daily = {}
+        self._first_date = None
+        self._last_date = None
+
+    def refresh(self):
+        """Fold any appended rows into the aggregates and return the metrics."""
+        while True:
+            with self._lock:
+                seen = (self._stat, self._inode, self.offset, self._fingerprint, self._header)
+            stat = os.stat(self.path)
+            if (stat.st_mtime_ns, stat.st_size) == seen[0]:
+                return self.metrics()
+            update = self._read(*seen[1:])
+            with self._lock:
+                if (self._stat, self._inode, self.offset, self._fingerprint, self._header) != seen:
+                    # Another refresh got there first; check again from its state
+                    continue
+                stat, rewritten, header, end, fingerprint, new_rows = update
+                if rewritten:
+                    self._reset()
+                    self.rebuilds += 1
+                self._inode = stat.st_ino
+                self._header = header
+                self.offset = end
+                self._fingerprint = fingerprint
+                if new_rows is not None:
+                    self._fold(new_rows)
+                self._stat = (stat.st_mtime_ns, stat.st_size)
+                return self.metrics()
+
+    def _read(self, inode, offset, fingerprint, header):
+        """Read and parse what follows `offset`, or the whole file if it
+        was rewritten. Touches no engine state."""
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            rewritten = offset > 0 and (
+                stat.st_ino != inode
+                or stat.st_size < offset
+                or _fingerprint(f, offset) != fingerprint
+            )
+            if rewritten:
+                offset, header = 0, None
+            f.seek(offset)
+            chunk = f.read()
+            # A trailing partial line is left for the next refresh
+            end = chunk.rfind(b'\n') + 1
+            chunk = chunk[:end]
+            if header is None and end:
+                header_end = chunk.index(b'\n') + 1
+                header, body = chunk[:header_end], chunk[header_end:]
+            else:
+                body = chunk
+            end += offset
+            fingerprint = _fingerprint(f, end) if end else None
+        new_rows = None
+        if body.strip():
+            new_rows = read_sales_csv(io.BytesIO(header + body),
+                                      ['employee_id', 'employee_name', 'dated'] + SUM_METRICS + MEAN_METRICS)
+        return stat, rewritten, header, end, fingerprint, new_rows
+
+    def _fold(self, new_rows):
+        columns = SUM_METRICS + MEAN_METRICS
+        self.rows += len(new_rows)
+        sums = new_rows[columns].sum()
+        counts = new_rows[columns].count()
+        for column in columns:
+            self._sums[column] += float(sums[column])
+            self._counts[column] += int(counts[column])
+
+        daily = new_rows.dropna(subset=['dated']).groupby('dated')[SUM_METRICS].sum()
+        for day, day_sums in daily.iterrows():
+            totals = self._daily.setdefault(day, dict.fromkeys(SUM_METRICS, 0.0))
+            for column in SUM_METRICS:
+                totals[column] += float(day_sums[column])
+        if not daily.empty:
+            first, last = daily.index.min(), daily.index.max()
+            self._first_date = first if self._first_date is None else min(self._first_date, first)
+            self._last_date = last if self._last_date is None else max(self._last_date, last)
+
+        grouped = new_rows.groupby('employee_id')
+        group_sums = grouped[columns].sum()
+        group_counts = grouped[columns].count()
+        group_names = grouped['employee_name'].last()
+        group_rows = grouped.size()
+        for employee_id in group_sums.index:
+            employee = self._employees.setdefault(int(employee_id), {
+                'rows': 0,
+                'sums': dict.fromkeys(columns, 0.0),
+                'counts': dict.fromkeys(columns, 0),
+            })
+            employee['employee_name'] = group_names[employee_id]
+            employee['rows'] += int(group_rows[employee_id])
+            for column in columns:
+                employee['sums'][column] += float(group_sums.at[employee_id, column])
+                employee['counts'][column] += int(group_counts.at[employee_id, column])
+
+    @staticmethod
+    def _summarize(rows, sums, counts):
+        metrics = {'rows': rows}
+        for column in SUM_METRICS:
+            metrics[f'total_{column}'] = sums[column]
+        for column in MEAN_METRICS:
+            metrics[f'avg_{column}'] = sums[column] / counts[column] if counts[column] else None
+        return metrics
+
+    def metrics(self):
+        """Team-wide totals and means as of the last refresh, with the first
+        and last dates seen (None when no row had a date)."""
+        with self._lock:
+            metrics = self._summarize(self.rows, self._sums, self._counts)
+            metrics['first_date'] = self._first_date
+            metrics['last_date'] = self._last_date
+            return metrics
+
+    def period_totals(self, days=PERIOD_DAYS):
+        """SUM_METRICS totals of the last `days` days up to the last date
+        seen and of the `days` before them, as (current, previous); None if
+        there are no dated rows before the last period. Reads 2 * `days`
+        daily buckets, however long the history is."""
+        with self._lock:
+            if self._last_date is None:
+                return None
+            end = self._last_date
+            periods = []
+            for start in (0, days):
+                totals = dict.fromkeys(SUM_METRICS, 0.0)
+                found = False
+                for offset in range(start, start + days):
+                    day = self._daily.get(end - pd.Timedelta(days=offset))
+                    if day is not None:
+                        found = True
+                        for column in SUM_METRICS:
+                            totals[column] += day[column]
+                periods.append(totals if found else None)
+            if periods[1] is None:
+                return None
+            return periods[0], periods[1]
+
+    def _employee_summary(self, employee):
+        metrics = self._summarize(employee['rows'], employee['sums'], employee['counts'])
+        metrics['employee_name'] = employee['employee_name']
+        return metrics
+
+    def employee_metrics(self, employee_id):
+        """Totals and means for one employee, or None if they have no rows."""
+        with self._lock:
+            employee = self._employees.get(int(employee_id))
+            if employee is None:
+                return None
+            return self._employee_summary(employee)
+
+    def all_employee_metrics(self):
+        """Totals and means for every employee, keyed on employee id."""
+        with self._lock:
+            return {employee_id: self._employee_summary(employee)
+                    for employee_id, employee in self._employees.items()}
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_team_metrics(path=SALES_DATA_PATH):
+    """Return the shared metrics engine for `path`, creating it on first use."""
+    key = os.path.abspath(path)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            engine = IncrementalTeamMetrics(path)
+            _engines[key] = engine
+        return engine
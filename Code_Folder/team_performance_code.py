@@ -1,3 +1,7 @@
+from Individuale_sales_code import generate_feedback
+from llm_gateway import LLMUnavailable
+from prompt_compaction import compact_team_data
+
 # @app.route('/api/team_performance', methods=['GET'])
 def team_performance():
     df = get_sales_data()
@@ -6,7 +10,8 @@ def team_performance():
     total_sales = df['sales'].sum()
     performance_summary = f"The sales team has total sales of ${total_sales:.2f}."
 
-    prompt = f"Analyze the following sales data for the team: {df.to_dict()}.\nProvide feedback on the team's performance."
+    data_summary, prompt_tokens = compact_team_data(df)
+    prompt = f"Analyze the following summarized sales data for the team: {data_summary}.\nProvide feedback on the team's performance."
     feedback = generate_feedback(prompt)
 
     return jsonify({
@@ -24,9 +29,6 @@ def team_performance():
     # Ensure the data types are correct
     df['employee_id'] = df['employee_id'].astype(int)
 
-    # Limit the data sent to the model (e.g., use only the first 5 rows)
-    df_limited = df.head(5)
-
     # Example metrics: Total leads and conversion rates
     total_leads = df['lead_taken'].sum()
     tours_per_lead_rate = df['tours_per_lead'].mean()
@@ -44,18 +46,17 @@ def team_performance():
         f"Average applications per tour: {apps_per_tour_rate:.2f}."
     )
 
-    # Reduce the amount of data being sent by summarizing and limiting rows
-    data_summary = df_limited.to_dict(2)
+    # Condense the full dataset into a summary under the prompt token budget
+    data_summary, prompt_tokens = compact_team_data(df)
 
     # Generate feedback using GPT-4 based on summarized data
-    prompt = f"Analyze the following limited sales data for the team: {data_summary}.\nProvide feedback on the team's performance."
+    prompt = f"Analyze the following summarized sales data for the team: {data_summary}.\nProvide feedback on the team's performance."
     
     try:
         feedback = generate_feedback(prompt)
-    except openai.error.RateLimitError as e:
-        return jsonify({
-            'error': 'Rate limit exceeded, the data is too large to process at once. Please reduce the dataset.'
-        }), 429
+    except LLMUnavailable as e:
+        # The gateway already queued and retried the call; ask the client to come back later
+        return jsonify({'error': str(e)}), 503, {'Retry-After': '5'}
 
     return jsonify({
         'total_leads': total_leads,
@@ -0,0 +1,264 @@
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+# METRICS_ENABLED=0 turns every timer and counter below into a no-op
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+
+# Latency buckets in seconds, Prometheus client defaults plus a slow tail
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}')
+        return lines
+
+
+class Histogram:
+    """Bucketed distribution of observations (e.g. durations) with labels."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), sum and count
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, (list(s[0]), s[1], s[2])) for labels, s in self._series.items())
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f'{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}')
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{label_text} {_format_value(total)}')
+            lines.append(f'{self.name}_count{label_text} {count}')
+        return lines
+
+
+class Registry:
+    """Metrics exported by /metrics, plus callbacks that report gauges
+    (cache sizes, queue depths) at scrape time."""
+
+    def __init__(self):
+        self._metrics = []
+        self._stats = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_stats(self, prefix, stats, help):
+        """Export every numeric value of the dict returned by `stats()` as a
+        gauge named `<prefix>_<key>`."""
+        self._stats.append((prefix, stats, help))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for prefix, stats, help in self._stats:
+            try:
+                values = stats()
+            except Exception as e:
+                print(f"Error collecting {prefix} metrics: {e}")
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{prefix}_{key}'
+                lines.append(f'# HELP {name} {help} ({key})')
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+request_duration = registry.register(Histogram(
+    'http_request_duration_seconds', 'Time from request start until the response is returned',
+    ('endpoint', 'method', 'status'),
+))
+stage_duration = registry.register(Histogram(
+    'stage_duration_seconds', 'Time spent in each stage of a request',
+    ('endpoint', 'stage'),
+))
+llm_requests = registry.register(Counter(
+    'llm_requests_total', 'LLM completions requested, by cache outcome',
+    ('endpoint', 'cache'),
+))
+llm_prompt_tokens = registry.register(Counter(
+    'llm_prompt_tokens_total', 'Prompt tokens sent to the LLM', ('endpoint',),
+))
+llm_completion_tokens = registry.register(Counter(
+    'llm_completion_tokens_total', 'Completion tokens received from the LLM', ('endpoint',),
+))
+
+
+# Endpoint of the request being served by the async app (async_app.py);
+# Flask requests are read from Flask's request context instead
+request_endpoint = contextvars.ContextVar('request_endpoint', default=None)
+
+
+def current_endpoint():
+    from flask import has_request_context, request
+
+    endpoint = request_endpoint.get()
+    if endpoint is not None:
+        return endpoint
+    if has_request_context():
+        return request.endpoint or 'unknown'
+    return 'none'
+
+
+class _Stage:
+    __slots__ = ('stage', 'started')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        stage_duration.observe(time.perf_counter() - self.started, current_endpoint(), self.stage)
+        return False
+
+
+_disabled_stage = nullcontext()
+
+
+def stage(name):
+    """Time a block as one stage of the current request:
+
+        with stage('llm'):
+            ...
+    """
+    if not METRICS_ENABLED:
+        return _disabled_stage
+    return _Stage(name)
+
+
+def record_llm_call(cached, prompt_tokens=0, completion=None):
+    """Count one LLM completion and, for real calls, its token usage."""
+    if not METRICS_ENABLED:
+        return
+    endpoint = current_endpoint()
+    llm_requests.inc(endpoint, 'hit' if cached else 'miss')
+    if not cached:
+        from prompt_compaction import count_tokens
+
+        llm_prompt_tokens.inc(endpoint, amount=prompt_tokens)
+        if completion:
+            llm_completion_tokens.inc(endpoint, amount=count_tokens(completion))
+
+
+def instrument_app(app):
+    """Time every request of `app` and serve the registry at /metrics."""
+    from flask import Response, g, request
+
+    if METRICS_ENABLED:
+        @app.before_request
+        def start_timer():
+            g.request_started = time.perf_counter()
+
+        @app.after_request
+        def observe_request(response):
+            started = g.pop('request_started', None)
+            if started is not None:
+                # For streamed responses this is the time to the first byte
+                request_duration.observe(time.perf_counter() - started, request.endpoint or 'unknown',
+                                         request.method, response.status_code)
+            return response
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def instrument_aiohttp(app):
+    """`instrument_app` for the aiohttp app: times every request, labelled
+    with the route's name, and serves the registry at /metrics."""
+    from aiohttp import web
+
+    @web.middleware
+    async def observe_request(request, handler):
+        endpoint = request.match_info.route.name or 'unknown'
+        request_endpoint.set(endpoint)
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status
+            return response
+        except web.HTTPException as e:
+            status = e.status
+            raise
+        finally:
+            # For streamed responses this is the time until the stream ends
+            request_duration.observe(time.perf_counter() - started, endpoint, request.method, status)
+
+    if METRICS_ENABLED:
+        app.middlewares.append(observe_request)
+
+    async def metrics(request):
+        return web.Response(body=registry.render().encode('utf-8'), headers={'Content-Type': CONTENT_TYPE})
+
+    app.router.add_get('/metrics', metrics, name='metrics')
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+from sales_ingest import sales_dates
+
+# Supported trend periods and the pandas period frequency behind each
+PERIODS = {
+    'daily': 'D',
+    'weekly': 'W',
+    'monthly': 'M',
+    'quarterly': 'Q',
+}
+
+
+def format_bucket(period, start):
+    """Label a bucket the way the trend endpoints report it."""
+    if period == 'monthly':
+        return start.strftime('%Y-%m')
+    if period == 'quarterly':
+        return f"{start.year}-Q{(start.month - 1) // 3 + 1}"
+    return start.strftime('%Y-%m-%d')
+
+
+class Rollup:
+    """Sums and non-null counts of every metric per time bucket.
+
+    `prefix_sums`/`prefix_counts` hold running totals over the buckets so
+    the total of any contiguous bucket range is a single subtraction.
+    """
+
+    def __init__(self, starts, sums, counts, prefix_sums=None, prefix_counts=None):
+        self.starts = starts
+        self.sums = sums
+        self.counts = counts
+        if prefix_sums is None:
+            zeros = np.zeros((1, sums.shape[1]))
+            prefix_sums = np.vstack([zeros, np.cumsum(sums, axis=0)])
+            prefix_counts = np.vstack([zeros, np.cumsum(counts, axis=0)])
+        self.prefix_sums = prefix_sums
+        self.prefix_counts = prefix_counts
+
+    def range_totals(self, first, last):
+        """Sums and counts over the buckets starting within [first, last].
+
+        An empty range (`first` after `last`) totals to zeros.
+        """
+        lo = np.searchsorted(self.starts, first, side='left')
+        hi = max(lo, np.searchsorted(self.starts, last, side='right'))
+        return (self.prefix_sums[hi] - self.prefix_sums[lo],
+                self.prefix_counts[hi] - self.prefix_counts[lo])
+
+
+class TrendRollups:
+    """Daily, weekly, monthly and quarterly rollups of every numeric metric.
+
+    Built once per data version for the whole team and for each employee.
+    Queries only slice these tables; buckets cut by a custom from/to window
+    are recomputed exactly from the daily table's running totals. The
+    tables of all employees are stacked in a few large arrays per period,
+    which `to_shared`/`from_shared` let processes share (shared_dataset.py).
+    """
+
+    def __init__(self, df):
+        dates = sales_dates(df)
+        valid = dates.notna().to_numpy()
+        df = df[valid]
+        dates = dates[valid]
+        self.metrics = [c for c in df.select_dtypes('number').columns if c != 'employee_id']
+        self._metric_pos = {metric: i for i, metric in enumerate(self.metrics)}
+
+        values = df[self.metrics].to_numpy(dtype=float)
+        present = ~np.isnan(values)
+        frame = pd.DataFrame(
+            np.hstack([np.where(present, values, 0.0), present.astype(float)]),
+            columns=[f's_{m}' for m in self.metrics] + [f'c_{m}' for m in self.metrics],
+        )
+        frame['employee_id'] = df['employee_id'].astype(int).to_numpy()
+
+        width = len(self.metrics)
+        self._arrays = {}
+        for period, freq in PERIODS.items():
+            frame['bucket'] = dates.dt.to_period(freq).dt.start_time.to_numpy()
+
+            team = frame.drop(columns='employee_id').groupby('bucket', sort=True).sum()
+            rollup = Rollup(team.index.to_numpy(), team.to_numpy()[:, :width], team.to_numpy()[:, width:])
+            self._arrays.update({
+                f'team_{period}_starts': rollup.starts,
+                f'team_{period}_table': team.to_numpy(),
+                f'team_{period}_prefix': np.hstack([rollup.prefix_sums, rollup.prefix_counts]),
+            })
+
+            per_employee = frame.groupby(['employee_id', 'bucket'], sort=True).sum()
+            ids = per_employee.index.get_level_values('employee_id').to_numpy()
+            table = per_employee.to_numpy()
+            # Rows of each employee are contiguous after the sorted groupby
+            bounds = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1], True]) if len(ids) else np.zeros(1, dtype=int)
+            # Running totals of each employee, after a leading row of zeros
+            prefix = np.zeros((len(table) + len(bounds) - 1, table.shape[1]))
+            for i, (lo, hi) in enumerate(zip(bounds[:-1], bounds[1:])):
+                np.cumsum(table[lo:hi], axis=0, out=prefix[lo + i + 1:hi + i + 1])
+            self._arrays.update({
+                f'employees_{period}_ids': ids[bounds[:-1]],
+                f'employees_{period}_bounds': bounds,
+                f'employees_{period}_starts': per_employee.index.get_level_values('bucket').to_numpy(),
+                f'employees_{period}_table': table,
+                f'employees_{period}_prefix': prefix,
+            })
+        self._index()
+
+    def _index(self):
+        """Rollup views over the stacked arrays, per period and employee."""
+        width = len(self.metrics)
+        arrays = self._arrays
+        self.team = {}
+        self.employees = {}
+        for period in PERIODS:
+            table = arrays[f'team_{period}_table']
+            prefix = arrays[f'team_{period}_prefix']
+            self.team[period] = Rollup(arrays[f'team_{period}_starts'], table[:, :width], table[:, width:],
+                                       prefix[:, :width], prefix[:, width:])
+
+            ids = arrays[f'employees_{period}_ids']
+            bounds = arrays[f'employees_{period}_bounds']
+            starts = arrays[f'employees_{period}_starts']
+            table = arrays[f'employees_{period}_table']
+            prefix = arrays[f'employees_{period}_prefix']
+            for i, employee_id in enumerate(ids):
+                lo, hi = int(bounds[i]), int(bounds[i + 1])
+                self.employees.setdefault(int(employee_id), {})[period] = Rollup(
+                    starts[lo:hi], table[lo:hi, :width], table[lo:hi, width:],
+                    prefix[lo + i:hi + i + 1, :width], prefix[lo + i:hi + i + 1, width:],
+                )
+
+    def to_shared(self):
+        return {'metrics': self.metrics}, self._arrays
+
+    @classmethod
+    def from_shared(cls, df, meta, arrays):
+        rollups = cls.__new__(cls)
+        rollups.metrics = meta['metrics']
+        rollups._metric_pos = {metric: i for i, metric in enumerate(rollups.metrics)}
+        rollups._arrays = arrays
+        rollups._index()
+        return rollups
+
+    def employee_ids(self):
+        return sorted(self.employees)
+
+    def query(self, metric, period='monthly', start=None, end=None,
+              employee_id=None, agg='sum'):
+        """Return [(bucket label, value)] for one metric and period.
+
+        `start`/`end` (inclusive dates) limit the window; buckets only
+        partly inside it are totalled over the covered days alone, and a
+        window with `start` after `end` has no buckets. `agg` is
+        'sum' or 'mean'. Raises KeyError for unknown metrics, periods or
+        employees.
+        """
+        if metric not in self._metric_pos:
+            raise KeyError(f"Unknown metric: {metric}")
+        if period not in PERIODS:
+            raise KeyError(f"Unknown time period: {period}")
+        if agg not in ('sum', 'mean'):
+            raise KeyError(f"Unknown aggregation: {agg}")
+        if employee_id is None:
+            scope = self.team
+        else:
+            scope = self.employees.get(int(employee_id)) if str(employee_id).isdigit() else None
+            if scope is None:
+                raise KeyError(f"Unknown employee: {employee_id}")
+
+        column = self._metric_pos[metric]
+        table, daily = scope[period], scope['daily']
+        if len(table.starts) == 0:
+            return []
+        start = pd.Timestamp(start).to_datetime64() if start is not None else None
+        end = pd.Timestamp(end).to_datetime64() if end is not None else None
+        if start is not None and end is not None and start > end:
+            return []
+
+        lo = 0 if start is None else max(0, np.searchsorted(table.starts, start, side='right') - 1)
+        hi = len(table.starts) if end is None else np.searchsorted(table.starts, end, side='right')
+
+        results = []
+        for i in range(lo, hi):
+            bucket_start = table.starts[i]
+            clipped_start = start is not None and i == lo and start > bucket_start
+            clipped_end = end is not None and i == hi - 1
+            if clipped_start or clipped_end:
+                # Edge bucket: total only the days inside the window
+                first = max(bucket_start, start) if start is not None else bucket_start
+                last = table.starts[i + 1] - np.timedelta64(1, 'D') if i + 1 < len(table.starts) else daily.starts[-1]
+                if end is not None:
+                    last = min(last, end)
+                sums, counts = daily.range_totals(first, last)
+                if not counts.any():
+                    # No rows of this bucket fall inside the window
+                    continue
+                total, count = sums[column], counts[column]
+            else:
+                total, count = table.sums[i, column], table.counts[i, column]
+            if agg == 'mean':
+                value = float(total / count) if count else None
+            else:
+                value = float(total)
+            results.append((format_bucket(period, pd.Timestamp(bucket_start)), value))
+        return results
@@ -0,0 +1,161 @@
+"""Synthetic sales data in the sales_performance_data.csv schema.
+
+    python -m benchmarks.generate_data out.csv --reps 200 --days 50
+
+Every rep gets one row per day. Per-rep activity levels are drawn once and
+daily counts are sampled around them, so the spread of leads, tours,
+applications and revenue looks like the real file (many zero-revenue days,
+a long tail of big ones). The same seed always produces the same file.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = [
+    'employee_id', 'employee_name', 'created', 'dated', 'lead_taken', 'tours_booked',
+    'applications', 'tours_per_lead', 'apps_per_tour', 'apps_per_lead',
+    'revenue_confirmed', 'revenue_pending', 'revenue_runrate', 'tours_in_pipeline',
+    'avg_deal_value_30_days', 'avg_close_rate_30_days', 'estimated_revenue', 'tours',
+    'tours_runrate', 'tours_scheduled', 'tours_pending', 'tours_cancelled',
+    'mon_text', 'tue_text', 'wed_text', 'thur_text', 'fri_text', 'sat_text', 'sun_text',
+    'mon_call', 'tue_call', 'wed_call', 'thur_call', 'fri_call', 'sat_call', 'sun_call',
+]
+
+DAYS = ['mon', 'tue', 'wed', 'thur', 'fri', 'sat', 'sun']
+
+FIRST_NAMES = [
+    'Camilla', 'Maaz', 'Jim', 'Alina', 'Mary', 'Rooney', 'Damon', 'Priya', 'Tomas',
+    'Aisha', 'Leo', 'Nadia', 'Oscar', 'Grace', 'Ivan', 'Zara', 'Hugo', 'Mei', 'Sam', 'Lena',
+]
+LAST_NAMES = [
+    'Ali', 'Brown', 'Lee', 'Victor', 'Ogbewele', 'Rodriguez', 'Gilbert', 'Shah', 'Novak',
+    'Khan', 'Martin', 'Silva', 'Chen', 'Okafor', 'Weber', 'Haddad', 'Kim', 'Rossi',
+]
+
+# Rows written per chunk, so 10M-row files never sit in memory at once
+CHUNK_ROWS = 500000
+
+
+def _ratio(numerator, denominator):
+    # Percentages as in the source data: one decimal, -1 when undefined
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.round(numerator * 100.0 / denominator, 1)
+    return np.where(denominator > 0, ratio, -1)
+
+
+def _reps(rng, reps):
+    ids = np.arange(1, reps + 1)
+    names = np.array([
+        f"{FIRST_NAMES[i % len(FIRST_NAMES)]} {LAST_NAMES[(i // len(FIRST_NAMES)) % len(LAST_NAMES)]}"
+        for i in range(reps)
+    ], dtype=object)
+    return {
+        'employee_id': ids,
+        'employee_name': names,
+        'lead_rate': rng.lognormal(np.log(40), 0.6, reps),
+        'tour_rate': rng.beta(2, 20, reps),
+        'close_rate': rng.beta(3, 4, reps),
+        'deal_value': rng.lognormal(np.log(900), 0.5, reps),
+        'texts': rng.lognormal(np.log(35), 0.7, reps),
+        'calls': rng.lognormal(np.log(3), 1.2, reps),
+    }
+
+
+def _chunk(rng, reps, dates):
+    """One row per (date, rep): all reps for each date in turn."""
+    n = len(dates) * len(reps['employee_id'])
+    rep = np.tile(np.arange(len(reps['employee_id'])), len(dates))
+    day = np.repeat(np.arange(len(dates)), len(reps['employee_id']))
+
+    leads = rng.poisson(reps['lead_rate'][rep] * rng.gamma(2.0, 0.5, n))
+    tours_booked = rng.binomial(leads, reps['tour_rate'][rep])
+    applications = rng.binomial(tours_booked, reps['close_rate'][rep])
+    deal = reps['deal_value'][rep]
+    revenue_confirmed = np.round(applications * deal * rng.lognormal(0, 0.3, n)).astype(np.int64)
+    revenue_pending = np.where(rng.random(n) < 0.35,
+                               np.round(deal * rng.lognormal(0, 0.8, n)), 0).astype(np.int64)
+    revenue_runrate = revenue_confirmed + revenue_pending + np.where(
+        rng.random(n) < 0.5, np.round(deal * rng.exponential(1.0, n)), 0).astype(np.int64)
+    tours = rng.poisson(reps['lead_rate'][rep] * reps['tour_rate'][rep] * 4) - rng.poisson(0.5, n)
+    tours_scheduled = rng.poisson(np.maximum(tours, 0) * 0.4)
+
+    frame = {
+        'employee_id': reps['employee_id'][rep],
+        'employee_name': reps['employee_name'][rep],
+        'created': [f"{m:02d}:{s:04.1f}" for m, s in zip(rng.integers(0, 60, n), rng.uniform(0, 60, n))],
+        'dated': dates[day],
+        'lead_taken': leads,
+        'tours_booked': tours_booked,
+        'applications': applications,
+        'tours_per_lead': _ratio(tours_booked, leads),
+        'apps_per_tour': _ratio(applications, tours_booked),
+        'apps_per_lead': _ratio(applications, leads),
+        'revenue_confirmed': revenue_confirmed,
+        'revenue_pending': revenue_pending,
+        'revenue_runrate': revenue_runrate,
+        'tours_in_pipeline': rng.poisson(0.4, n),
+        'avg_deal_value_30_days': np.where(rng.random(n) < 0.25, -1, np.round(deal)).astype(np.int64),
+        'avg_close_rate_30_days': np.where(rng.random(n) < 0.1, -1,
+                                           np.round(reps['close_rate'][rep] * 100)).astype(np.int64),
+        'estimated_revenue': np.where(rng.random(n) < 0.2, np.round(deal * rng.lognormal(0, 0.5, n)), 0).astype(np.int64),
+        'tours': tours,
+        'tours_runrate': np.round(np.maximum(tours, 0) * rng.lognormal(1.2, 0.6, n)).astype(np.int64),
+        'tours_scheduled': tours_scheduled,
+        'tours_pending': rng.poisson(np.maximum(tours, 0) * 0.7),
+        'tours_cancelled': rng.binomial(tours_scheduled + 1, 0.15),
+    }
+    for name in DAYS:
+        frame[f'{name}_text'] = rng.poisson(reps['texts'][rep] * rng.gamma(1.5, 0.67, n))
+    for name in DAYS:
+        frame[f'{name}_call'] = rng.poisson(reps['calls'][rep] * rng.gamma(0.5, 2.0, n))
+    return pd.DataFrame(frame, columns=COLUMNS)
+
+
+def generate(path, reps=100, days=100, seed=0, start='2022-07-26'):
+    """Write a `reps` x `days` sales CSV to `path` and return the row count."""
+    rng = np.random.default_rng(seed)
+    rep_table = _reps(rng, reps)
+    dates = pd.date_range(start, periods=days, freq='D').strftime('%d/%m/%Y').to_numpy()
+    days_per_chunk = max(1, CHUNK_ROWS // reps)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', newline='') as f:
+        for i in range(0, days, days_per_chunk):
+            chunk = _chunk(rng, rep_table, dates[i:i + days_per_chunk])
+            chunk.to_csv(f, header=(i == 0), index=False)
+    return reps * days
+
+
+def rows_to_shape(rows, reps=None):
+    """Split a target row count into (reps, days); about 200 reps by default."""
+    reps = reps or min(200, max(1, rows // 50))
+    return reps, max(1, -(-rows // reps))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('path')
+    parser.add_argument('--rows', type=int, help='Approximate total rows (sets --days)')
+    parser.add_argument('--reps', type=int)
+    parser.add_argument('--days', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', default='2022-07-26', help='First date, YYYY-MM-DD')
+    args = parser.parse_args()
+
+    if args.rows:
+        reps, days = rows_to_shape(args.rows, args.reps)
+    else:
+        reps, days = args.reps or 100, args.days
+    started = time.perf_counter()
+    rows = generate(args.path, reps, days, args.seed, args.start)
+    print(f"Wrote {rows} rows ({reps} reps x {days} days) to {args.path} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,333 @@
+"""End-to-end load benchmark of the Flask apps.
+
+    python -m benchmarks.run_benchmarks --rows 10000,1000000 --concurrency 1,4,16
+
+For each dataset size a synthetic CSV is generated (see generate_data.py)
+and the full app (app_factory.create_app) is served on a local port with
+the stub LLM, so no network or API key is needed. Every endpoint
+is then driven at each concurrency level and the latency percentiles,
+throughput, errors and peak memory are written out as JSON.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+CODE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'Code_Folder')
+
+CHARTS = [
+    'line_plot', 'histogram', 'heatmap', 'box_plot', 'bar_plot',
+    'calls_heatmap', 'facet_grid', 'interactive_plot',
+]
+TIME_PERIODS = ['daily', 'weekly', 'monthly', 'quarterly']
+
+
+def _rep_request(i, rep_ids):
+    return 'GET', f"/api/rep_performance?rep_id={rep_ids[i % len(rep_ids)]}", None
+
+
+def _team_request(i, rep_ids):
+    # A different question each time, so every call reaches the LLM
+    return 'POST', '/api/team_performance', {'summary': f"Benchmark question {i}."}
+
+
+def _trends_request(i, rep_ids):
+    return 'POST', '/api/performance_trends', {'time_period': TIME_PERIODS[i % len(TIME_PERIODS)]}
+
+
+def _chart_request(name, cold):
+    def request(i, rep_ids):
+        # A throwaway parameter gives every request its own chart cache key
+        return 'GET', f"/api/{name}" + (f"?bench={i}" if cold else ''), None
+    return request
+
+
+def endpoints(cold_charts):
+    """Map endpoint name to its request builder."""
+    table = {
+        'rep': _rep_request,
+        'team': _team_request,
+        'trends': _trends_request,
+    }
+    for name in CHARTS:
+        table[name] = _chart_request(name, cold_charts)
+    return table
+
+
+def _send(base_url, method, path, body, timeout):
+    data = json.dumps(body).encode('utf-8') if body is not None else None
+    req = urllib.request.Request(base_url + path, data=data, method=method)
+    if data is not None:
+        req.add_header('Content-Type', 'application/json')
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=timeout) as resp:
+            resp.read()
+            status = resp.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        status = e.code
+    except Exception as e:
+        status = type(e).__name__
+    return (time.perf_counter() - started) * 1000, status
+
+
+def _percentiles(latencies):
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    return {
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(np.mean(latencies)), 2),
+        'max_ms': round(float(np.max(latencies)), 2),
+    }
+
+
+def run_level(base_url, build, rep_ids, concurrency, requests, offset, timeout):
+    """Send `requests` requests from `concurrency` threads and summarize them."""
+    calls = [build(offset + i, rep_ids) for i in range(requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(lambda call: _send(base_url, *call, timeout), calls))
+    wall = time.perf_counter() - started
+
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    summary = {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, status in results if not (isinstance(status, int) and status < 400)),
+        'status_codes': statuses,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2),
+    }
+    summary.update(_percentiles([latency for latency, _ in results]))
+    return summary
+
+
+def _peak_rss_mb(pid='self'):
+    # High-water mark of resident memory, from /proc where available
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    if pid == 'self':
+        import resource
+        return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return None
+
+
+def _serve(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def prepare_dataset(rows, reps, seed, data_dir):
+    """Generate (or reuse) a dataset; returns its working directory and info."""
+    from benchmarks.generate_data import rows_to_shape
+
+    reps, days = rows_to_shape(rows, reps)
+    workdir = os.path.join(data_dir, f'{reps}x{days}-seed{seed}')
+    csv_path = os.path.join(workdir, 'data', 'sales_performance_data.csv')
+    generate_seconds = None
+    if not os.path.exists(csv_path):
+        started = time.perf_counter()
+        # In a child process so generation doesn't count towards peak memory
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.generate_data', csv_path,
+             '--reps', str(reps), '--days', str(days), '--seed', str(seed)],
+            check=True, cwd=os.path.dirname(CODE_FOLDER), stdout=subprocess.DEVNULL,
+        )
+        generate_seconds = round(time.perf_counter() - started, 2)
+    # Start every run cold: no LLM answers or parsed-CSV cache left over
+    for name in os.listdir(os.path.dirname(csv_path)):
+        if name.endswith('.sqlite3') or name.endswith('.cache.feather'):
+            os.remove(os.path.join(os.path.dirname(csv_path), name))
+    return workdir, {
+        'rows': reps * days,
+        'reps': reps,
+        'days': days,
+        'seed': seed,
+        'csv_bytes': os.path.getsize(csv_path),
+        'generate_seconds': generate_seconds,
+    }
+
+
+def run(args, workdir, dataset):
+    """Benchmark the app against the dataset in `workdir`."""
+    # Stub LLM and provider limits high enough not to be the bottleneck;
+    # anything already set in the environment wins
+    os.environ['LLM_BACKEND'] = 'stub'
+    os.environ['STUB_LLM_LATENCY'] = str(args.llm_latency)
+    os.environ.setdefault('LLM_REQUESTS_PER_MINUTE', '1000000')
+    os.environ.setdefault('LLM_TOKENS_PER_MINUTE', '1000000000')
+    if args.chart_workers is not None:
+        os.environ['CHART_WORKERS'] = str(args.chart_workers)
+    os.chdir(workdir)
+    sys.path.insert(0, CODE_FOLDER)
+
+    import logging
+
+    started = time.perf_counter()
+    from app_factory import create_app
+    app = create_app()
+    import_seconds = time.perf_counter() - started
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    import api_charts
+    import api_llm
+    from llm_cache import get_llm_cache
+    from llm_gateway import get_llm_gateway
+    from startup import startup_report
+
+    server, base = _serve(app)
+
+    rep_ids = [int(i) for i in api_llm.load_rep_index().employee_ids()]
+    selected = endpoints(not args.warm_charts)
+    if args.endpoints:
+        selected = {name: selected[name] for name in args.endpoints}
+
+    # First request of each endpoint pays for loading and index building
+    first_request_ms = {}
+    for name, build in selected.items():
+        latency, status = _send(base, *build(0, rep_ids), args.timeout)
+        first_request_ms[name] = {'ms': round(latency, 2), 'status': status}
+
+    results = []
+    offset = 1
+    for concurrency in args.concurrency:
+        requests = max(args.requests, concurrency)
+        for name, build in selected.items():
+            summary = run_level(base, build, rep_ids, concurrency, requests,
+                                offset, args.timeout)
+            summary['endpoint'] = name
+            results.append(summary)
+            print(f"{dataset['rows']:>10} rows  {name:<17} c={concurrency:<3} "
+                  f"p50={summary['p50_ms']:.1f}ms p99={summary['p99_ms']:.1f}ms "
+                  f"{summary['throughput_rps']:.1f} req/s errors={summary['errors']}",
+                  file=sys.stderr)
+        offset += requests
+
+    pool = api_charts.render_pool
+    workers = getattr(pool._executor, '_processes', None) or {}
+    worker_rss = [_peak_rss_mb(pid) for pid in list(workers)]
+    server.shutdown()
+    pool.shutdown()
+
+    return {
+        'dataset': dataset,
+        'startup': {
+            'import_seconds': round(import_seconds, 3),
+            'first_request': first_request_ms,
+            'report': startup_report(),
+        },
+        'results': results,
+        'peak_rss_mb': {
+            'server': _peak_rss_mb(),
+            'chart_workers': [rss for rss in worker_rss if rss is not None],
+        },
+        'llm_gateway': get_llm_gateway().stats(),
+        'llm_cache': get_llm_cache().stats(),
+    }
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=_int_list, default=[10000],
+                        help='Comma-separated dataset sizes, e.g. 10000,1000000,10000000')
+    parser.add_argument('--reps', type=int, help='Reps per dataset (default: up to 200)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--concurrency', type=_int_list, default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=50,
+                        help='Requests per endpoint and concurrency level')
+    parser.add_argument('--endpoints', type=lambda v: v.split(','),
+                        help='Subset of endpoints: rep,team,trends or chart names')
+    parser.add_argument('--llm-latency', type=float, default=0.2,
+                        help='Seconds the stub LLM sleeps per call')
+    parser.add_argument('--chart-workers', type=int)
+    parser.add_argument('--warm-charts', action='store_true',
+                        help='Repeat identical chart requests (measures the chart cache)')
+    parser.add_argument('--timeout', type=float, default=120)
+    parser.add_argument('--data-dir', help='Keep generated datasets here for reuse')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--single', action='store_true', help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.endpoints:
+        unknown = set(args.endpoints) - set(endpoints(True))
+        if unknown:
+            sys.exit(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='sales-bench-')
+    try:
+        if args.single:
+            workdir, dataset = prepare_dataset(args.rows[0], args.reps, args.seed, data_dir)
+            report = run(args, workdir, dataset)
+        else:
+            # One child process per dataset size, so module state and peak
+            # memory of one size don't leak into the next
+            runs = []
+            child_output = os.path.join(data_dir, 'run.json')
+            for rows in args.rows:
+                # Later flags win, so these override the ones passed through
+                subprocess.run(
+                    [sys.executable, '-m', 'benchmarks.run_benchmarks',
+                     *(argv if argv is not None else sys.argv[1:]),
+                     '--rows', str(rows), '--data-dir', data_dir, '--single',
+                     '--output', child_output],
+                    check=True, cwd=os.path.dirname(CODE_FOLDER), stdout=sys.stderr,
+                )
+                with open(child_output) as f:
+                    runs.append(json.load(f))
+            report = {
+                'config': {
+                    'concurrency': args.concurrency,
+                    'requests': args.requests,
+                    'llm_latency': args.llm_latency,
+                    'chart_workers': args.chart_workers,
+                    'warm_charts': args.warm_charts,
+                    'python': platform.python_version(),
+                    'platform': platform.platform(),
+                    'cpus': os.cpu_count(),
+                },
+                'runs': runs,
+            }
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    if args.output and args.output != '-':
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
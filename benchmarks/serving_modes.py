@@ -0,0 +1,314 @@
+"""Compare the threaded Flask app with the async app under slow LLM calls.
+
+    python -m benchmarks.serving_modes --concurrency 50,200,500 --llm-latency 2
+
+Each mode is served from its own process against a synthetic dataset and a
+stub LLM that sleeps --llm-latency seconds per call (no network or key):
+
+    threaded            Flask on a fixed pool of --threads threads, like a
+                        gunicorn gthread deployment
+    thread-per-request  Flask on Werkzeug's threaded server (one thread per
+                        connection, unbounded)
+    async               async_app.py on aiohttp
+
+Every request misses the LLM cache, so each one waits on the stub. The
+report has latency percentiles, throughput and errors per concurrency
+level, plus the server's peak thread count and memory.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from benchmarks.run_benchmarks import CODE_FOLDER, _peak_rss_mb, _percentiles, prepare_dataset
+
+MODES = ['threaded', 'thread-per-request', 'async']
+
+
+def _rep_request(i, rep_ids):
+    # A different window each time, so no two prompts are the same
+    rep_id = rep_ids[i % len(rep_ids)]
+    return 'GET', f"/api/rep_performance?rep_id={rep_id}&latest={i // len(rep_ids) + 1}", None
+
+
+def _team_request(i, rep_ids):
+    return 'POST', '/api/team_performance', {'summary': f"Benchmark question {i}."}
+
+
+ENDPOINTS = {'rep': _rep_request, 'team': _team_request}
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def serve(mode, port, threads):
+    """Run one server in this process until killed."""
+    sys.path.insert(0, CODE_FOLDER)
+    import logging
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+
+    if mode == 'async':
+        from aiohttp import web
+
+        from async_app import create_async_app
+        web.run_app(create_async_app(), host='127.0.0.1', port=port, print=None,
+                    access_log=None, backlog=1024)
+        return
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    from werkzeug.serving import BaseWSGIServer, make_server
+
+    from app_factory import create_app
+
+    app = create_app(['llm', 'trends'])
+    if mode == 'thread-per-request':
+        server = make_server('127.0.0.1', port, app, threaded=True)
+    else:
+        class PooledWSGIServer(BaseWSGIServer):
+            # Accepted connections wait for one of `threads` handler threads
+            request_queue_size = 1024
+
+            def __init__(self, *args):
+                super().__init__(*args)
+                self.pool = ThreadPoolExecutor(max_workers=threads)
+
+            def process_request(self, request, client_address):
+                self.pool.submit(self._handle, request, client_address)
+
+            def _handle(self, request, client_address):
+                try:
+                    self.finish_request(request, client_address)
+                except Exception:
+                    self.handle_error(request, client_address)
+                finally:
+                    self.shutdown_request(request)
+
+        server = PooledWSGIServer('127.0.0.1', port, app)
+    server.serve_forever()
+
+
+def _threads(pid):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+class _Sampler:
+    """Polls the server's thread count in the background, keeping the peak."""
+
+    def __init__(self, pid):
+        self.pid = pid
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(0.05):
+            self.peak = max(self.peak, _threads(self.pid) or 0)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak
+
+
+async def _load(base_url, build, rep_ids, concurrency, requests, offset, timeout):
+    import aiohttp
+
+    async def send(session, method, path, body):
+        started = time.perf_counter()
+        try:
+            async with session.request(method, base_url + path, json=body) as response:
+                await response.read()
+                status = response.status
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        return (time.perf_counter() - started) * 1000, status
+
+    slots = asyncio.Semaphore(concurrency)
+
+    async def limited(session, call):
+        async with slots:
+            return await send(session, *call)
+
+    connector = aiohttp.TCPConnector(limit=0)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        calls = [build(offset + i, rep_ids) for i in range(requests)]
+        started = time.perf_counter()
+        results = await asyncio.gather(*[limited(session, call) for call in calls])
+        wall = time.perf_counter() - started
+
+    statuses = {}
+    for _, status in results:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    summary = {
+        'concurrency': concurrency,
+        'requests': requests,
+        'errors': sum(1 for _, status in results if not (isinstance(status, int) and status < 400)),
+        'status_codes': statuses,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(requests / wall, 2),
+    }
+    summary.update(_percentiles([latency for latency, _ in results]))
+    return summary
+
+
+def _wait_ready(base_url, process, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Server exited with code {process.returncode}")
+        try:
+            with urllib.request.urlopen(base_url + '/api/startup', timeout=5):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("Server did not start")
+
+
+def run_mode(args, mode, workdir, rep_ids):
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ)
+    env.update({
+        'LLM_BACKEND': 'stub',
+        'STUB_LLM_LATENCY': str(args.llm_latency),
+        'METRICS_ENABLED': '0',
+    })
+    # High enough that the provider limits never queue a call
+    env.setdefault('LLM_REQUESTS_PER_MINUTE', '1000000')
+    env.setdefault('LLM_TOKENS_PER_MINUTE', '1000000000')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'benchmarks.serving_modes', '--serve', mode,
+         '--port', str(port), '--threads', str(args.threads)],
+        cwd=workdir, env=dict(env, PYTHONPATH=os.path.dirname(CODE_FOLDER)),
+        stdout=subprocess.DEVNULL, stderr=sys.stderr,
+    )
+    try:
+        _wait_ready(base_url, process)
+        # Loads the data and the LLM chains before anything is timed
+        first = {}
+        for name in args.endpoints:
+            warmup = asyncio.run(_load(base_url, ENDPOINTS[name], rep_ids, 1, 1, 0, args.timeout))
+            first[name] = warmup['p50_ms']
+        results = []
+        offset = 1
+        for concurrency in args.concurrency:
+            requests = max(args.requests, concurrency)
+            for name in args.endpoints:
+                sampler = _Sampler(process.pid)
+                summary = asyncio.run(_load(base_url, ENDPOINTS[name], rep_ids, concurrency,
+                                            requests, offset, args.timeout))
+                summary['peak_threads'] = sampler.stop()
+                summary['endpoint'] = name
+                results.append(summary)
+                offset += requests
+                print(f"{mode:<19} {name:<5} c={concurrency:<4} p50={summary['p50_ms']:.0f}ms "
+                      f"p99={summary['p99_ms']:.0f}ms {summary['throughput_rps']:.1f} req/s "
+                      f"threads={summary['peak_threads']} errors={summary['errors']}", file=sys.stderr)
+        return {
+            'mode': mode,
+            'first_request_ms': first,
+            'results': results,
+            'peak_rss_mb': _peak_rss_mb(process.pid),
+        }
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--reps', type=int)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--modes', type=lambda v: v.split(','), default=MODES)
+    parser.add_argument('--endpoints', type=lambda v: v.split(','), default=['team'],
+                        help='rep and/or team')
+    parser.add_argument('--concurrency', type=_int_list, default=[10, 100, 500])
+    parser.add_argument('--requests', type=int, default=0,
+                        help='Requests per level (default: the concurrency level)')
+    parser.add_argument('--llm-latency', type=float, default=2.0,
+                        help='Seconds the stub LLM sleeps per call')
+    parser.add_argument('--threads', type=int, default=32,
+                        help='Handler threads of the threaded mode')
+    parser.add_argument('--timeout', type=float, default=600)
+    parser.add_argument('--data-dir', help='Keep generated datasets here for reuse')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--serve', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.serve:
+        serve(args.serve, args.port, args.threads)
+        return
+    unknown = (set(args.modes) - set(MODES)) | (set(args.endpoints) - set(ENDPOINTS))
+    if unknown:
+        sys.exit(f"Unknown modes or endpoints: {', '.join(sorted(unknown))}")
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix='sales-bench-')
+    try:
+        workdir, dataset = prepare_dataset(args.rows, args.reps, args.seed, data_dir)
+        rep_ids = list(range(dataset['reps']))
+        runs = []
+        for mode in args.modes:
+            # Every mode starts without cached LLM answers
+            cache = os.path.join(workdir, 'data', 'llm_cache.sqlite3')
+            if os.path.exists(cache):
+                os.remove(cache)
+            runs.append(run_mode(args, mode, workdir, rep_ids))
+    finally:
+        if not args.data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    report = {
+        'config': {
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'llm_latency': args.llm_latency,
+            'threads': args.threads,
+            'endpoints': args.endpoints,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'dataset': dataset,
+        'runs': runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output and args.output != '-':
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
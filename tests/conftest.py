@@ -0,0 +1,111 @@
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The services import each other as top-level modules from Code_Folder
+sys.path.insert(0, os.path.join(ROOT, 'Code_Folder'))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generate_data import generate  # noqa: E402
+
+
+@pytest.fixture
+def sales_csv(tmp_path):
+    """A small synthetic sales CSV: 6 reps x 40 days."""
+    path = tmp_path / 'sales.csv'
+    generate(str(path), reps=6, days=40, seed=1)
+    return path
+
+
+def append_rows(path, lines):
+    """Append CSV `lines` (without newlines) to `path`."""
+    with open(path, 'a', newline='') as f:
+        for line in lines:
+            f.write(line + '\n')
+
+
+def next_day_row(rep_id, path='data/sales_performance_data.csv'):
+    """A row for `rep_id` dated the day after the last one in the file."""
+    with open(path) as f:
+        lines = f.read().splitlines()
+    last = [line for line in lines[1:] if line.split(',')[0] == str(rep_id)][-1].split(',')
+    dated = pd.to_datetime(last[3], format='%d/%m/%Y') + pd.Timedelta(days=1)
+    last[3] = dated.strftime('%d/%m/%Y')
+    return ','.join(last)
+
+
+def bump_mtime(path, seconds=5):
+    """Move the file's mtime forward, as a later write would."""
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + seconds * 10**9))
+
+
+@pytest.fixture
+def stub_chain(monkeypatch):
+    """(LLMChain on the stub LLM, list of the prompts it was called with)."""
+    from langchain.chains import LLMChain
+    from langchain.prompts import PromptTemplate
+    from stub_llm import StubLLM
+
+    prompts = []
+    answer = StubLLM._answer
+
+    def counted(self, prompt):
+        prompts.append(prompt)
+        return answer(self, prompt)
+
+    monkeypatch.setattr(StubLLM, '_answer', counted)
+    prompt = PromptTemplate(input_variables=['data'], template="Review this data: {data}")
+    return LLMChain(llm=StubLLM(), prompt=prompt), prompts
+
+
+@pytest.fixture
+def app_dir(tmp_path, monkeypatch):
+    """Working directory holding data/sales_performance_data.csv (6 reps x
+    40 days), with every process-wide store and cache starting empty."""
+    from collections import OrderedDict
+
+    import feedback_store
+    import incremental_analysis
+    import job_queue
+    import llm_cache
+    import llm_gateway
+    import sales_data_store
+
+    generate(str(tmp_path / 'data' / 'sales_performance_data.csv'), reps=6, days=40, seed=1)
+    monkeypatch.chdir(tmp_path)
+    # The API modules hold their store from import time; its path is relative
+    for store in sales_data_store._stores.values():
+        store._snapshot = None
+        store._last_check = 0.0
+        store._derived = {}
+        store._derived_lru = OrderedDict()
+    monkeypatch.setattr(feedback_store, '_store', None)
+    monkeypatch.setattr(incremental_analysis, '_store', None)
+    monkeypatch.setattr(job_queue, '_queue', None)
+    monkeypatch.setattr(llm_cache, '_cache', None)
+    monkeypatch.setattr(llm_gateway, '_gateway', None)
+    yield tmp_path
+    if job_queue._queue is not None:
+        job_queue._queue.stop()
+
+
+@pytest.fixture
+def client(app_dir, monkeypatch):
+    """Flask test client of the full API on the stub LLM, rendering charts
+    in-process."""
+    import api_charts
+    import api_llm
+    from app_factory import create_app
+    from startup import subsystem
+
+    monkeypatch.setattr(api_llm, 'LLM_BACKEND', 'stub')
+    monkeypatch.setattr(api_llm, 'llm_chains', subsystem('llm', api_llm._load_chains))
+    monkeypatch.setattr(api_charts.render_pool, 'workers', 0)
+    # The chart views hold these caches from import time; empty them
+    for cache in (api_charts.chart_cache, api_charts.tile_cache):
+        cache.__init__(cache.max_bytes)
+    return create_app(preload=False).test_client()
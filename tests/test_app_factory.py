@@ -0,0 +1,97 @@
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import startup
+from app_factory import create_app
+from conftest import ROOT
+from startup import Subsystem, startup_report, subsystem
+
+
+def test_subsystem_loads_once_across_threads():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        time.sleep(0.05)
+        return object()
+
+    lazy = Subsystem('test', loader)
+    assert lazy.report() == {'loaded': False}
+    values = []
+    threads = [threading.Thread(target=lambda: values.append(lazy.get())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(loads) == 1
+    assert all(value is values[0] for value in values)
+    report = lazy.report()
+    assert report['loaded'] and report['load_ms'] >= 50
+
+
+def test_registered_subsystems_are_reported(monkeypatch):
+    monkeypatch.setattr(startup, '_subsystems', {})
+    lazy = subsystem('test_report', lambda: 'value')
+    assert startup_report()['subsystems']['test_report'] == {'loaded': False}
+    lazy.get()
+    assert startup_report()['subsystems']['test_report']['loaded']
+
+
+def routes(app):
+    return {rule.rule for rule in app.url_map.iter_rules()}
+
+
+def test_only_the_requested_route_groups_are_registered(app_dir):
+    app = create_app(['trends'], preload=False)
+    assert '/api/performance_trends' in routes(app)
+    assert '/api/rep_performance' not in routes(app)
+    assert '/api/histogram' not in routes(app)
+    assert {'/api/startup', '/metrics'} <= routes(app)
+
+
+def test_unknown_route_group(app_dir):
+    with pytest.raises(ValueError):
+        create_app(['reports'])
+
+
+def test_startup_report_endpoint(client):
+    report = client.get('/api/startup').json
+    assert 'create_app' in report['phases_ms']
+    assert 'import_llm' in report['phases_ms']
+    assert 'llm' in report['subsystems']
+
+
+def run_app(code, cwd):
+    script = f"import sys\nsys.path.insert(0, {ROOT + '/Code_Folder'!r})\n" + code
+    result = subprocess.run([sys.executable, '-c', script], cwd=cwd, capture_output=True,
+                            text=True, timeout=120, check=True)
+    return result.stdout.split()
+
+
+def test_heavy_dependencies_load_on_first_use(app_dir):
+    loaded = run_app(
+        "from app_factory import create_app\n"
+        "create_app()\n"
+        "print(*[m for m in ('langchain', 'openai', 'matplotlib', 'plotly') if m in sys.modules])\n",
+        app_dir,
+    )
+    assert loaded == []
+
+
+def test_preload_loads_everything_up_front(app_dir):
+    loaded = run_app(
+        "import os\n"
+        "os.environ['CHART_WORKERS'] = '0'\n"
+        "os.environ['LLM_BACKEND'] = 'stub'\n"
+        "from app_factory import create_app\n"
+        "from startup import startup_report\n"
+        "create_app(preload=True)\n"
+        "print(*[m for m in ('langchain', 'matplotlib') if m in sys.modules])\n"
+        "print(startup_report()['subsystems']['llm']['loaded'])\n",
+        app_dir,
+    )
+    assert loaded == ['langchain', 'matplotlib', 'True']
@@ -0,0 +1,95 @@
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+
+from async_app import create_async_app
+from stub_llm import StubLLM
+
+
+@pytest.fixture
+def run(client):
+    """Run `test(http_client)` against the async app, on the same stub LLM
+    and data as the Flask `client` fixture."""
+    def run(test):
+        async def main():
+            async with TestClient(TestServer(create_async_app(preload=False))) as http:
+                return await test(http)
+        return asyncio.run(main())
+    return run
+
+
+def test_rep_feedback(run):
+    async def test(http):
+        response = await http.get('/api/rep_performance', params={'rep_id': '2', 'latest': '5'})
+        return response.status, await response.json()
+
+    status, body = run(test)
+    assert status == 200
+    assert body['records'] == 5
+    assert body['feedback'].startswith('Stub feedback')
+
+
+def test_errors_match_the_flask_app(run, client):
+    async def test(http):
+        inverted = await http.get('/api/rep_performance',
+                                  params={'rep_id': '2', 'from': '2022-08-10', 'to': '2022-08-01'})
+        unknown = await http.get('/api/rep_performance', params={'rep_id': '999'})
+        return inverted.status, unknown.status
+
+    flask_inverted = client.get('/api/rep_performance?rep_id=2&from=2022-08-10&to=2022-08-01')
+    flask_unknown = client.get('/api/rep_performance?rep_id=999')
+    assert run(test) == (flask_inverted.status_code, flask_unknown.status_code)
+    assert flask_inverted.status_code == 400
+
+
+def test_trends(run, client):
+    async def test(http):
+        response = await http.post('/api/performance_trends', json={'time_period': 'monthly'})
+        return await response.json()
+
+    expected = client.post('/api/performance_trends', json={'time_period': 'monthly'}).json
+    assert run(test) == expected
+
+
+def test_batch_streams_ndjson(run):
+    async def test(http):
+        response = await http.post('/api/rep_performance/batch', json={'rep_ids': [1, 2, 'x']})
+        return [json.loads(line) for line in (await response.text()).splitlines()]
+
+    lines = run(test)
+    assert 'error' in lines[0] and lines[0]['rep_id'] == 'x'
+    assert sorted(line['rep_id'] for line in lines[1:]) == [1, 2]
+
+
+def test_sse(run):
+    async def test(http):
+        response = await http.get('/api/rep_performance', params={'rep_id': '3', 'stream': '1'})
+        return response.headers['Content-Type'], await response.text()
+
+    content_type, body = run(test)
+    assert content_type == 'text/event-stream'
+    assert 'event: token' in body
+    assert body.rstrip().split('\n\n')[-1].startswith('event: done')
+
+
+def test_slow_llm_calls_overlap(run, monkeypatch):
+    async def slow(self, prompt, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(0.3)
+        return self._answer(prompt)
+
+    monkeypatch.setattr(StubLLM, '_acall', slow)
+
+    async def test(http):
+        started = time.monotonic()
+        responses = await asyncio.gather(*[
+            http.get('/api/rep_performance', params={'rep_id': str(rep_id)}) for rep_id in range(1, 7)
+        ])
+        return [response.status for response in responses], time.monotonic() - started
+
+    statuses, elapsed = run(test)
+    assert statuses == [200] * 6
+    # Six 0.3s calls, waited on side by side rather than one after another
+    assert 0.3 <= elapsed < 1.2
@@ -0,0 +1,59 @@
+import json
+import threading
+import time
+
+from stub_llm import StubLLM
+
+
+def batch(client, body):
+    response = client.post('/api/rep_performance/batch', json=body)
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    return response, lines
+
+
+def test_one_result_line_per_rep(client):
+    response, lines = batch(client, {'rep_ids': [1, 2, 3]})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert sorted(line['rep_id'] for line in lines) == [1, 2, 3]
+    assert all(line['feedback'].startswith('Stub feedback') for line in lines)
+
+
+def test_all_reps(client):
+    _, lines = batch(client, {'rep_ids': 'all'})
+    assert sorted(line['rep_id'] for line in lines) == [1, 2, 3, 4, 5, 6]
+
+
+def test_bad_and_unknown_ids_are_reported_per_rep(client):
+    _, lines = batch(client, {'rep_ids': ['x', 999, 2]})
+    by_id = {line['rep_id']: line for line in lines}
+    assert 'must be an integer' in by_id['x']['error']
+    assert 'No data found' in by_id[999]['error']
+    assert 'feedback' in by_id[2]
+
+
+def test_invalid_bodies_are_rejected(client):
+    assert client.post('/api/rep_performance/batch', json={}).status_code == 400
+    assert client.post('/api/rep_performance/batch', json={'rep_ids': 3}).status_code == 400
+    assert client.post('/api/rep_performance/batch',
+                       json={'rep_ids': [1], 'concurrency': 0}).status_code == 400
+
+
+def test_concurrent_llm_calls_are_bounded(client, monkeypatch):
+    lock = threading.Lock()
+    running = [0, 0]
+    answer = StubLLM._answer
+
+    def slow(self, prompt):
+        with lock:
+            running[0] += 1
+            running[1] = max(running[1], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return answer(self, prompt)
+
+    monkeypatch.setattr(StubLLM, '_answer', slow)
+    _, lines = batch(client, {'rep_ids': 'all', 'concurrency': 2})
+    assert len(lines) == 6
+    assert running[1] == 2
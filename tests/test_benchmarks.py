@@ -0,0 +1,81 @@
+import json
+import os
+import subprocess
+import sys
+
+import pandas as pd
+
+from benchmarks import generate_data
+from benchmarks.generate_data import COLUMNS, generate, rows_to_shape
+from benchmarks.run_benchmarks import endpoints
+from conftest import ROOT
+from sales_ingest import SCHEMA, read_sales_csv
+from stub_llm import StubLLM
+
+
+def test_generated_file_matches_the_sales_schema(tmp_path):
+    path = tmp_path / 'sales.csv'
+    assert generate(str(path), reps=4, days=10, seed=3) == 40
+    df = read_sales_csv(str(path))
+    assert list(df.columns) == COLUMNS == list(SCHEMA)
+    assert len(df) == 40
+    assert df.groupby('employee_id').size().tolist() == [10] * 4
+    assert df['dated'].min() == pd.Timestamp('2022-07-26')
+    assert (df['applications'] <= df['tours_booked']).all()
+    assert (df['tours_booked'] <= df['lead_taken']).all()
+
+
+def test_same_seed_same_file(tmp_path):
+    generate(str(tmp_path / 'a.csv'), reps=5, days=8, seed=7)
+    generate(str(tmp_path / 'b.csv'), reps=5, days=8, seed=7)
+    generate(str(tmp_path / 'c.csv'), reps=5, days=8, seed=8)
+    assert (tmp_path / 'a.csv').read_bytes() == (tmp_path / 'b.csv').read_bytes()
+    assert (tmp_path / 'a.csv').read_bytes() != (tmp_path / 'c.csv').read_bytes()
+
+
+def test_chunked_writes_give_every_row_once(tmp_path, monkeypatch):
+    monkeypatch.setattr(generate_data, 'CHUNK_ROWS', 9)
+    path = tmp_path / 'sales.csv'
+    generate(str(path), reps=3, days=10, seed=1)
+    df = read_sales_csv(str(path))
+    assert len(df) == 30
+    assert not df.duplicated(['employee_id', 'dated']).any()
+
+
+def test_rows_to_shape():
+    assert rows_to_shape(10000) == (200, 50)
+    assert rows_to_shape(300) == (6, 50)
+    assert rows_to_shape(1001, reps=10) == (10, 101)
+
+
+def test_stub_llm_is_deterministic():
+    llm = StubLLM()
+    assert llm.invoke('same prompt') == llm.invoke('same prompt')
+    assert llm.invoke('same prompt') != llm.invoke('other prompt')
+    assert ''.join(llm.stream('same prompt')) == llm.invoke('same prompt')
+
+
+def test_endpoint_table():
+    table = endpoints(cold_charts=True)
+    assert {'rep', 'team', 'trends', 'histogram', 'facet_grid'} <= set(table)
+    assert table['histogram'](3, [1]) == ('GET', '/api/histogram?bench=3', None)
+    assert endpoints(cold_charts=False)['histogram'](3, [1]) == ('GET', '/api/histogram', None)
+    assert table['rep'](4, [7, 8]) == ('GET', '/api/rep_performance?rep_id=7', None)
+
+
+def test_end_to_end_run(tmp_path):
+    output = tmp_path / 'report.json'
+    env = dict(os.environ, LLM_REQUESTS_PER_MINUTE='1000000', LLM_TOKENS_PER_MINUTE='1000000000')
+    subprocess.run(
+        [sys.executable, '-m', 'benchmarks.run_benchmarks', '--rows', '300', '--concurrency', '1,2',
+         '--requests', '2', '--endpoints', 'rep,trends', '--llm-latency', '0', '--chart-workers', '0',
+         '--data-dir', str(tmp_path), '--output', str(output)],
+        check=True, cwd=ROOT, env=env, capture_output=True, timeout=300,
+    )
+    report = json.loads(output.read_text())
+    run, = report['runs']
+    assert run['dataset']['rows'] == 300
+    assert {(r['endpoint'], r['concurrency']) for r in run['results']} == {
+        ('rep', 1), ('trends', 1), ('rep', 2), ('trends', 2)}
+    assert all(r['errors'] == 0 for r in run['results'])
+    assert run['startup']['first_request']['rep']['status'] == 200
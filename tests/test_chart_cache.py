@@ -0,0 +1,99 @@
+import pytest
+from flask import Flask
+
+from chart_cache import ChartCache, cached_chart
+
+
+def test_lru_bounded_by_total_bytes():
+    cache = ChartCache(max_bytes=10)
+    cache.put('a', b'aaaa')
+    cache.put('b', b'bbbb')
+    cache.get('a')
+    cache.put('c', b'cccc')
+    assert cache.get('b') is None
+    assert cache.get('a')[0] == b'aaaa'
+    stats = cache.stats()
+    assert stats['bytes'] == 8
+    assert stats['entries'] == 2
+    assert stats['evictions'] == 1
+
+
+def test_replacing_an_entry_keeps_the_size_right():
+    cache = ChartCache(max_bytes=100)
+    cache.put('a', b'x' * 10)
+    cache.put('a', b'y' * 20)
+    assert cache.stats()['bytes'] == 20
+
+
+def test_oversized_bodies_are_not_cached():
+    cache = ChartCache(max_bytes=4)
+    body, etag = cache.put('a', b'too large')
+    assert body == b'too large' and etag
+    assert cache.get('a') is None
+
+
+def test_etag_depends_on_the_body():
+    cache = ChartCache()
+    assert cache.put('a', b'one')[1] == cache.put('b', b'one')[1]
+    assert cache.put('a', b'one')[1] != cache.put('a', b'two')[1]
+
+
+@pytest.fixture
+def chart_app():
+    """(test client, cache, {'version': current}, list of renders)."""
+    cache = ChartCache()
+    state = {'version': 1, 'drawn': None}
+    renders = []
+    app = Flask(__name__)
+
+    @app.route('/chart')
+    @cached_chart(cache, lambda: state['version'], 'chart.png')
+    def chart():
+        renders.append(dict(**state))
+        drawn = state['drawn'] or state['version']
+        return f"chart {drawn}".encode(), drawn
+
+    return app.test_client(), cache, state, renders
+
+
+def test_rendered_once_per_params_and_version(chart_app):
+    client, cache, state, renders = chart_app
+    assert client.get('/chart?x=1').data == b'chart 1'
+    assert client.get('/chart?x=1').data == b'chart 1'
+    client.get('/chart?x=2')
+    assert len(renders) == 2
+    state['version'] = 2
+    assert client.get('/chart?x=1').data == b'chart 2'
+    assert len(renders) == 3
+
+
+def test_if_none_match_answers_304(chart_app):
+    client, cache, state, renders = chart_app
+    first = client.get('/chart')
+    assert first.headers['Cache-Control'] == 'no-cache'
+    again = client.get('/chart', headers={'If-None-Match': first.headers['ETag']})
+    assert again.status_code == 304
+    assert again.data == b''
+    assert cache.stats()['not_modified'] == 1
+    state['version'] = 2
+    assert client.get('/chart', headers={'If-None-Match': first.headers['ETag']}).status_code == 200
+
+
+def test_body_is_keyed_on_the_version_it_was_drawn_from(chart_app):
+    client, cache, state, renders = chart_app
+    # The data changed to version 2 while an older worker drew version 1
+    state['version'], state['drawn'] = 2, 1
+    assert client.get('/chart').data == b'chart 1'
+    state['drawn'] = None
+    # Not served as version 2's chart
+    assert client.get('/chart').data == b'chart 2'
+    assert len(renders) == 2
+
+
+def test_chart_endpoint_etag(client):
+    first = client.get('/api/histogram')
+    assert first.status_code == 200
+    assert first.mimetype == 'image/png'
+    assert client.get('/api/histogram', headers={'If-None-Match': first.headers['ETag']}).status_code == 304
+    stats = client.get('/api/chart_cache/stats').json
+    assert stats['not_modified'] == 1
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from chart_filters import BadChartRequest, filter_chart_data, minmax_downsample, parse_chart_filters
+
+
+@pytest.fixture
+def series_frame():
+    rng = np.random.default_rng(0)
+    days = pd.date_range('2020-01-01', periods=1000, freq='D')
+    frames = [pd.DataFrame({'dated': days, 'rep': rep, 'value': rng.normal(size=len(days))})
+              for rep in ('a', 'b', 'c')]
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_at_most_two_rows_per_series_and_bucket(series_frame):
+    kept = minmax_downsample(series_frame, 'dated', 'value', 'rep', buckets=50)
+    assert len(kept) <= 3 * 2 * 50
+    assert kept.groupby('rep').size().max() <= 100
+
+
+def test_each_bucket_keeps_its_extremes(series_frame):
+    kept = minmax_downsample(series_frame, 'dated', 'value', 'rep', buckets=50)
+    xs = series_frame['dated'].astype('int64')
+    slot = np.minimum(((xs - xs.min()) / (xs.max() - xs.min()) * 50).astype(int), 49)
+    extremes = series_frame.groupby(['rep', slot])['value'].agg(['min', 'max'])
+    kept_slot = slot[kept.index]
+    kept_extremes = kept.groupby(['rep', kept_slot])['value'].agg(['min', 'max'])
+    pd.testing.assert_frame_equal(kept_extremes, extremes)
+
+
+def test_kept_rows_stay_in_order(series_frame):
+    kept = minmax_downsample(series_frame, 'dated', 'value', 'rep', buckets=20)
+    assert kept.index.is_monotonic_increasing
+
+
+def test_small_inputs_are_returned_whole_without_missing_values():
+    df = pd.DataFrame({'x': [1, 2, 3, 4], 'y': [1.0, np.nan, 3.0, 4.0], 's': ['a'] * 4})
+    kept = minmax_downsample(df, 'x', 'y', 's', buckets=10)
+    assert list(kept['x']) == [1, 3, 4]
+
+
+def test_constant_x():
+    df = pd.DataFrame({'x': [5] * 10, 'y': np.arange(10.0), 's': ['a'] * 10})
+    assert list(minmax_downsample(df, 'x', 'y', 's', buckets=2)['y']) == [0.0, 9.0]
+
+
+@pytest.fixture
+def chart_data():
+    days = pd.date_range('2022-08-01', periods=10, freq='D')
+    df = pd.DataFrame({
+        'employee_id': [1, 2] * 5,
+        'employee_name': ['Ann Lee', 'Bo Kim'] * 5,
+        'revenue_confirmed': range(10),
+    }, index=days)
+    return df
+
+
+def test_filters_by_date_and_employee(chart_data):
+    rows = filter_chart_data(chart_data, {'from': '2022-08-03', 'to': '2022-08-06'})
+    assert list(rows['revenue_confirmed']) == [2, 3, 4, 5]
+    rows = filter_chart_data(chart_data, {'employees': '1'})
+    assert set(rows['employee_id']) == {1}
+    rows = filter_chart_data(chart_data, {'employees': 'Bo Kim, 1'})
+    assert len(rows) == 10
+
+
+def test_bad_filters_raise_bad_chart_request():
+    with pytest.raises(BadChartRequest):
+        parse_chart_filters({'from': 'last week'})
+    with pytest.raises(BadChartRequest):
+        parse_chart_filters({'from': '2022-08-10', 'to': '2022-08-01'})
+    assert parse_chart_filters({}) == (None, None, [])
+
+
+def test_chart_endpoints_reject_an_inverted_window(client):
+    response = client.get('/api/line_plot?from=2022-08-10&to=2022-08-01')
+    assert response.status_code == 400
+    assert client.get('/api/line_plot?from=2022-08-01&to=2022-08-10').status_code == 200
@@ -0,0 +1,115 @@
+import io
+
+import pytest
+from PIL import Image
+
+from chart_cache import ChartCache
+from chart_filters import BadChartRequest
+from facet_tiles import (composite_tiles, facet_pages, page_names, parse_page, render_facet_page,
+                         select_employees, tile_index)
+from sales_ingest import load_sales_frame
+
+
+def png(width=20, height=10, color=(255, 0, 0, 255)):
+    out = io.BytesIO()
+    Image.new('RGBA', (width, height), color).save(out, format='PNG')
+    return out.getvalue()
+
+
+class FakePool:
+    """Render pool drawing a blank tile per employee, as data `version`."""
+
+    def __init__(self, version=1):
+        self.version = version
+        self.rendered = []
+
+    def render_many(self, name, params_list):
+        self.rendered.extend(params['employee'] for params in params_list)
+        return [(png(), self.version) for _ in params_list]
+
+
+@pytest.fixture
+def df(sales_csv):
+    return load_sales_frame(str(sales_csv))
+
+
+@pytest.fixture
+def index(df):
+    return tile_index(df)
+
+
+def test_index_has_one_entry_per_name(df, index):
+    assert list(index) == sorted(df['employee_name'].unique())
+    assert all(len(ids) == 1 for ids, _ in index.values())
+
+
+def test_only_changed_employees_get_a_new_hash(df, index):
+    changed = df.copy()
+    name = changed.loc[changed['employee_id'] == 3, 'employee_name'].iloc[0]
+    changed.loc[changed.index[changed['employee_id'] == 3][-1], 'revenue_confirmed'] += 1
+    after = tile_index(changed)
+    assert [n for n in index if index[n][1] != after[n][1]] == [name]
+    # Row order in the file doesn't matter
+    assert tile_index(df.iloc[::-1]) == index
+
+
+def test_parse_page():
+    assert parse_page({}) == (1, 16)
+    assert parse_page({'page': '2', 'per_page': '4'}) == (2, 4)
+    for params in ({'page': '0'}, {'per_page': 'x'}, {'per_page': '65'}):
+        with pytest.raises(BadChartRequest):
+            parse_page(params)
+
+
+def test_page_names():
+    names = [f'n{i}' for i in range(10)]
+    assert page_names(names, 3, 4) == (['n8', 'n9'], 3)
+    assert page_names([], 1, 4) == ([], 0)
+    with pytest.raises(BadChartRequest):
+        page_names(names, 4, 4)
+
+
+def test_select_employees_by_id_or_name(index):
+    first, second = list(index)[:2]
+    second_id = next(iter(index[second][0]))
+    assert select_employees(index, []) == list(index)
+    assert select_employees(index, [first, str(second_id)]) == [first, second]
+
+
+def test_composite_tiles_lays_out_rows():
+    page = Image.open(io.BytesIO(composite_tiles([png()] * 6, columns=4)))
+    assert page.size == (80, 20)
+    assert Image.open(io.BytesIO(composite_tiles([png()] * 2, columns=4))).size == (40, 10)
+
+
+def test_cached_tiles_are_reused(index):
+    cache, pool = ChartCache(), FakePool()
+    render_facet_page(index, {'per_page': '4'}, cache, pool, version=1)
+    assert len(pool.rendered) == 4
+    render_facet_page(index, {'per_page': '4'}, cache, pool, version=1)
+    assert len(pool.rendered) == 4
+    # The second page only draws its own tiles
+    render_facet_page(index, {'per_page': '4', 'page': '2'}, cache, pool, version=1)
+    assert pool.rendered[4:] == list(index)[4:]
+
+
+def test_tiles_drawn_from_other_data_are_not_cached(index):
+    cache, pool = ChartCache(), FakePool(version=2)
+    render_facet_page(index, {'per_page': '2'}, cache, pool, version=1)
+    render_facet_page(index, {'per_page': '2'}, cache, pool, version=1)
+    assert len(pool.rendered) == 4
+    assert cache.stats()['entries'] == 0
+
+
+def test_facet_pages(index):
+    pages = facet_pages(index, {'per_page': '4'})
+    assert pages['employees'] == 6
+    assert [len(page) for page in pages['pages']] == [4, 2]
+
+
+def test_endpoints(client):
+    response = client.get('/api/facet_grid?per_page=4&page=2')
+    assert response.status_code == 200
+    assert Image.open(io.BytesIO(response.data)).size[1] > 0
+    assert client.get('/api/facet_grid?per_page=4&page=3').status_code == 400
+    assert client.get('/api/facet_grid/pages?per_page=4').json['employees'] == 6
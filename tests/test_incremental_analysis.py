@@ -0,0 +1,117 @@
+import pytest
+
+import api_llm
+import incremental_analysis
+from conftest import append_rows, bump_mtime, next_day_row
+from incremental_analysis import SnapshotStore, describe_changes, plan_analysis, previous_conclusions
+from prompt_compaction import count_tokens
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SnapshotStore(str(tmp_path / 'snapshots.sqlite3'))
+
+
+def snapshot(revenue=1000, leads=50, reps=None):
+    return {
+        'overview': {'total revenue_confirmed': revenue, 'total lead_taken': leads},
+        'reps': reps if reps is not None else {'Ann (#1)': {'revenue_confirmed': 600}, 'Bo (#2)': {'revenue_confirmed': 400}},
+    }
+
+
+def test_no_changes():
+    assert describe_changes(snapshot(), snapshot()) is None
+    # Below MIN_CHANGE
+    assert describe_changes(snapshot(1000), snapshot(1005)) is None
+
+
+def test_changed_values_only():
+    text = describe_changes(snapshot(), snapshot(revenue=1200))
+    assert text == 'total revenue_confirmed 1000 -> 1200 (+20.0%).'
+
+
+def test_reps_ranked_by_change_and_cut_off():
+    old = {f'#{i}': {'revenue_confirmed': 100} for i in range(5)}
+    new = {f'#{i}': {'revenue_confirmed': 100 + 10 * i} for i in range(1, 5)}
+    new['#9'] = {'revenue_confirmed': 7}
+    lines = describe_changes({'reps': old}, {'reps': new}, max_reps=2).split('\n')
+    assert lines == [
+        '#4: revenue_confirmed 100 -> 140 (+40.0%)',
+        '#3: revenue_confirmed 100 -> 130 (+30.0%)',
+        '2 other representatives changed less.',
+        '#9 (new): revenue_confirmed=7',
+        'No longer in the data: #0.',
+    ]
+
+
+def test_previous_conclusions_keeps_the_end():
+    narrative = ' '.join(f"Point {i} about the team." for i in range(200)) + ' Recommend more tours.'
+    kept = previous_conclusions(narrative, token_budget=40)
+    assert kept.startswith('... ')
+    assert kept.endswith('Recommend more tours.')
+    assert count_tokens(kept) <= 45
+    assert previous_conclusions('Short.') == 'Short.'
+
+
+def plan(store, metrics, **kwargs):
+    return plan_analysis(store, 'team', metrics, lambda: ('full_chain', {'data': 'everything'}),
+                         'delta_chain', {'question': 'q'}, **kwargs)
+
+
+def test_plan_modes(store):
+    first = plan(store, snapshot())
+    assert (first.mode, first.chain, first.inputs) == ('full', 'full_chain', {'data': 'everything'})
+    first.save(store, 'Revenue is strong. Keep it up.')
+
+    unchanged = plan(store, snapshot())
+    assert unchanged.mode == 'unchanged'
+    assert unchanged.narrative == 'Revenue is strong. Keep it up.'
+    assert unchanged.prompt_tokens(None) == 0
+
+    delta = plan(store, snapshot(revenue=1500))
+    assert (delta.mode, delta.chain, delta.updates) == ('delta', 'delta_chain', 1)
+    assert delta.inputs == {'question': 'q', 'changes': 'total revenue_confirmed 1000 -> 1500 (+50.0%).',
+                            'previous': 'Revenue is strong. Keep it up.'}
+    assert plan(store, snapshot(revenue=1500), force_full=True).mode == 'full'
+
+
+def test_full_analysis_when_a_delta_would_not_be_smaller(store):
+    plan(store, snapshot()).save(store, 'Fine.')
+    assert plan(store, snapshot(revenue=2000), full_tokens=5).mode == 'full'
+
+
+def test_context_must_match(store):
+    plan(store, snapshot(), context='How is revenue?').save(store, 'Fine.')
+    assert plan(store, snapshot(), context='How are tours?').mode == 'full'
+    assert plan(store, snapshot(), context='How is revenue?').mode == 'unchanged'
+
+
+def test_deltas_restart_from_scratch_after_a_while(store, monkeypatch):
+    monkeypatch.setattr(incremental_analysis, 'MAX_DELTA_UPDATES', 2)
+    plan(store, snapshot(revenue=100)).save(store, 'n')
+    modes = []
+    for revenue in (200, 300, 400, 500):
+        step = plan(store, snapshot(revenue=revenue))
+        modes.append(step.mode)
+        step.save(store, 'n')
+    assert modes == ['delta', 'delta', 'full', 'delta']
+
+
+def test_team_endpoint(client, stub_chain, monkeypatch):
+    _, prompts = stub_chain
+    monkeypatch.setattr(api_llm.sales_store, 'check_interval', 0)
+    body = {'summary': 'How did the team do?', 'incremental': True}
+
+    first = client.post('/api/team_performance', json=body).json
+    assert first['analysis'] == 'full'
+    again = client.post('/api/team_performance', json=body).json
+    assert again['analysis'] == 'unchanged'
+    assert again['insights'] == first['insights']
+    assert len(prompts) == 1
+
+    append_rows('data/sales_performance_data.csv', [next_day_row(3)] * 20)
+    bump_mtime('data/sales_performance_data.csv')
+    delta = client.post('/api/team_performance', json=body).json
+    assert delta['analysis'] == 'delta'
+    assert delta['prompt_tokens'] < first['prompt_tokens']
+    assert first['insights'] in prompts[-1]
@@ -0,0 +1,62 @@
+import base64
+import gzip
+import json
+
+import numpy as np
+import pytest
+
+from chart_renderers import render_interactive_json
+from render_pool import _chart_data
+
+
+def decode(array):
+    assert array['dtype'] == 'f8'
+    return np.frombuffer(base64.b64decode(array['bdata']), dtype='<f8')
+
+
+@pytest.fixture
+def chart_data(app_dir):
+    return _chart_data('data/sales_performance_data.csv')[0]
+
+
+def test_figure_has_one_trace_per_employee(chart_data):
+    figure = json.loads(gzip.decompress(render_interactive_json(chart_data, {})))
+    names = sorted(chart_data['employee_name'].unique())
+    assert [trace['name'] for trace in figure['data']] == names
+    assert figure['layout']['xaxis']['type'] == 'date'
+
+    trace = figure['data'][0]
+    rows = chart_data[chart_data['employee_name'] == names[0]]
+    assert decode(trace['y']).sum() == rows['revenue_confirmed'].sum()
+    x = decode(trace['x']).astype('int64').astype('datetime64[ms]')
+    assert x[0] == rows.index.min().to_datetime64()
+
+
+def test_filters_apply(chart_data):
+    figure = json.loads(gzip.decompress(render_interactive_json(chart_data, {'employees': '1,2'})))
+    assert len(figure['data']) == 2
+
+
+def test_gzip_is_sent_as_is_to_clients_that_accept_it(client):
+    response = client.get('/api/interactive_plot', headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.mimetype == 'application/json'
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert len(json.loads(gzip.decompress(response.data))['data']) == 6
+
+
+def test_identity_fallback_has_its_own_etag(client):
+    zipped = client.get('/api/interactive_plot', headers={'Accept-Encoding': 'gzip'})
+    plain = client.get('/api/interactive_plot')
+    assert 'Content-Encoding' not in plain.headers
+    assert len(plain.json['data']) == 6
+    assert plain.headers['ETag'] != zipped.headers['ETag']
+    revalidated = client.get('/api/interactive_plot', headers={'If-None-Match': plain.headers['ETag']})
+    assert revalidated.status_code == 304
+    mismatched = client.get('/api/interactive_plot', headers={'If-None-Match': zipped.headers['ETag']})
+    assert mismatched.status_code == 200
+
+
+def test_unknown_format(client):
+    assert client.get('/api/interactive_plot?format=svg').status_code == 400
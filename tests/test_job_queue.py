@@ -0,0 +1,195 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JobQueue
+
+# Job functions for the queue to run, looked up through JOB_KINDS
+release = threading.Event()
+
+
+def echo_job(params):
+    return {'echo': params}, params.get('status', 200)
+
+
+def crashing_job(params):
+    raise RuntimeError('analysis crashed')
+
+
+def blocking_job(params):
+    release.wait(5)
+    return {'ok': True}, 200
+
+
+@pytest.fixture(autouse=True)
+def kinds(monkeypatch):
+    monkeypatch.setitem(job_queue.JOB_KINDS, 'echo', f'{__name__}:echo_job')
+    monkeypatch.setitem(job_queue.JOB_KINDS, 'crash', f'{__name__}:crashing_job')
+    monkeypatch.setitem(job_queue.JOB_KINDS, 'block', f'{__name__}:blocking_job')
+    release.clear()
+    yield
+    release.set()
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    queues = []
+
+    def make(**kwargs):
+        kwargs.setdefault('workers', 0)
+        kwargs.setdefault('poll_interval', 0.05)
+        queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), **kwargs)
+        queues.append(queue)
+        return queue
+
+    yield make
+    for queue in queues:
+        queue.stop()
+
+
+def wait_for_status(queue, job_id, statuses=('done', 'failed'), timeout=5):
+    deadline = time.monotonic() + timeout
+    while True:
+        job = queue.get(job_id)
+        if job['status'] in statuses:
+            return job
+        assert time.monotonic() < deadline, job
+        time.sleep(0.01)
+
+
+def test_identical_submissions_share_a_job(make_queue):
+    queue = make_queue()
+    job_id, created = queue.submit('echo', {'a': 1}, 'v1')
+    assert created
+    assert queue.submit('echo', {'a': 1}, 'v1') == (job_id, False)
+    assert queue.submit('echo', {'a': 1}, 'v2')[0] != job_id
+    assert queue.submit('echo', {'a': 2}, 'v1')[0] != job_id
+    assert queue.stats()['deduplicated'] == 1
+    assert queue.get(job_id)['status'] == 'queued'
+
+
+def test_unknown_kind(make_queue):
+    with pytest.raises(ValueError):
+        make_queue().submit('nope', {})
+    assert make_queue().get('missing') is None
+
+
+def test_workers_run_jobs_and_store_results(make_queue):
+    queue = make_queue(workers=1)
+    queue.start()
+    job = wait_for_status(queue, queue.submit('echo', {'a': 1})[0])
+    assert job['status'] == 'done'
+    assert job['status_code'] == 200
+    assert job['result'] == {'echo': {'a': 1}}
+    assert job['attempts'] == 1
+    # A bad request is an answer too; server errors and crashes are failures
+    assert wait_for_status(queue, queue.submit('echo', {'status': 400})[0])['status'] == 'done'
+    assert wait_for_status(queue, queue.submit('echo', {'status': 503})[0])['status'] == 'failed'
+    crashed = wait_for_status(queue, queue.submit('crash', {})[0])
+    assert crashed['status'] == 'failed'
+    assert crashed['error'] == 'analysis crashed'
+
+
+def test_failed_jobs_are_queued_afresh(make_queue):
+    queue = make_queue(workers=1)
+    queue.start()
+    job_id, _ = queue.submit('crash', {})
+    wait_for_status(queue, job_id)
+    again, created = queue.submit('crash', {})
+    assert created and again != job_id
+
+
+def test_each_job_runs_once_across_processes(make_queue):
+    queues = [make_queue(workers=2) for _ in range(3)]
+    ids = [queues[0].submit('echo', {'n': n})[0] for n in range(20)]
+    for queue in queues:
+        queue.start()
+    for job_id in ids:
+        assert wait_for_status(queues[0], job_id)['attempts'] == 1
+    assert sum(queue.stats()['completed'] for queue in queues) == 20
+
+
+def test_jobs_of_a_dead_process_are_recovered(make_queue):
+    dead = make_queue(lease=0.2)
+    job_id, _ = dead.submit('echo', {'a': 1})
+    assert dead._claim()[0] == job_id
+    # The process running it is gone and stops renewing its lease
+    survivor = make_queue(lease=0.2)
+    assert survivor.recover() == 0
+    time.sleep(0.3)
+    assert dead.recover() == 0  # never its own jobs
+    assert survivor.recover() == 1
+    assert survivor.get(job_id)['status'] == 'queued'
+    assert survivor._claim()[0] == job_id
+
+
+def test_renewed_leases_are_not_recovered(make_queue):
+    running = make_queue(lease=0.2)
+    running.submit('echo', {})
+    running._claim()
+    time.sleep(0.3)
+    running.heartbeat()
+    assert make_queue(lease=0.2).recover() == 0
+
+
+def test_worker_survives_database_errors(make_queue, monkeypatch):
+    queue = make_queue(workers=1)
+    claim = queue._claim
+    errors = []
+
+    def flaky_claim():
+        if len(errors) < 2:
+            errors.append(1)
+            raise sqlite3.OperationalError('database is locked')
+        return claim()
+
+    monkeypatch.setattr(queue, '_claim', flaky_claim)
+    queue.start()
+    job = wait_for_status(queue, queue.submit('echo', {'a': 1})[0])
+    assert job['status'] == 'done'
+    assert len(errors) == 2
+
+
+def test_finished_jobs_expire(make_queue):
+    queue = make_queue(workers=1, retention=0.1)
+    queue.start()
+    job_id, _ = queue.submit('echo', {'a': 1})
+    wait_for_status(queue, job_id)
+    time.sleep(0.2)
+    queue.submit('echo', {'a': 2})
+    assert queue.get(job_id) is None
+
+
+def test_stats(make_queue):
+    queue = make_queue(workers=1)
+    queue.start()
+    job_id, _ = queue.submit('block', {})
+    wait_for_status(queue, job_id, ('running',))
+    queue.submit('echo', {})
+    stats = queue.stats()
+    assert stats['running'] == 1 and stats['workers'] == 1
+    release.set()
+    wait_for_status(queue, job_id)
+    assert queue.stats()['done'] >= 1
+
+
+def test_async_trends_request(client):
+    response = client.post('/api/performance_trends?async=1', json={'time_period': 'monthly'})
+    assert response.status_code == 202
+    assert response.headers['Location'] == response.json['url']
+    assert client.post('/api/performance_trends?async=1',
+                       json={'time_period': 'monthly'}).json['duplicate']
+
+    deadline = time.monotonic() + 10
+    while True:
+        job = client.get(response.json['url']).json
+        if job['status'] == 'done':
+            break
+        assert time.monotonic() < deadline, job
+        time.sleep(0.05)
+    expected = client.post('/api/performance_trends', json={'time_period': 'monthly'}).json
+    assert job['result'] == expected
+    assert client.get('/api/jobs/unknown').status_code == 404
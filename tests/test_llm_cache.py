@@ -0,0 +1,107 @@
+import openai
+import pytest
+
+import Individuale_sales_code
+import llm_cache
+from llm_cache import LLMCache, cached_chain_run, make_cache_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return LLMCache(str(tmp_path / 'llm_cache.sqlite3'))
+
+
+def test_memory_then_disk_hits(tmp_path, cache):
+    cache.set('k', {'feedback': 'good'})
+    assert cache.get('k') == {'feedback': 'good'}
+    assert cache.counters['memory_hits'] == 1
+
+    # A new process finds it on disk and keeps it in memory afterwards
+    reopened = LLMCache(cache.path)
+    assert reopened.get('k') == {'feedback': 'good'}
+    assert reopened.get('k') == {'feedback': 'good'}
+    assert reopened.counters['disk_hits'] == 1
+    assert reopened.counters['memory_hits'] == 1
+
+
+def test_miss_is_counted(cache):
+    assert cache.get('absent') is None
+    assert cache.counters['misses'] == 1
+
+
+def test_entries_expire_after_the_ttl(cache, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now[0])
+    cache.ttl = 60
+    cache.set('k', 'v')
+    now[0] += 61
+    assert cache.get('k') is None
+    assert cache.counters['expired'] == 1
+    assert LLMCache(cache.path, ttl=60).get('k') is None
+
+
+def test_memory_tier_evicts_least_recently_used(tmp_path):
+    cache = LLMCache(str(tmp_path / 'c.sqlite3'), max_memory_items=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert list(cache._memory) == ['a', 'c']
+    # Still answered from disk
+    assert cache.get('b') == 2
+    assert cache.counters['disk_hits'] == 1
+
+
+def test_disk_tier_evicts_least_recently_accessed(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(llm_cache.time, 'time', lambda: now[0])
+    cache = LLMCache(str(tmp_path / 'c.sqlite3'), max_memory_items=0, max_disk_items=2)
+    for key in ('a', 'b'):
+        now[0] += 1
+        cache.set(key, key)
+    now[0] += 1
+    cache.get('a')
+    now[0] += 1
+    cache.set('c', 'c')
+    assert cache.counters['evictions'] == 1
+    assert cache.get('b') is None
+    assert cache.get('a') == 'a'
+
+
+def test_key_depends_on_prompt_inputs_model_and_data_version():
+    base = make_cache_key('t', {'x': 1}, 'gpt-4', 'v1')
+    assert base == make_cache_key('t', {'x': 1}, 'gpt-4', 'v1')
+    assert base != make_cache_key('t', {'x': 1}, 'gpt-4', 'v2')
+    assert base != make_cache_key('t', {'x': 2}, 'gpt-4', 'v1')
+    assert base != make_cache_key('u', {'x': 1}, 'gpt-4', 'v1')
+    assert base != make_cache_key('t', {'x': 1}, 'gpt-3.5', 'v1')
+
+
+def test_cached_chain_run_calls_the_llm_once_per_key(cache, stub_chain):
+    chain, prompts = stub_chain
+    first = cached_chain_run(cache, chain, 'v1', data='rep 1')
+    assert cached_chain_run(cache, chain, 'v1', data='rep 1') == first
+    assert len(prompts) == 1
+    cached_chain_run(cache, chain, 'v2', data='rep 1')
+    assert len(prompts) == 2
+    cached_chain_run(cache, chain, 'v1', refresh=True, data='rep 1')
+    assert len(prompts) == 3
+
+
+def test_generate_feedback_returns_the_text_from_either_tier(cache, monkeypatch):
+    calls = []
+
+    class ChatCompletion:
+        @staticmethod
+        def create(**kwargs):
+            calls.append(kwargs)
+            return {'choices': [{'message': {'content': 'Solid month.'}}]}
+
+    monkeypatch.setattr(openai, 'ChatCompletion', ChatCompletion, raising=False)
+    monkeypatch.setattr(Individuale_sales_code, 'get_llm_cache', lambda: cache)
+
+    assert Individuale_sales_code.generate_feedback('prompt', 'v1') == 'Solid month.'
+    assert Individuale_sales_code.generate_feedback('prompt', 'v1') == 'Solid month.'
+    cache._memory.clear()
+    assert Individuale_sales_code.generate_feedback('prompt', 'v1') == 'Solid month.'
+    assert len(calls) == 1
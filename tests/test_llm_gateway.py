@@ -0,0 +1,234 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import llm_gateway
+from llm_gateway import LLMGateway, LLMQueueTimeout, LLMRetriesExhausted, TokenBucket, is_retryable
+
+
+class RateLimitError(Exception):
+    pass
+
+
+class HTTPError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.fixture
+def gateway():
+    return LLMGateway(max_retries=3, base_delay=0, max_queue_wait=5)
+
+
+def flaky(failures, error=RateLimitError):
+    """fn() that raises `error` `failures` times, then returns 'ok'."""
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error('slow down')
+        return 'ok'
+
+    return fn, calls
+
+
+def test_is_retryable():
+    assert is_retryable(RateLimitError())
+    assert is_retryable(HTTPError(429))
+    assert is_retryable(HTTPError(503))
+    assert not is_retryable(HTTPError(400))
+    assert not is_retryable(ValueError())
+
+
+def test_retryable_errors_are_retried(gateway):
+    fn, calls = flaky(2)
+    assert gateway.call('k', fn) == 'ok'
+    assert len(calls) == 3
+    assert gateway.stats()['retries'] == 2
+
+
+def test_other_errors_are_raised_at_once(gateway):
+    fn, calls = flaky(1, ValueError)
+    with pytest.raises(ValueError):
+        gateway.call('k', fn)
+    assert len(calls) == 1
+    assert gateway.stats()['failures'] == 1
+
+
+def test_gives_up_after_max_retries(gateway):
+    fn, calls = flaky(10)
+    with pytest.raises(LLMRetriesExhausted):
+        gateway.call('k', fn)
+    assert len(calls) == 4
+
+
+def test_backoff_is_exponential_with_jitter_and_capped(monkeypatch):
+    delays = []
+    monkeypatch.setattr(llm_gateway.time, 'sleep', delays.append)
+    gateway = LLMGateway(max_retries=5, base_delay=1, max_delay=4)
+    fn, _ = flaky(5)
+    gateway.call('k', fn)
+    assert len(delays) == 5
+    for attempt, delay in enumerate(delays):
+        assert 0 <= delay <= min(4, 2 ** attempt)
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_identical_concurrent_calls_share_one_request(gateway):
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(5)
+        return 'shared'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(gateway.call('k', fn))) for _ in range(4)]
+    threads[0].start()
+    wait_for(lambda: gateway.stats()['in_flight'] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: gateway.stats()['coalesced'] == 3)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert results == ['shared'] * 4
+    assert len(calls) == 1
+    # Finished calls are not shared with later ones
+    assert gateway.call('k', lambda: 'again') == 'again'
+
+
+def test_followers_see_the_leaders_error(gateway):
+    release = threading.Event()
+
+    def fn():
+        release.wait(5)
+        raise ValueError('bad prompt')
+
+    errors = []
+
+    def call():
+        try:
+            gateway.call('k', fn)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    threads[0].start()
+    wait_for(lambda: gateway.stats()['in_flight'] == 1)
+    for thread in threads[1:]:
+        thread.start()
+    wait_for(lambda: gateway.stats()['coalesced'] == 2)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 3
+
+
+def test_async_calls_are_coalesced_and_retried(gateway):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        if len(calls) == 1:
+            raise RateLimitError('slow down')
+        return 'ok'
+
+    async def main():
+        return await asyncio.gather(*[gateway.acall('k', fn) for _ in range(3)])
+
+    assert asyncio.run(main()) == ['ok'] * 3
+    assert len(calls) == 2
+    assert gateway.stats()['coalesced'] == 2
+
+
+def test_cancelling_the_first_caller_keeps_the_others_waiting(gateway):
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return 'ok'
+
+    async def main():
+        leader = asyncio.ensure_future(gateway.acall('k', fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(gateway.acall('k', fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == 'ok'
+    assert len(calls) == 1
+
+
+def test_call_is_cancelled_once_every_caller_is_gone(gateway):
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def fresh():
+        return 'fresh'
+
+    async def main():
+        callers = [asyncio.ensure_future(gateway.acall('k', fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert gateway._async_flights == {}
+        # A later caller starts a fresh call
+        return await gateway.acall('k', fresh)
+
+    assert asyncio.run(main()) == 'fresh'
+    assert cancelled == [1]
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(per_minute=6000)
+    deadline = time.monotonic() + 5
+    bucket.acquire(6000, deadline)
+    waited = bucket.acquire(10, deadline)
+    assert 0.05 < waited < 1
+
+
+def test_queue_wait_past_the_deadline_raises():
+    gateway = LLMGateway(tokens_per_minute=60, max_queue_wait=0.1)
+    gateway.call('a', lambda: 'ok', tokens=60)
+    with pytest.raises(LLMQueueTimeout):
+        gateway.call('b', lambda: 'ok', tokens=30)
+    assert gateway.stats()['queue_timeouts'] == 1
+
+
+def test_stream_retries_before_the_first_chunk(gateway):
+    attempts = []
+
+    def start():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RateLimitError('slow down')
+        return iter(['a', 'b'])
+
+    assert list(gateway.stream(start)) == ['a', 'b']
+    assert len(attempts) == 2
+    assert gateway.stats()['in_flight'] == 0
@@ -0,0 +1,91 @@
+import asyncio
+import json
+
+import pytest
+from langchain_core.outputs import GenerationChunk
+
+import llm_gateway
+from llm_cache import LLMCache
+from llm_streaming import astream_chain, stream_chain
+from stub_llm import StubLLM
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_gateway, '_gateway', None)
+    return LLMCache(str(tmp_path / 'llm_cache.sqlite3'))
+
+
+def parse(events):
+    """[(event, data)] of a list of SSE messages."""
+    parsed = []
+    for message in ''.join(events).split('\n\n'):
+        if message:
+            event, data = message.split('\n')
+            parsed.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return parsed
+
+
+def test_tokens_then_done(cache, stub_chain):
+    chain, prompts = stub_chain
+    events = parse(stream_chain(cache, chain, 'v1', metadata={'rep_id': 1}, data='numbers'))
+    tokens = [data['text'] for event, data in events if event == 'token']
+    assert len(tokens) > 1
+    assert ''.join(tokens) == StubLLM()._answer("Review this data: numbers")
+    event, done = events[-1]
+    assert event == 'done'
+    assert done['rep_id'] == 1
+    assert done['cache'] == 'miss'
+    assert done['time_to_first_token_ms'] is not None
+
+
+def test_streamed_completion_is_cached(cache, stub_chain):
+    chain, prompts = stub_chain
+    first = parse(stream_chain(cache, chain, 'v1', data='numbers'))
+    second = parse(stream_chain(cache, chain, 'v1', data='numbers'))
+    assert len(prompts) == 1
+    assert [event for event, _ in second] == ['token', 'done']
+    assert second[0][1]['text'] == ''.join(data['text'] for event, data in first if event == 'token')
+    assert second[-1][1]['cache'] == 'hit'
+    # Another data version is a new call
+    parse(stream_chain(cache, chain, 'v2', data='numbers'))
+    assert len(prompts) == 2
+
+
+def test_failure_mid_stream_ends_with_an_error_and_is_not_cached(cache, stub_chain, monkeypatch):
+    chain, _ = stub_chain
+
+    def failing(self, prompt, stop=None, run_manager=None, **kwargs):
+        yield GenerationChunk(text='Partial')
+        raise RuntimeError('connection reset')
+
+    monkeypatch.setattr(StubLLM, '_stream', failing)
+    events = parse(stream_chain(cache, chain, 'v1', data='numbers'))
+    assert events[0] == ('token', {'text': 'Partial'})
+    assert events[-1] == ('error', {'error': 'connection reset'})
+    stats = cache.stats()
+    assert stats['memory_items'] == stats['disk_items'] == 0
+
+
+def test_async_stream_matches_the_sync_one(cache, stub_chain):
+    chain, _ = stub_chain
+
+    async def collect():
+        return [event async for event in astream_chain(cache, chain, 'v1', data='numbers')]
+
+    events = parse(asyncio.run(collect()))
+    tokens = ''.join(data['text'] for event, data in events if event == 'token')
+    assert tokens == StubLLM()._answer("Review this data: numbers")
+    assert events[-1][1]['cache'] == 'miss'
+    again = parse(stream_chain(cache, chain, 'v1', data='numbers'))
+    assert again[-1][1]['cache'] == 'hit'
+
+
+def test_rep_endpoint_streams(client):
+    response = client.get('/api/rep_performance?rep_id=2&latest=5', headers={'Accept': 'text/event-stream'})
+    assert response.mimetype == 'text/event-stream'
+    assert response.headers['X-Accel-Buffering'] == 'no'
+    events = parse([response.get_data(as_text=True)])
+    assert events[-1][0] == 'done'
+    assert events[-1][1]['rep_id'] == '2'
+    assert events[-1][1]['records'] == 5
@@ -0,0 +1,148 @@
+import threading
+import time
+
+import pytest
+
+from api_llm import LLMRequestError, map_reduce_request
+from llm_flow import Blocking, run_flow
+from map_reduce_summary import (MapReduceStats, combine_summaries, partition_team_data,
+                                summarize_partitions)
+from prompt_compaction import count_tokens
+from sales_ingest import load_sales_frame
+
+
+@pytest.fixture
+def df(sales_csv):
+    return load_sales_frame(str(sales_csv))
+
+
+def test_partitions_by_employee(df):
+    parts = partition_team_data(df, 'employee', 4, 200)
+    assert [label for label, _ in parts] == [
+        'representatives #1 to #2 (2 reps)',
+        'representatives #3 to #4 (2 reps)',
+        'representatives #5',
+        'representatives #6',
+    ]
+    assert all(count_tokens(text) <= 200 for _, text in parts)
+
+
+def test_more_partitions_than_reps(df):
+    parts = partition_team_data(df, 'employee', 50, 200)
+    assert len(parts) == 6
+
+
+def test_partitions_by_window(df):
+    # 40 days from 2022-07-26: three calendar months
+    parts = partition_team_data(df, 'window', 2, 200)
+    assert [label for label, _ in parts] == [
+        '2022-07-26 to 2022-08-31',
+        '2022-09-01 to 2022-09-03',
+    ]
+    assert len(partition_team_data(df, 'window', 10, 200)) == 3
+
+
+def test_combine_summaries_stays_within_budget():
+    summaries = [(f'part {i}', 'word ' * 500) for i in range(4)]
+    combined = combine_summaries(summaries, 120)
+    assert count_tokens(combined) <= 120
+    assert combined.startswith('part 0:\n')
+    assert all(f'part {i}:' in combined for i in range(4))
+
+
+def call(calls, text, label=None):
+    calls.append(text)
+    return f"summary of {label or text}", count_tokens(text)
+    yield  # a flow making no steps
+
+
+def run(partitions, fan_out, token_budget=1000):
+    calls = []
+    stats = MapReduceStats('employee', 2, fan_out)
+    summaries = run_flow(summarize_partitions(
+        partitions,
+        lambda label, text: call(calls, text, label),
+        lambda combined: call(calls, combined),
+        fan_out, token_budget, stats, concurrency=4
+    ))
+    return summaries, stats, calls
+
+
+def test_reduces_until_fan_out_summaries_remain():
+    partitions = [(f'p{i}', f'data {i}') for i in range(9)]
+    summaries, stats, calls = run(partitions, fan_out=3)
+    assert [label for label, _ in summaries] == ['p0 / p2', 'p3 / p5', 'p6 / p8']
+    assert summaries[0][1].startswith('summary of p0:\nsummary of p0')
+    # 9 map calls and one round of 3 reduce calls
+    assert (stats.partitions, stats.calls, stats.rounds) == (9, 12, 2)
+    assert len(calls) == 12
+    assert stats.max_call_tokens == max(count_tokens(text) for text in calls)
+    assert stats.prompt_tokens == sum(count_tokens(text) for text in calls)
+
+
+def test_no_reduce_round_when_the_partitions_fit():
+    summaries, stats, _ = run([('a', 'x'), ('b', 'y')], fan_out=2)
+    assert summaries == [('a', 'summary of a'), ('b', 'summary of b')]
+    assert (stats.calls, stats.rounds) == (2, 1)
+
+
+def test_map_calls_run_concurrently():
+    in_flight, peak = [0], [0]
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            in_flight[0] += 1
+            peak[0] = max(peak[0], in_flight[0])
+        time.sleep(0.2)
+        with lock:
+            in_flight[0] -= 1
+
+    def summarize(label, text):
+        yield Blocking(slow)
+        return label, 1
+
+    partitions = [(f'p{i}', '') for i in range(6)]
+    stats = MapReduceStats('employee', 1, 8)
+    start = time.monotonic()
+    run_flow(summarize_partitions(partitions, summarize, None, 8, 100, stats, concurrency=3))
+    assert peak[0] == 3
+    assert time.monotonic() - start < 0.55
+
+
+def test_map_reduce_request():
+    assert map_reduce_request({}) is None
+    assert map_reduce_request({'map_reduce': False}) is None
+    assert map_reduce_request({'map_reduce': True})[0] == 'employee'
+    assert map_reduce_request({'map_reduce': {'partition_by': 'window', 'depth': 2, 'fan_out': 4}}) == \
+        ('window', 2, 4)
+    for options in ({'partition_by': 'region'}, {'depth': 0}, {'fan_out': 1}, {'fan_out': 'many'},
+                    {'depth': 9, 'fan_out': 2}):
+        with pytest.raises(LLMRequestError) as raised:
+            map_reduce_request({'map_reduce': options})
+        assert raised.value.status == 400
+
+
+def test_team_endpoint(client, stub_chain):
+    body = {'summary': 'How is the team doing?',
+            'map_reduce': {'partition_by': 'employee', 'depth': 2, 'fan_out': 2}}
+    response = client.post('/api/team_performance', json=body)
+    assert response.status_code == 200
+    result = response.json
+    assert result['insights']
+    stats = result['map_reduce']
+    # 4 partitions, 2 reduce calls, then the final analysis
+    assert (stats['partitions'], stats['calls'], stats['rounds']) == (4, 7, 3)
+    assert stats['max_call_tokens'] <= result['token_budget']
+    _, prompts = stub_chain
+    assert len(prompts) == 7
+
+
+def test_team_endpoint_rejects_bad_options(client):
+    response = client.post('/api/team_performance',
+                           json={'summary': 'q', 'map_reduce': {'partition_by': 'region'}})
+    assert response.status_code == 400
+    response = client.post('/api/team_performance',
+                           json={'summary': 'q', 'map_reduce': True, 'token_budget': 50})
+    assert response.status_code == 400
+    assert 'token_budget must be at least' in response.json['error']
@@ -0,0 +1,70 @@
+import pytest
+
+import api_llm
+import tracing
+from conftest import append_rows, bump_mtime, next_day_row
+from feedback_store import FeedbackStore
+from precompute_feedback import precompute_feedback
+
+
+@pytest.fixture
+def store(tmp_path):
+    return FeedbackStore(str(tmp_path / 'feedback.sqlite3'))
+
+
+def test_get_and_put(store):
+    assert store.get('h1') is None
+    store.put(1, 'h1', 'Good week.', 'v1')
+    assert store.get('h1') == 'Good week.'
+    assert store.stats() == {'hits': 1, 'misses': 1, 'stored': 1, 'removed': 0, 'entries': 1}
+
+
+def test_known_handles_many_hashes(store):
+    for i in range(0, 1200, 2):
+        store.put(i, f'h{i}', 'text')
+    assert store.known(f'h{i}' for i in range(1200)) == {f'h{i}' for i in range(0, 1200, 2)}
+
+
+def test_retain_drops_changed_and_departed_reps(store):
+    store.put(1, 'old1', 'text')
+    store.put(2, 'h2', 'text')
+    store.put(3, 'h3', 'text')
+    assert store.retain({1: 'new1', 2: 'h2'}) == 2
+    assert store.get('h2') == 'text'
+    assert store.get('old1') is None and store.get('h3') is None
+
+
+def test_only_changed_reps_go_to_the_llm(client, stub_chain, monkeypatch):
+    _, prompts = stub_chain
+    monkeypatch.setattr(api_llm.sales_store, 'check_interval', 0)
+
+    first = precompute_feedback()
+    assert (first['reps'], first['changed'], first['failed'], first['removed']) == (6, 6, 0, 0)
+    assert len(prompts) == 6
+    # The job's endpoint label doesn't outlive the call
+    assert tracing.request_endpoint.get() is None
+
+    # Nothing changed: no LLM calls at all
+    assert precompute_feedback()['changed'] == 0
+    assert len(prompts) == 6
+
+    append_rows('data/sales_performance_data.csv', [next_day_row(3)])
+    bump_mtime('data/sales_performance_data.csv')
+    third = precompute_feedback()
+    assert (third['changed'], third['removed']) == (1, 1)
+    assert len(prompts) == 7
+
+    # Forced runs bypass both the store and the LLM cache
+    assert precompute_feedback(force=True)['changed'] == 6
+    assert len(prompts) == 13
+
+
+def test_rep_endpoint_serves_precomputed_feedback(client, stub_chain):
+    _, prompts = stub_chain
+    precompute_feedback()
+    response = client.get('/api/rep_performance?rep_id=2')
+    assert response.json['precomputed'] is True
+    assert len(prompts) == 6
+    # Another window isn't precomputed
+    assert client.get('/api/rep_performance?rep_id=2&latest=3').json['precomputed'] is False
+    assert len(prompts) == 7
@@ -0,0 +1,73 @@
+import pandas as pd
+import pytest
+
+from benchmarks.generate_data import generate
+from prompt_compaction import (compact_team_data, compact_team_metrics, count_tokens, format_value,
+                               team_snapshot, truncate_tokens)
+from sales_ingest import load_sales_frame
+from team_metrics import IncrementalTeamMetrics
+
+
+@pytest.fixture
+def large_frame(tmp_path):
+    path = tmp_path / 'large.csv'
+    generate(str(path), reps=120, days=90, seed=2)
+    return load_sales_frame(str(path), use_cache=False)
+
+
+@pytest.mark.parametrize('budget', [200, 500, 2000])
+def test_summary_stays_within_the_budget(large_frame, budget):
+    text, tokens = compact_team_data(large_frame, budget)
+    assert tokens == count_tokens(text)
+    assert tokens <= budget
+
+
+def test_sections_are_kept_in_order_of_importance(large_frame):
+    small, _ = compact_team_data(large_frame, 200)
+    large, _ = compact_team_data(large_frame, 2000)
+    assert small.startswith('Team overview: 10800 daily records for 120 representatives')
+    assert 'Per-representative aggregates' not in small
+    assert 'Last 30 days vs previous 30 days' in large
+    assert 'Top 5 by confirmed revenue' in large
+    assert 'Per-representative aggregates' in large
+
+
+def test_prompt_size_does_not_grow_with_history(tmp_path):
+    sizes = []
+    for days in (60, 240):
+        path = tmp_path / f'{days}.csv'
+        generate(str(path), reps=120, days=days, seed=2)
+        sizes.append(compact_team_data(load_sales_frame(str(path), use_cache=False))[1])
+    assert sizes[1] <= 2000
+    assert abs(sizes[1] - sizes[0]) < 100
+
+
+def test_summary_from_running_aggregates_matches_the_frame(sales_csv):
+    df = load_sales_frame(str(sales_csv), use_cache=False)
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    metrics = engine.refresh()
+    from_metrics, _ = compact_team_metrics(metrics, engine.all_employee_metrics(), engine.period_totals())
+    from_frame, _ = compact_team_data(df)
+    assert from_metrics == from_frame
+
+
+def test_empty_data():
+    df = pd.DataFrame({'dated': pd.Series([], dtype=object)})
+    assert compact_team_data(df)[0] == "No sales data available."
+
+
+def test_truncate_tokens():
+    text = 'A sentence about revenue. ' * 200
+    cut = truncate_tokens(text, 50)
+    assert count_tokens(cut) <= 50
+    assert cut.endswith(' ...')
+    assert truncate_tokens('short', 50) == 'short'
+
+
+def test_format_value_and_snapshot(sales_csv):
+    assert format_value(3.0) == '3'
+    assert format_value(2.345) == '2.35'
+    assert format_value(float('nan')) == 'n/a'
+    snapshot = team_snapshot(load_sales_frame(str(sales_csv), use_cache=False))
+    assert snapshot['overview']['records'] == 240
+    assert len(snapshot['reps']) == 6
@@ -0,0 +1,116 @@
+import threading
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+
+import pytest
+
+from render_pool import PoolBroken, PoolBusy, RenderPool, RenderTimeout
+
+
+class FakeExecutor:
+    """Stands in for the process pool: 'ok' renders at once, 'broken'
+    fails like a pool whose worker died, 'hang' never finishes."""
+
+    def __init__(self, behaviour):
+        self.behaviour = behaviour
+        self.futures = []
+        self.shut_down = False
+
+    def submit(self, fn, name, params):
+        future = Future()
+        if self.behaviour == 'ok':
+            future.set_result((f"{name} {params['n']}".encode(), 7))
+        elif self.behaviour == 'broken':
+            future.set_exception(BrokenProcessPool('A worker died'))
+        self.futures.append(future)
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """RenderPool with two fake workers; set `pool.executors` to the
+    executors it should start, in order."""
+    pool = RenderPool(path='unused.csv', workers=2, timeout=0.2, queue_limit=1)
+    pool.executors = []
+    pool.started = []
+
+    def start():
+        executor = pool.executors.pop(0)
+        pool.started.append(executor)
+        return executor
+
+    def get_executor():
+        with pool._lock:
+            if pool._executor is None:
+                pool._executor = start()
+            return pool._executor
+
+    monkeypatch.setattr(pool, '_get_executor', get_executor)
+    return pool
+
+
+def test_results_keep_the_order_of_the_params(pool):
+    pool.executors = [FakeExecutor('ok')]
+    results = pool.render_many('tile', [{'n': 1}, {'n': 2}, {'n': 3}])
+    assert results == [(b'tile 1', 7), (b'tile 2', 7), (b'tile 3', 7)]
+    assert pool.render('tile', {'n': 4}) == (b'tile 4', 7)
+
+
+def test_full_queue_raises_pool_busy(pool):
+    pool.executors = [FakeExecutor('ok')]
+    pool._slots.acquire()
+    with pytest.raises(PoolBusy):
+        pool.render('tile', {'n': 1})
+    pool._slots.release()
+    assert pool.render('tile', {'n': 1})
+
+
+def test_timeout_frees_the_slot_once_queued_renders_are_dropped(pool):
+    pool.executors = [FakeExecutor('hang')]
+    with pytest.raises(RenderTimeout):
+        pool.render_many('tile', [{'n': 1}, {'n': 2}])
+    assert all(future.cancelled() for future in pool.started[0].futures)
+    # The slot is free again
+    assert pool._slots.acquire(blocking=False)
+    pool._slots.release()
+
+
+def test_broken_pool_is_replaced_and_the_batch_retried(pool):
+    pool.executors = [FakeExecutor('broken'), FakeExecutor('ok')]
+    assert pool.render('tile', {'n': 1}) == (b'tile 1', 7)
+    assert pool.started[0].shut_down
+    assert pool._executor is pool.started[1]
+
+
+def test_pool_broken_when_the_new_pool_fails_too(pool):
+    pool.executors = [FakeExecutor('broken'), FakeExecutor('broken'), FakeExecutor('ok')]
+    with pytest.raises(PoolBroken):
+        pool.render('tile', {'n': 1})
+    # The slot was given back and the next request starts from a fresh pool
+    assert pool.render('tile', {'n': 1}) == (b'tile 1', 7)
+
+
+def test_in_process_rendering(sales_csv):
+    pool = RenderPool(path=str(sales_csv), workers=0)
+    body, version = pool.render('histogram', {})
+    assert body.startswith(b'\x89PNG')
+    assert version is not None
+
+
+def test_spawned_workers_render_concurrently(sales_csv):
+    pool = RenderPool(path=str(sales_csv), workers=2, timeout=120)
+    try:
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(pool.render('histogram', {})))
+                   for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 2
+        assert all(body.startswith(b'\x89PNG') for body, _ in results)
+    finally:
+        pool.shutdown()
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from api_llm import LLMRequestError, rep_request
+from rep_index import RepIndex, check_date_range, parse_date_param
+from sales_ingest import load_sales_frame
+
+
+@pytest.fixture
+def index(sales_csv):
+    return RepIndex(load_sales_frame(str(sales_csv)))
+
+
+def test_rows_are_one_rep_oldest_first(index):
+    rows = index.rows(3)
+    assert len(rows) == 40
+    assert set(rows['employee_id']) == {3}
+    assert rows['dated_ts'].is_monotonic_increasing
+
+
+def test_latest_keeps_the_most_recent_rows(index):
+    everything = index.rows(3)
+    latest = index.rows(3, latest=5)
+    assert list(latest['dated_ts']) == list(everything['dated_ts'].iloc[-5:])
+
+
+def test_date_window_is_inclusive(index):
+    rows = index.rows(3, start='2022-08-01', end='2022-08-10')
+    assert len(rows) == 10
+    assert rows['dated_ts'].iloc[0] == pd.Timestamp('2022-08-01')
+    assert rows['dated_ts'].iloc[-1] == pd.Timestamp('2022-08-10')
+
+
+def test_latest_applies_inside_the_window(index):
+    rows = index.rows(3, latest=3, end='2022-08-10')
+    assert list(rows['dated_ts'].dt.day) == [8, 9, 10]
+
+
+def test_unknown_rep_and_empty_window_give_no_rows(index):
+    assert 999 not in index
+    assert index.rows(999).empty
+    assert index.rows(3, start='2030-01-01').empty
+
+
+def test_employee_ids(index):
+    assert index.employee_ids() == [1, 2, 3, 4, 5, 6]
+
+
+def test_parse_date_param():
+    assert parse_date_param('') is None
+    assert parse_date_param('2022-08-01') == pd.Timestamp('2022-08-01')
+    with pytest.raises(ValueError):
+        parse_date_param('yesterday')
+
+
+def test_check_date_range():
+    check_date_range(pd.Timestamp('2022-07-01'), pd.Timestamp('2022-07-01'))
+    check_date_range(None, pd.Timestamp('2022-07-01'))
+    with pytest.raises(ValueError):
+        check_date_range(pd.Timestamp('2022-08-01'), pd.Timestamp('2022-07-01'))
+
+
+def test_rep_request_rejects_an_inverted_window():
+    with pytest.raises(LLMRequestError) as raised:
+        rep_request({'rep_id': '3', 'from': '2022-08-01', 'to': '2022-07-01'})
+    assert raised.value.status == 400
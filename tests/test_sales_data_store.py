@@ -0,0 +1,72 @@
+import numpy as np
+
+from conftest import append_rows, bump_mtime
+from sales_data_store import SalesDataStore, get_store
+
+
+def test_parses_once_and_shares_the_frame(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=0)
+    df, version = store.snapshot()
+    again, same_version = store.snapshot()
+    assert same_version == version
+    assert len(df) == 240
+    # Shallow copies of one parsed frame
+    assert np.shares_memory(df['revenue_confirmed'].to_numpy(), again['revenue_confirmed'].to_numpy())
+
+
+def test_new_version_after_the_file_changes(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=0)
+    before = store.version
+    line = open(sales_csv).read().splitlines()[1]
+    append_rows(sales_csv, [line])
+    bump_mtime(sales_csv)
+    assert store.version != before
+    assert len(store.get()) == 241
+
+
+def test_check_interval_limits_stat_calls(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=3600)
+    before = store.version
+    append_rows(sales_csv, [open(sales_csv).read().splitlines()[1]])
+    bump_mtime(sales_csv)
+    # Not checked again until the interval has passed
+    assert store.version == before
+
+
+def test_derived_is_built_once_per_version(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=0)
+    builds = []
+
+    def build(df):
+        builds.append(len(df))
+        return len(df)
+
+    assert store.derived('rows', build) == 240
+    assert store.derived('rows', build) == 240
+    assert builds == [240]
+
+    append_rows(sales_csv, [open(sales_csv).read().splitlines()[1]])
+    bump_mtime(sales_csv)
+    value, version = store.derived_snapshot('rows', build)
+    assert value == 241
+    assert version == store.version
+    assert builds == [240, 241]
+
+
+def test_derived_update_hook_replaces_a_full_build(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=0)
+    store.derived('rows', len, lambda previous, df: None)
+    append_rows(sales_csv, [open(sales_csv).read().splitlines()[1]])
+    bump_mtime(sales_csv)
+    updates = []
+
+    def update(previous, df):
+        updates.append(previous)
+        return previous + 1
+
+    assert store.derived('rows', len, update) == 241
+    assert updates == [240]
+
+
+def test_get_store_returns_one_store_per_path(sales_csv):
+    assert get_store(str(sales_csv)) is get_store(str(sales_csv))
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_features import FEATURES, build_features, update_features
+from sales_ingest import load_sales_frame
+
+
+@pytest.fixture
+def df(sales_csv):
+    # File order is by date; shuffle it so sorting per employee matters
+    df = load_sales_frame(str(sales_csv))
+    return df.sample(frac=1, random_state=0).reset_index(drop=True)
+
+
+def reference(df):
+    """FEATURES computed row by row with pandas groupby."""
+    data = df.sort_values(['employee_id', 'dated'], kind='stable')
+    grouped = data.groupby('employee_id')['revenue_confirmed']
+    out = pd.DataFrame(index=data.index)
+    out['lag_revenue'] = grouped.shift(1)
+    out['lag_7_revenue'] = grouped.shift(7)
+    out['rolling_avg_revenue'] = grouped.transform(lambda s: s.rolling(3).mean())
+    out['rolling_7_avg_revenue'] = grouped.transform(lambda s: s.rolling(7).mean())
+    out['ewm_7_revenue'] = grouped.transform(lambda s: s.ewm(span=7, adjust=False, ignore_na=True).mean())
+    revenue = data['revenue_confirmed'].astype(float)
+    out['revenue_per_lead'] = (revenue / data['lead_taken']).where(data['lead_taken'] > 0)
+    out['revenue_per_application'] = (revenue / data['applications']).where(data['applications'] > 0)
+    return out.reindex(df.index)[list(FEATURES)]
+
+
+def assert_same_features(table, df):
+    pd.testing.assert_frame_equal(table.aligned(df.index), reference(df), check_dtype=False)
+
+
+def test_features_match_pandas(df):
+    assert_same_features(build_features(df), df)
+
+
+def test_undated_rows_get_no_features(df):
+    df.loc[5, 'dated'] = pd.NaT
+    aligned = build_features(df).aligned(df.index)
+    assert aligned.loc[5].isna().all()
+    assert aligned.drop(index=5).notna().any().all()
+
+
+def appended(df, rows=12):
+    """`df` followed by `rows` new rows, dated after every existing one,
+    for existing reps and a new one."""
+    new = df[df['dated'] == df['dated'].max()].head(rows).copy()
+    new['dated'] += pd.Timedelta(days=1)
+    new.iloc[:2, new.columns.get_loc('employee_id')] = 99
+    new['revenue_confirmed'] += 100
+    return pd.concat([df, new], ignore_index=True)
+
+
+def test_extending_matches_a_full_build(df):
+    table = build_features(df)
+    longer = appended(df)
+    extended = table.extend(longer)
+    assert extended is not None and extended is not table
+    assert_same_features(extended, longer)
+    # And again on top of the extended table
+    longest = appended(longer)
+    assert_same_features(extended.extend(longest), longest)
+
+
+def test_extend_with_the_same_data_returns_the_table(df):
+    table = build_features(df)
+    assert table.extend(df) is table
+
+
+def test_changed_recent_rows_need_a_rebuild(df):
+    table = build_features(df)
+    edited = appended(df)
+    edited.loc[len(df) - 1, 'revenue_confirmed'] += 1
+    assert table.extend(edited) is None
+    assert table.extend(df.iloc[:-1]) is None
+
+
+def test_backdated_rows_need_a_rebuild(df):
+    table = build_features(df)
+    late = df.head(1).copy()
+    late['dated'] = df['dated'].min()
+    assert table.extend(pd.concat([df, late], ignore_index=True)) is None
+
+
+def test_store_update_hook(df):
+    table = build_features(df)
+    # The store calls it for a changed file of the same length: a rewrite
+    assert update_features(table, df) is None
+    longer = appended(df)
+    assert_same_features(update_features(table, longer), longer)
+
+
+def test_unknown_feature_kind(df):
+    with pytest.raises(ValueError):
+        build_features(df, {'odd': ('median', 'revenue_confirmed', 3)})
+
+
+def test_aligned_checks_the_row_count(df):
+    with pytest.raises(ValueError):
+        build_features(df).aligned(df.index[:-1])
+
+
+def test_ewm_skips_missing_values(df):
+    df['revenue_confirmed'] = df['revenue_confirmed'].astype(float)
+    df.loc[df.index[::9], 'revenue_confirmed'] = np.nan
+    assert_same_features(build_features(df), df)
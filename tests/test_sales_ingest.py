@@ -0,0 +1,86 @@
+import os
+
+import pandas as pd
+import pytest
+
+import sales_ingest
+from conftest import append_rows, bump_mtime
+from sales_ingest import SCHEMA, cache_path, load_sales_frame, read_sales_csv
+
+
+@pytest.fixture
+def parses(monkeypatch):
+    """Number of CSV parses load_sales_frame made."""
+    counts = []
+    read = sales_ingest.read_sales_csv
+
+    def counted(source, columns=None):
+        counts.append(source)
+        return read(source, columns)
+
+    monkeypatch.setattr(sales_ingest, 'read_sales_csv', counted)
+    return counts
+
+
+def test_declared_dtypes(sales_csv):
+    df = read_sales_csv(str(sales_csv))
+    assert df['employee_id'].dtype == 'int32'
+    assert df['revenue_confirmed'].dtype == 'int64'
+    assert df['apps_per_lead'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(df['dated'])
+    assert list(df.columns) == list(SCHEMA)
+
+
+def test_column_projection(sales_csv):
+    df = read_sales_csv(str(sales_csv), ['employee_id', 'dated'])
+    assert list(df.columns) == ['employee_id', 'dated']
+
+
+def test_schema_mismatch_falls_back_to_inference(sales_csv):
+    content = open(sales_csv).read().splitlines()
+    fields = content[1].split(',')
+    fields[4] = ''  # lead_taken, an integer column
+    content[1] = ','.join(fields)
+    sales_csv.write_text('\n'.join(content) + '\n')
+    df = read_sales_csv(str(sales_csv))
+    assert len(df) == 240
+    assert df['lead_taken'].isna().sum() == 1
+
+
+def test_cache_is_written_once_and_reused(sales_csv, parses):
+    first = load_sales_frame(str(sales_csv))
+    assert os.path.exists(cache_path(str(sales_csv)))
+    second = load_sales_frame(str(sales_csv))
+    assert len(parses) == 1
+    pd.testing.assert_frame_equal(first, second)
+
+
+def test_cached_projection(sales_csv, parses):
+    load_sales_frame(str(sales_csv))
+    df = load_sales_frame(str(sales_csv), ['employee_id', 'revenue_confirmed'])
+    assert list(df.columns) == ['employee_id', 'revenue_confirmed']
+    assert len(parses) == 1
+
+
+def test_changed_csv_invalidates_the_cache(sales_csv, parses):
+    load_sales_frame(str(sales_csv))
+    append_rows(sales_csv, open(sales_csv).read().splitlines()[1:3])
+    bump_mtime(sales_csv)
+    assert len(load_sales_frame(str(sales_csv))) == 242
+    assert len(parses) == 2
+
+
+def test_unreadable_cache_is_rebuilt(sales_csv, parses):
+    load_sales_frame(str(sales_csv))
+    with open(cache_path(str(sales_csv)), 'wb') as f:
+        f.write(b'not feather')
+    assert len(load_sales_frame(str(sales_csv))) == 240
+    assert len(load_sales_frame(str(sales_csv))) == 240
+    assert len(parses) == 2
+
+
+def test_use_cache_false_parses_every_time(sales_csv, parses):
+    load_sales_frame(str(sales_csv), use_cache=False)
+    load_sales_frame(str(sales_csv), use_cache=False)
+    assert len(parses) == 2
+    assert not os.path.exists(cache_path(str(sales_csv)))
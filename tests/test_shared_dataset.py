@@ -0,0 +1,119 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import sales_data_store
+import shared_dataset
+from conftest import append_rows, bump_mtime
+from sales_data_store import SalesDataStore
+from sales_ingest import load_sales_frame
+from shared_dataset import _claim, _load_or_publish, _publish, _release, frame_from_arrays, frame_to_arrays, shared_dir
+from trend_rollups import TrendRollups
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Number of times a store parsed the CSV itself."""
+    counts = []
+    load = sales_data_store.load_sales_frame
+
+    def counted(path, *args, **kwargs):
+        counts.append(path)
+        return load(path, *args, **kwargs)
+
+    monkeypatch.setattr(sales_data_store, 'load_sales_frame', counted)
+    return counts
+
+
+def is_mapped(array):
+    while not isinstance(array, np.memmap):
+        if array.base is None:
+            return False
+        array = array.base
+    return True
+
+
+def test_frame_round_trip(sales_csv):
+    df = load_sales_frame(str(sales_csv), use_cache=False)
+    df.loc[3, 'employee_name'] = np.nan
+    meta, arrays = frame_to_arrays(df)
+    assert all(isinstance(array, np.ndarray) and array.dtype != object for array in arrays.values())
+    pd.testing.assert_frame_equal(frame_from_arrays(meta, arrays), df)
+
+
+def test_processes_share_one_parse(sales_csv, loads):
+    first = SalesDataStore(str(sales_csv), check_interval=0, shared=True)
+    df, version = first.snapshot()
+    # Another worker process attaches to what the first one published
+    second = SalesDataStore(str(sales_csv), check_interval=0, shared=True)
+    mapped, same_version = second.snapshot()
+    assert len(loads) == 1
+    assert same_version == version
+    assert all(is_mapped(mapped[column].to_numpy()) for column in ['employee_id', 'dated', 'revenue_confirmed'])
+    pd.testing.assert_frame_equal(mapped.copy(), load_sales_frame(str(sales_csv), use_cache=False))
+
+
+def test_derived_structures_are_built_once(sales_csv):
+    builds = []
+
+    class CountedRollups(TrendRollups):
+        def __init__(self, df):
+            builds.append(1)
+            super().__init__(df)
+
+    first = SalesDataStore(str(sales_csv), check_interval=0, shared=True)
+    second = SalesDataStore(str(sales_csv), check_interval=0, shared=True)
+    built = first.derived('trend_rollups', CountedRollups)
+    mapped = second.derived('trend_rollups', CountedRollups)
+    assert len(builds) == 1
+    assert mapped.query('lead_taken', 'weekly') == built.query('lead_taken', 'weekly')
+
+
+def test_new_versions_are_published_and_old_ones_pruned(sales_csv):
+    store = SalesDataStore(str(sales_csv), check_interval=0, shared=True)
+    versions = [store.version]
+    line = open(sales_csv).read().splitlines()[1]
+    for seconds in (5, 10, 15):
+        append_rows(sales_csv, [line])
+        bump_mtime(sales_csv, seconds)
+        versions.append(store.version)
+    assert len(store.get()) == 243
+    assert sorted(os.listdir(shared_dir(str(sales_csv)))) == sorted(versions[-2:])
+
+
+def test_build_lock(tmp_path, monkeypatch):
+    directory = str(tmp_path / 'shared' / 'v1' / 'frame')
+    assert _claim(directory)
+    assert not _claim(directory)
+    _release(directory)
+    assert _claim(directory)
+    # A lock older than BUILD_WAIT was abandoned by its builder
+    monkeypatch.setattr(shared_dataset, 'BUILD_WAIT', -1)
+    assert _claim(directory)
+
+
+def test_waits_for_the_process_already_building(tmp_path):
+    directory = str(tmp_path / 'shared' / 'v1' / 'frame')
+    assert _claim(directory)
+
+    def other_process():
+        time.sleep(0.1)
+        _publish(directory, {'n': 1}, {'a': np.arange(3)})
+        _release(directory)
+
+    threading.Thread(target=other_process).start()
+    builds = []
+    meta, arrays = _load_or_publish(directory, lambda: builds.append(1))
+    assert builds == []
+    assert meta == {'n': 1}
+    assert list(arrays['a']) == [0, 1, 2]
+
+
+def test_unpublishable_values_stay_private(tmp_path):
+    directory = str(tmp_path / 'shared' / 'v1' / 'frame')
+    assert _load_or_publish(directory, lambda: ('private', None)) == (None, 'private')
+    assert not os.path.exists(directory)
@@ -0,0 +1,130 @@
+import os
+
+import pandas as pd
+import pytest
+
+import team_metrics
+from conftest import append_rows, bump_mtime
+from sales_ingest import load_sales_frame
+from team_metrics import MEAN_METRICS, SUM_METRICS, IncrementalTeamMetrics, get_team_metrics
+
+
+@pytest.fixture
+def parsed(monkeypatch):
+    """Number of rows each parse of the engine read."""
+    counts = []
+    read = team_metrics.read_sales_csv
+
+    def counted(source, columns=None):
+        df = read(source, columns)
+        counts.append(len(df))
+        return df
+
+    monkeypatch.setattr(team_metrics, 'read_sales_csv', counted)
+    return counts
+
+
+def lines(path):
+    with open(path) as f:
+        return f.read().splitlines()
+
+
+def assert_matches_the_file(engine, path):
+    df = load_sales_frame(str(path), use_cache=False)
+    metrics = engine.metrics()
+    assert metrics['rows'] == len(df)
+    for column in SUM_METRICS:
+        assert metrics[f'total_{column}'] == pytest.approx(df[column].sum())
+    for column in MEAN_METRICS:
+        assert metrics[f'avg_{column}'] == pytest.approx(df[column].mean())
+    employee = engine.employee_metrics(2)
+    rows = df[df['employee_id'] == 2]
+    assert employee['rows'] == len(rows)
+    assert employee['total_revenue_confirmed'] == pytest.approx(rows['revenue_confirmed'].sum())
+
+
+def test_first_refresh_reads_everything(sales_csv, parsed):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    assert parsed == [240]
+    assert_matches_the_file(engine, sales_csv)
+
+
+def test_unchanged_file_is_not_read_again(sales_csv, parsed):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    engine.refresh()
+    assert parsed == [240]
+
+
+def test_only_appended_rows_are_parsed(sales_csv, parsed):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    append_rows(sales_csv, lines(sales_csv)[1:4])
+    bump_mtime(sales_csv)
+    engine.refresh()
+    assert parsed == [240, 3]
+    assert engine.rebuilds == 0
+    assert_matches_the_file(engine, sales_csv)
+
+
+def test_a_partial_last_line_waits_for_the_next_refresh(sales_csv, parsed):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    line = lines(sales_csv)[1]
+    with open(sales_csv, 'a') as f:
+        f.write(line[:10])
+    bump_mtime(sales_csv)
+    assert engine.refresh()['rows'] == 240
+    with open(sales_csv, 'a') as f:
+        f.write(line[10:] + '\n')
+    bump_mtime(sales_csv, 10)
+    assert engine.refresh()['rows'] == 241
+    assert engine.rebuilds == 0
+
+
+def test_replaced_file_is_rebuilt(sales_csv, tmp_path, parsed):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    replacement = tmp_path / 'replacement.csv'
+    replacement.write_text('\n'.join(lines(sales_csv)[:101]) + '\n')
+    os.replace(replacement, sales_csv)
+    engine.refresh()
+    assert engine.rebuilds == 1
+    assert parsed == [240, 100]
+    assert_matches_the_file(engine, sales_csv)
+
+
+def test_edit_in_place_is_detected(sales_csv):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    content = lines(sales_csv)
+    # Same length, so every byte offset stays where it was
+    fields = content[-1].split(',')
+    fields[0] = '5' if fields[0] != '5' else '6'
+    content[-1] = ','.join(fields)
+    with open(sales_csv, 'r+') as f:
+        f.write('\n'.join(content) + '\n')
+    bump_mtime(sales_csv)
+    engine.refresh()
+    assert engine.rebuilds == 1
+    assert_matches_the_file(engine, sales_csv)
+
+
+def test_period_totals(sales_csv):
+    engine = IncrementalTeamMetrics(str(sales_csv))
+    engine.refresh()
+    df = load_sales_frame(str(sales_csv), use_cache=False)
+    dates = pd.to_datetime(df['dated'], format='%d/%m/%Y')
+    end = dates.max()
+    current, previous = engine.period_totals(days=10)
+    assert current['revenue_confirmed'] == pytest.approx(
+        df.loc[dates > end - pd.Timedelta(days=10), 'revenue_confirmed'].sum())
+    earlier = (dates <= end - pd.Timedelta(days=10)) & (dates > end - pd.Timedelta(days=20))
+    assert previous['lead_taken'] == pytest.approx(df.loc[earlier, 'lead_taken'].sum())
+    # Nothing before the last 40 days
+    assert engine.period_totals(days=40) is None
+
+
+def test_get_team_metrics_returns_one_engine_per_path(sales_csv):
+    assert get_team_metrics(str(sales_csv)) is get_team_metrics(str(sales_csv))
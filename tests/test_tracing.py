@@ -0,0 +1,112 @@
+import pytest
+from flask import Flask
+
+import tracing
+from tracing import Counter, Histogram, Registry, instrument_app, record_llm_call, stage
+
+
+def test_counter_render():
+    counter = Counter('jobs_total', 'Jobs run', ('kind',))
+    counter.inc('team')
+    counter.inc('team', amount=2)
+    counter.inc('rep')
+    assert counter.render() == [
+        '# HELP jobs_total Jobs run',
+        '# TYPE jobs_total counter',
+        'jobs_total{kind="rep"} 1',
+        'jobs_total{kind="team"} 3',
+    ]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram('latency_seconds', 'Latency', ('endpoint',), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, 'rep')
+    lines = histogram.render()
+    assert 'latency_seconds_bucket{endpoint="rep",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{endpoint="rep",le="1.0"} 3' in lines
+    assert 'latency_seconds_bucket{endpoint="rep",le="+Inf"} 4' in lines
+    assert 'latency_seconds_sum{endpoint="rep"} 4.25' in lines
+    assert 'latency_seconds_count{endpoint="rep"} 4' in lines
+
+
+def test_label_values_are_escaped():
+    counter = Counter('c', 'help', ('label',))
+    counter.inc('say "hi"\n')
+    assert counter.render()[-1] == 'c{label="say \\"hi\\"\\n"} 1'
+
+
+def test_registry_exports_numeric_stats_as_gauges():
+    registry = Registry()
+    registry.register_stats('cache', lambda: {'hits': 3, 'ratio': 0.5, 'name': 'x', 'enabled': True}, 'Cache')
+
+    def broken():
+        raise RuntimeError('gone')
+
+    registry.register_stats('broken', broken, 'Broken')
+    text = registry.render()
+    assert 'cache_hits 3\n' in text
+    assert 'cache_ratio 0.5\n' in text
+    assert '# TYPE cache_hits gauge' in text
+    assert 'cache_name' not in text and 'cache_enabled' not in text
+    assert 'broken_' not in text
+
+
+def series(metric, *labels):
+    """(sum, count) of one histogram series, or the value of a counter."""
+    value = metric._series.get(labels) if isinstance(metric, Histogram) else metric._values.get(labels)
+    if isinstance(metric, Histogram):
+        return (value[1], value[2]) if value else (0.0, 0)
+    return value or 0
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    instrument_app(app)
+
+    @app.route('/work')
+    def work():
+        with stage('compute'):
+            record_llm_call(False, 12, 'a short completion')
+            record_llm_call(True)
+        return 'done'
+
+    return app
+
+
+def test_requests_and_stages_are_timed(app):
+    before = series(tracing.request_duration, 'work', 'GET', 200)[1]
+    stages = series(tracing.stage_duration, 'work', 'compute')[1]
+    prompt_tokens = series(tracing.llm_prompt_tokens, 'work')
+    app.test_client().get('/work')
+    assert series(tracing.request_duration, 'work', 'GET', 200)[1] == before + 1
+    assert series(tracing.stage_duration, 'work', 'compute')[1] == stages + 1
+    assert series(tracing.llm_prompt_tokens, 'work') == prompt_tokens + 12
+    assert series(tracing.llm_requests, 'work', 'hit') >= 1
+
+
+def test_metrics_endpoint(app):
+    client = app.test_client()
+    client.get('/work')
+    response = client.get('/metrics')
+    assert response.content_type == tracing.CONTENT_TYPE
+    text = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_count{endpoint="work",method="GET",status="200"}' in text
+    assert 'stage_duration_seconds_bucket{endpoint="work",stage="compute",le="+Inf"}' in text
+    assert 'llm_requests_total{endpoint="work",cache="miss"}' in text
+
+
+def test_disabled_metrics_record_nothing(monkeypatch):
+    monkeypatch.setattr(tracing, 'METRICS_ENABLED', False)
+    before = series(tracing.llm_requests, 'none', 'miss')
+    with stage('compute'):
+        record_llm_call(False, 5, 'text')
+    assert series(tracing.llm_requests, 'none', 'miss') == before
+
+
+def test_app_exports_its_caches(client):
+    client.post('/api/performance_trends', json={'time_period': 'weekly'})
+    text = client.get('/metrics').get_data(as_text=True)
+    assert 'stage_duration_seconds_count{endpoint="trends.post_performance_trends",stage="rollups"}' in text
+    assert 'chart_cache_hits' in text
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from sales_ingest import load_sales_frame, sales_dates
+from trend_rollups import TrendRollups
+
+
+@pytest.fixture
+def df(sales_csv):
+    return load_sales_frame(str(sales_csv))
+
+
+@pytest.fixture
+def rollups(df):
+    return TrendRollups(df)
+
+
+def expected(df, freq, column='revenue_confirmed', agg='sum'):
+    dates = sales_dates(df)
+    grouped = df.groupby(dates.dt.to_period(freq).dt.start_time)[column]
+    return grouped.sum() if agg == 'sum' else grouped.mean()
+
+
+@pytest.mark.parametrize('period,freq', [('daily', 'D'), ('weekly', 'W'), ('monthly', 'M')])
+def test_buckets_match_a_groupby(df, rollups, period, freq):
+    trends = rollups.query('revenue_confirmed', period)
+    assert [value for _, value in trends] == pytest.approx(list(expected(df, freq)))
+
+
+def test_labels(rollups):
+    assert [label for label, _ in rollups.query('lead_taken', 'monthly')] == ['2022-07', '2022-08', '2022-09']
+    assert [label for label, _ in rollups.query('lead_taken', 'quarterly')] == ['2022-Q3']
+
+
+def test_mean(df, rollups):
+    trends = rollups.query('apps_per_lead', 'monthly', agg='mean')
+    assert [value for _, value in trends] == pytest.approx(list(expected(df, 'M', 'apps_per_lead', 'mean')))
+
+
+def test_edge_buckets_only_total_the_days_inside_the_window(df, rollups):
+    trends = dict(rollups.query('lead_taken', 'monthly', start='2022-07-30', end='2022-08-05'))
+    dates = sales_dates(df)
+    july = df.loc[(dates >= '2022-07-30') & (dates <= '2022-07-31'), 'lead_taken'].sum()
+    august = df.loc[(dates >= '2022-08-01') & (dates <= '2022-08-05'), 'lead_taken'].sum()
+    assert trends == {'2022-07': pytest.approx(july), '2022-08': pytest.approx(august)}
+
+
+def test_employee_scope(df, rollups):
+    trends = rollups.query('revenue_confirmed', 'weekly', employee_id='4')
+    assert [value for _, value in trends] == pytest.approx(list(expected(df[df['employee_id'] == 4], 'W')))
+    assert rollups.employee_ids() == [1, 2, 3, 4, 5, 6]
+
+
+def test_inverted_window_has_no_buckets(rollups):
+    assert rollups.query('lead_taken', 'daily', start='2022-08-10', end='2022-08-01') == []
+    sums, counts = rollups.team['daily'].range_totals(np.datetime64('2022-08-10'), np.datetime64('2022-08-01'))
+    assert not sums.any() and not counts.any()
+
+
+@pytest.mark.parametrize('kwargs', [
+    {'metric': 'nope'}, {'period': 'hourly'}, {'agg': 'median'}, {'employee_id': '999'},
+])
+def test_unknown_query_arguments(rollups, kwargs):
+    arguments = {'metric': 'lead_taken', 'period': 'daily', **kwargs}
+    with pytest.raises(KeyError):
+        rollups.query(**arguments)
+
+
+def test_range_totals_match_the_rows(df, rollups):
+    first, last = pd.Timestamp('2022-08-03'), pd.Timestamp('2022-08-20')
+    sums, counts = rollups.team['daily'].range_totals(first.to_datetime64(), last.to_datetime64())
+    dates = sales_dates(df)
+    inside = df[(dates >= first) & (dates <= last)]
+    column = rollups.metrics.index('revenue_confirmed')
+    assert sums[column] == pytest.approx(inside['revenue_confirmed'].sum())
+    assert counts[column] == len(inside)
+
+
+def test_shared_arrays_round_trip(df, rollups):
+    meta, arrays = rollups.to_shared()
+    copy = TrendRollups.from_shared(df, meta, arrays)
+    assert copy.query('tours', 'weekly', employee_id=2) == rollups.query('tours', 'weekly', employee_id=2)
+
+
+def test_endpoint(client):
+    response = client.post('/api/performance_trends', json={'time_period': 'monthly', 'metric': 'lead_taken'})
+    assert response.status_code == 200
+    assert list(response.json['trends']) == ['2022-07', '2022-08', '2022-09']
+    inverted = {'time_period': 'daily', 'from': '2022-08-10', 'to': '2022-08-01'}
+    assert client.post('/api/performance_trends', json=inverted).status_code == 400
+    assert client.post('/api/performance_trends', json={'time_period': 'hourly'}).status_code == 400